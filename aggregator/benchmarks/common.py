@@ -0,0 +1,96 @@
+"""Helper bersama untuk benchmark: workload deterministik dan ringkasan latency."""
+
+import json
+import random
+import statistics
+from typing import Any, Dict, List, Tuple
+
+from src.dedup_store import DedupStore, EventRow
+
+_WORDS = ("alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel")
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize_latency(latencies_ms: List[float]) -> Dict[str, float]:
+    if not latencies_ms:
+        return {'p50_ms': 0.0, 'p99_ms': 0.0, 'mean_ms': 0.0}
+    return {
+        'p50_ms': round(statistics.median(latencies_ms), 3),
+        'p99_ms': round(percentile(latencies_ms, 0.99), 3),
+        'mean_ms': round(statistics.fmean(latencies_ms), 3)
+    }
+
+
+def make_payload(i: int, size: int) -> Dict[str, Any]:
+    """Payload log dengan ukuran JSON kira-kira size bytes."""
+    payload = {
+        "message": f"Event from publisher number {i}",
+        "level": ["INFO", "WARNING", "ERROR"][i % 3],
+        "metadata": {"host": f"host-{i % 4}", "service": f"service-{i % 2}"}
+    }
+    # ', "detail": ""' menambah 14 byte di luar isi filler
+    filler = size - len(json.dumps(payload)) - 14
+    if filler > 0:
+        words = [_WORDS[(i + k) % len(_WORDS)] for k in range(filler // 6 + 1)]
+        payload["detail"] = " ".join(words)[:filler]
+    return payload
+
+
+def make_workload(
+    count: int,
+    duplicate_rate: float,
+    topics: int,
+    payload_bytes: int,
+    seed: int = 42
+) -> List[Dict[str, Any]]:
+    """
+    count event; dengan peluang duplicate_rate sebuah event adalah
+    kiriman ulang event sebelumnya (key dan isi sama).
+    """
+    rng = random.Random(seed)
+    events: List[Dict[str, Any]] = []
+    unique = 0
+    for _ in range(count):
+        if events and rng.random() < duplicate_rate:
+            events.append(events[rng.randrange(len(events))])
+            continue
+        events.append({
+            'topic': f"topic-{unique % topics}",
+            'event_id': f"event-{unique}",
+            'timestamp': "2025-01-01T00:00:00Z",
+            'source': "benchmark",
+            'payload': make_payload(unique, payload_bytes)
+        })
+        unique += 1
+    return events
+
+
+def to_rows(events: List[Dict[str, Any]]) -> List[EventRow]:
+    return [
+        (e['topic'], e['event_id'], e['timestamp'], e['source'], json.dumps(e['payload']))
+        for e in events
+    ]
+
+
+def batches(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+async def prefill(store: DedupStore, count: int, topics: int, payload_bytes: int, chunk: int = 5000):
+    """Isi database dengan count event unik (key tidak bentrok dengan workload)."""
+    for start in range(0, count, chunk):
+        await store.mark_processed_many([
+            (f"topic-{i % topics}", f"prefill-{i}", "2024-01-01T00:00:00Z", "prefill",
+             json.dumps(make_payload(i, payload_bytes)))
+            for i in range(start, min(count, start + chunk))
+        ], update_stats=False)
+
+
+def expected_counts(events: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """(unique, duplicate) yang seharusnya dihasilkan workload."""
+    unique = len({(e['topic'], e['event_id']) for e in events})
+    return unique, len(events) - unique
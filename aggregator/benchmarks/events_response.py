@@ -0,0 +1,146 @@
+"""
+Benchmark serialisasi GET /events: response_model pydantic vs raw JSON.
+
+- legacy: get_events (json.loads per payload) -> EventsResponse
+  (validasi ProcessedEvent per event) -> serialisasi FastAPI
+- raw: get_event_rows -> format_events_page (payload JSON text
+  disisipkan langsung ke body)
+
+Kedua endpoint dijalankan in-process lewat httpx.ASGITransport terhadap
+database yang sama, sehingga selisihnya adalah biaya decode/validasi/
+encode per event.
+
+Usage (dari direktori aggregator/):
+    python -m benchmarks.events_response [--events N] [--limit N] [--iterations N] [--compress]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, Query, Response
+
+from src.dedup_store import DedupStore, encode_cursor
+from src.export import format_events_page
+from src.models import EventsResponse
+
+from .common import percentile
+
+
+def build_app(store: DedupStore) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/legacy", response_model=EventsResponse)
+    async def legacy(limit: int = Query(100), offset: int = Query(0)):
+        events = await store.get_events(limit=limit, offset=offset)
+        total = await store.count_events()
+        next_cursor = None
+        if len(events) == limit:
+            next_cursor = encode_cursor(events[-1]['processed_at'], events[-1]['id'])
+        return EventsResponse(
+            events=events, total=total, limit=limit, offset=offset, next_cursor=next_cursor
+        )
+
+    @app.get("/raw", response_model=EventsResponse)
+    async def raw(limit: int = Query(100), offset: int = Query(0)):
+        rows = await store.get_event_rows(limit=limit, offset=offset)
+        total = await store.count_events()
+        next_cursor = None
+        if len(rows) == limit:
+            next_cursor = encode_cursor(rows[-1][6], rows[-1][0])
+        return Response(
+            content=format_events_page(rows, total, limit, offset, next_cursor),
+            media_type="application/json"
+        )
+
+    return app
+
+
+def make_payload(i: int) -> str:
+    return json.dumps({
+        "message": f"Event from publisher number {i}",
+        "level": ["INFO", "WARNING", "ERROR"][i % 3],
+        "metadata": {"host": f"host-{i % 4}", "service": f"service-{i % 2}", "attempt": i % 5},
+        "tags": ["alpha", "beta", "gamma"][: i % 3 + 1]
+    })
+
+
+async def measure(client: httpx.AsyncClient, path: str, limit: int, iterations: int) -> Dict[str, Any]:
+    # Warm-up (read pool, page cache, import lazy FastAPI)
+    for _ in range(3):
+        (await client.get(path, params={'limit': limit})).raise_for_status()
+
+    latencies = []
+    size = 0
+    for _ in range(iterations):
+        started = time.perf_counter()
+        response = await client.get(path, params={'limit': limit})
+        latencies.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+        size = len(response.content)
+
+    return {
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'response_bytes': size
+    }
+
+
+async def run(events: int, limit: int, iterations: int, compress: bool) -> Dict[str, Any]:
+    tmpdir = tempfile.mkdtemp()
+    store = DedupStore(os.path.join(tmpdir, "bench.db"), compress_payloads=compress)
+    await store.initialize()
+    try:
+        for start in range(0, events, 1000):
+            await store.mark_processed_many([
+                (f"topic-{i % 8}", f"event-{i}", "2025-01-01T00:00:00Z", "bench", make_payload(i))
+                for i in range(start, min(events, start + 1000))
+            ])
+
+        transport = httpx.ASGITransport(app=build_app(store))
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            legacy = (await client.get("/legacy", params={'limit': limit})).json()
+            raw = (await client.get("/raw", params={'limit': limit})).json()
+            if legacy != raw:
+                raise RuntimeError("raw response differs from EventsResponse")
+
+            results = {
+                'legacy': await measure(client, "/legacy", limit, iterations),
+                'raw': await measure(client, "/raw", limit, iterations)
+            }
+    finally:
+        await store.close()
+        shutil.rmtree(tmpdir)
+
+    results['speedup_p50'] = round(results['legacy']['p50_ms'] / results['raw']['p50_ms'], 2)
+    return {
+        'events': events,
+        'limit': limit,
+        'iterations': iterations,
+        'compress_payloads': compress,
+        'results': results
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark GET /events serialization")
+    parser.add_argument("--events", type=int, default=5000, help="Jumlah event di database")
+    parser.add_argument("--limit", type=int, default=1000, help="Parameter limit /events")
+    parser.add_argument("--iterations", type=int, default=50, help="Request per endpoint")
+    parser.add_argument("--compress", action="store_true", help="Simpan payload terkompresi")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args.events, args.limit, args.iterations, args.compress))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+Benchmark suite throughput dan latency ingest, bisa diulang offline.
+
+Dua suite:
+- store: DedupStore.mark_processed_many langsung (dedup + transaksi
+  SQLite), latency per batch
+- app: aplikasi FastAPI lengkap in-process lewat httpx.ASGITransport
+  (lifespan, validasi, admission, ingest log, worker pool, group commit),
+  latency per request POST; throughput dihitung sampai semua event
+  selesai diproses consumer
+
+Setiap suite men-sweep satu dimensi sekaligus dari skenario dasar:
+duplicate rate, batch size, jumlah topic, ukuran payload dan ukuran
+database awal. Hasil berupa JSON (events/sec, p50/p99) dan dibandingkan
+dengan baseline tersimpan; skenario yang lebih lambat dari toleransi
+ditandai sebagai regresi (exit code 1).
+
+Usage (dari direktori aggregator/):
+    python -m benchmarks.suite [--suite store|app|all] [--quick]
+        [--only SUBSTRING] [--output results.json]
+        [--baseline benchmarks/baseline.json] [--save-baseline] [--tolerance 0.25]
+
+Baseline bergantung pada mesin; simpan ulang (--save-baseline) di mesin
+referensi sebelum dipakai untuk mendeteksi regresi.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import httpx
+
+from src.config import Config
+from src.dedup_store import DedupStore
+
+from .common import batches, expected_counts, make_workload, prefill, summarize_latency, to_rows
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Regresi latency di bawah selisih ini (ms) dianggap noise
+LATENCY_NOISE_FLOOR_MS = 1.0
+
+
+class Scenario(NamedTuple):
+    suite: str
+    events: int
+    duplicate_rate: float = 0.3
+    batch_size: int = 100
+    topics: int = 10
+    payload_bytes: int = 256
+    db_size: int = 0
+
+    @property
+    def name(self) -> str:
+        return (
+            f"{self.suite}/dup={self.duplicate_rate},batch={self.batch_size},"
+            f"topics={self.topics},payload={self.payload_bytes},db={self.db_size}"
+        )
+
+
+def sweep(suite: str, events: int, db_size: int) -> List[Scenario]:
+    """Skenario dasar + variasi satu dimensi per skenario."""
+    base = Scenario(suite, events)
+    variants = [base]
+    variants += [base._replace(duplicate_rate=rate) for rate in (0.0, 0.9)]
+    variants += [base._replace(batch_size=size) for size in (10, 1000)]
+    variants += [base._replace(topics=topics) for topics in (1, 1000)]
+    variants += [base._replace(payload_bytes=size) for size in (64, 4096)]
+    variants += [base._replace(db_size=db_size)]
+    return variants
+
+
+async def run_store(scenario: Scenario, workdir: str) -> Dict[str, Any]:
+    store = DedupStore(os.path.join(workdir, "dedup.db"))
+    await store.initialize()
+    try:
+        await prefill(store, scenario.db_size, scenario.topics, scenario.payload_bytes)
+        events = make_workload(
+            scenario.events, scenario.duplicate_rate, scenario.topics, scenario.payload_bytes
+        )
+        row_batches = batches(to_rows(events), scenario.batch_size)
+
+        latencies = []
+        inserted = 0
+        started = time.perf_counter()
+        for rows in row_batches:
+            batch_started = time.perf_counter()
+            inserted += sum(await store.mark_processed_many(rows))
+            latencies.append((time.perf_counter() - batch_started) * 1000)
+        elapsed = time.perf_counter() - started
+    finally:
+        await store.close()
+
+    unique, _ = expected_counts(events)
+    if inserted != unique:
+        raise RuntimeError(f"{scenario.name}: inserted {inserted}, expected {unique}")
+    return {
+        'events_per_sec': round(scenario.events / elapsed, 1),
+        **summarize_latency(latencies)
+    }
+
+
+async def run_app(scenario: Scenario, workdir: str, concurrency: int) -> Dict[str, Any]:
+    import main
+
+    Config.DB_PATH = os.path.join(workdir, "dedup.db")
+    Config.DB_SHARDS = 1
+    Config.INGEST_LOG_DIR = os.path.join(workdir, "ingest-log")
+    Config.RETENTION_WINDOW_SECONDS = 0
+    Config.AGGREGATOR_ROLE = "standalone"
+
+    if scenario.db_size:
+        store = DedupStore(Config.DB_PATH)
+        await store.initialize()
+        await prefill(store, scenario.db_size, scenario.topics, scenario.payload_bytes)
+        await store.close()
+
+    events = make_workload(
+        scenario.events, scenario.duplicate_rate, scenario.topics, scenario.payload_bytes
+    )
+    bodies = [
+        json.dumps({'events': batch}).encode("utf-8")
+        for batch in batches(events, scenario.batch_size)
+    ]
+
+    latencies: List[float] = []
+    throttled = 0
+
+    # print_config() saat startup tidak ikut ke output JSON
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        lifespan = main.app.router.lifespan_context(main.app)
+        await lifespan.__aenter__()
+
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            pending = iter(bodies)
+
+            async def publisher():
+                nonlocal throttled
+                for body in pending:
+                    while True:
+                        request_started = time.perf_counter()
+                        response = await client.post(
+                            "/publish", content=body, headers={'Content-Type': 'application/json'}
+                        )
+                        if response.status_code != 429:
+                            break
+                        # Admission penuh: ulangi cepat (Retry-After minimal 1s
+                        # terlalu kasar untuk benchmark), dicatat sebagai throttled
+                        throttled += 1
+                        await asyncio.sleep(0.005)
+                    response.raise_for_status()
+                    latencies.append((time.perf_counter() - request_started) * 1000)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(publisher() for _ in range(concurrency)))
+            while main.worker_pool.processed_total() < scenario.events:
+                await asyncio.sleep(0.002)
+            elapsed = time.perf_counter() - started
+
+            stats = (await client.get("/stats")).json()
+    finally:
+        await lifespan.__aexit__(None, None, None)
+
+    unique, duplicates = expected_counts(events)
+    if stats['unique_processed'] != unique or stats['duplicate_dropped'] != duplicates:
+        raise RuntimeError(
+            f"{scenario.name}: unique/duplicate {stats['unique_processed']}/"
+            f"{stats['duplicate_dropped']}, expected {unique}/{duplicates}"
+        )
+    return {
+        'events_per_sec': round(scenario.events / elapsed, 1),
+        **summarize_latency(latencies),
+        'throttled_requests': throttled
+    }
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    tolerance: float
+) -> List[Dict[str, Any]]:
+    """Skenario yang throughput-nya turun atau p99-nya naik lebih dari tolerance."""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        if result['events_per_sec'] < reference['events_per_sec'] * (1 - tolerance):
+            regressions.append({
+                'scenario': name, 'metric': 'events_per_sec',
+                'baseline': reference['events_per_sec'], 'current': result['events_per_sec']
+            })
+        if (
+            result['p99_ms'] > reference['p99_ms'] * (1 + tolerance)
+            and result['p99_ms'] - reference['p99_ms'] > LATENCY_NOISE_FLOOR_MS
+        ):
+            regressions.append({
+                'scenario': name, 'metric': 'p99_ms',
+                'baseline': reference['p99_ms'], 'current': result['p99_ms']
+            })
+    return regressions
+
+
+async def run_suite(scenarios: List[Scenario], concurrency: int) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for scenario in scenarios:
+        workdir = tempfile.mkdtemp(prefix="aggregator-bench-")
+        try:
+            if scenario.suite == "store":
+                results[scenario.name] = await run_store(scenario, workdir)
+            else:
+                results[scenario.name] = await run_app(scenario, workdir, concurrency)
+        finally:
+            shutil.rmtree(workdir)
+        print(f"{scenario.name}: {json.dumps(results[scenario.name])}", file=sys.stderr)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Aggregator benchmark suite")
+    parser.add_argument("--suite", choices=["store", "app", "all"], default="all")
+    parser.add_argument("--quick", action="store_true", help="Workload kecil (smoke run)")
+    parser.add_argument("--only", help="Hanya skenario yang namanya mengandung string ini")
+    parser.add_argument("--concurrency", type=int, default=4, help="Request paralel (suite app)")
+    parser.add_argument("--output", help="Tulis hasil JSON ke file (default stdout)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="File baseline JSON")
+    parser.add_argument("--save-baseline", action="store_true", help="Simpan hasil sebagai baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Toleransi regresi (fraksi)")
+    parser.add_argument("--log-level", default="ERROR", help="Log level aggregator selama benchmark")
+    args = parser.parse_args(argv)
+
+    # Log per event (EVENT PROCESSED / DUPLICATE DROPPED) bukan yang diukur
+    logging.basicConfig(level=args.log_level)
+    logging.getLogger().setLevel(args.log_level)
+
+    store_events, app_events, db_size = (2000, 1000, 10000) if args.quick else (20000, 10000, 100000)
+    scenarios = []
+    if args.suite in ("store", "all"):
+        scenarios += sweep("store", store_events, db_size)
+    if args.suite in ("app", "all"):
+        scenarios += sweep("app", app_events, db_size)
+    if args.only:
+        scenarios = [s for s in scenarios if args.only in s.name]
+
+    results = asyncio.run(run_suite(scenarios, args.concurrency))
+
+    report: Dict[str, Any] = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'quick': args.quick,
+        'scenarios': results
+    }
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('quick') != args.quick:
+            print("baseline workload size differs (--quick), skipping comparison", file=sys.stderr)
+        else:
+            report['regressions'] = compare(results, baseline['scenarios'], args.tolerance)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    regressions = report.get('regressions', [])
+    for regression in regressions:
+        print(
+            f"REGRESSION {regression['scenario']} {regression['metric']}: "
+            f"{regression['baseline']} -> {regression['current']}",
+            file=sys.stderr
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
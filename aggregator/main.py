@@ -8,21 +8,40 @@
 # - Persistent storage dengan SQLite
 
 import asyncio
+import hmac
 import logging
+import os
 import sqlite3
 import time
 from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Union
 
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field, field_validator
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, field_validator
 import uvicorn
 
 from src.config import Config
-from src.dedup_store import DedupStore
-from src.models import Event, PublishRequest, PublishResponse, Stats, EventsResponse
+from src.dedup_store import DedupStore, encode_cursor
+from src.sharded_store import ShardedDedupStore, create_store
+from src.models import (
+    Event, PublishRequest, PublishResponse, Stats, EventsResponse,
+    StreamLineError, StreamPublishResponse
+)
+from src.ndjson import iter_ndjson_lines
+from src.fast_decode import FastDecodeError, decode_publish_request
+from src.export import csv_header, format_csv, format_events_page, format_ndjson
+from src.worker_pool import WorkerPool, replay_ingest_log
+from src.ingest_log import IngestLog, encode_log_event
+from src.admission import AdmissionController, BatchTooLarge, Overloaded
+from src import metrics
+from src.loop_monitor import LoopLagMonitor
+from src.profiler import ProfilerBusy, SamplingProfiler
+from src.multiprocess import (
+    PID_HEADER, ROLE_INGEST, ROLE_OWNER, OwnerClient, OwnerUnavailable,
+    ProcessRegistry, run_multiprocess
+)
 
 # Setup logging
 logging.basicConfig(
@@ -32,83 +51,97 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Global variables
-dedup_store: Optional[DedupStore] = None
-event_queue: asyncio.Queue = None
+dedup_store: Optional[Union[DedupStore, ShardedDedupStore]] = None
+worker_pool: Optional[WorkerPool] = None
+ingest_log: Optional[IngestLog] = None
+admission: Optional[AdmissionController] = None
+loop_monitor: Optional[LoopLagMonitor] = None
+# Multi-process mode: owner_client hanya di ingest process,
+# process_registry hanya terisi di owner process
+owner_client: Optional[OwnerClient] = None
+process_registry = ProcessRegistry()
 start_time: datetime = datetime.utcnow()
-consumer_task: Optional[asyncio.Task] = None
-
-
-async def event_consumer():
-    logger.info("Event consumer started")
-    
-    while True:
-        try:
-            # Get event from queue
-            event: Event = await event_queue.get()
-            
-            # Check if duplicate (dalam transaksi untuk atomicity)
-            is_dup = await dedup_store.is_duplicate(event.topic, event.event_id)
-            
-            if is_dup:
-                # Event sudah pernah diproses, drop
-                await dedup_store.increment_duplicate_dropped()
-                logger.warning(
-                    f"DUPLICATE DROPPED - topic: {event.topic}, "
-                    f"event_id: {event.event_id}, source: {event.source}"
-                )
-            else:
-                # Event baru, process dalam transaksi
-                import json
-                payload_json = json.dumps(event.payload)
-                
-                success = await dedup_store.mark_processed(
-                    event.topic,
-                    event.event_id,
-                    event.timestamp,
-                    event.source,
-                    payload_json
-                )
-                
-                if success:
-                    await dedup_store.increment_unique_processed()
-                    logger.info(
-                        f"EVENT PROCESSED - topic: {event.topic}, "
-                        f"event_id: {event.event_id}, source: {event.source}"
-                    )
-                else:
-                    # Race condition: event sudah diproses saat kita check
-                    # Ini bisa terjadi dengan multiple workers
-                    await dedup_store.increment_duplicate_dropped()
-                    logger.warning(
-                        f"DUPLICATE DETECTED (race) - topic: {event.topic}, "
-                        f"event_id: {event.event_id}"
-                    )
-            
-            # Mark task done
-            event_queue.task_done()
-            
-        except Exception as e:
-            logger.error(f"Error in event consumer: {str(e)}", exc_info=True)
-            await asyncio.sleep(0.1)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global dedup_store, event_queue, consumer_task, start_time
+    global dedup_store, worker_pool, ingest_log, admission, loop_monitor, owner_client, start_time
+    
+    if Config.AGGREGATOR_ROLE == ROLE_INGEST:
+        # Ingest process: tanpa store / worker, semua event ke owner
+        owner_client = OwnerClient(Config.OWNER_SOCKET)
+        start_time = datetime.utcnow()
+        logger.info(f"Ingest process started, forwarding to owner at {Config.OWNER_SOCKET}")
+        
+        metrics_task = asyncio.create_task(push_metrics_loop(Config.METRICS_PUSH_INTERVAL))
+        
+        yield
+        
+        metrics_task.cancel()
+        try:
+            await metrics_task
+        except asyncio.CancelledError:
+            pass
+        await owner_client.close()
+        return
     
     logger.info("Starting Pub-Sub Log Aggregator...")
     Config.print_config()
     
     # Initialize dedup store dengan persistent SQLite
-    dedup_store = DedupStore(db_path=Config.DB_PATH)
+    # (sharded ke beberapa file jika DB_SHARDS > 1)
+    dedup_store = create_store(Config.DB_PATH, Config.DB_SHARDS)
     await dedup_store.initialize()
     
-    # Initialize event queue
-    event_queue = asyncio.Queue(maxsize=Config.QUEUE_MAX_SIZE)
+    # Durable ingest log: replay event yang belum diproses sebelum
+    # worker pool mulai membaca dari log
+    if Config.INGEST_LOG_DIR:
+        ingest_log = IngestLog(
+            Config.INGEST_LOG_DIR,
+            segment_max_bytes=Config.INGEST_LOG_SEGMENT_BYTES,
+            checkpoint_interval=Config.INGEST_LOG_CHECKPOINT_INTERVAL,
+            fsync=Config.INGEST_LOG_FSYNC
+        )
+        await ingest_log.open()
+        await replay_ingest_log(ingest_log, dedup_store, Config.BATCH_MAX_SIZE)
+    
+    # Initialize worker pool (queue per worker + single writer)
+    worker_pool = WorkerPool(
+        dedup_store,
+        num_workers=Config.NUM_WORKERS,
+        queue_max_size=Config.QUEUE_MAX_SIZE,
+        batch_max_size=Config.BATCH_MAX_SIZE,
+        batch_max_linger_ms=Config.BATCH_MAX_LINGER_MS,
+        ingest_log=ingest_log
+    )
+    worker_pool.start()
+    
+    # Admission control: depth = lag ingest log (termasuk event di queue
+    # worker) atau isi queue worker jika log nonaktif
+    def pending_events() -> int:
+        if ingest_log is not None:
+            return ingest_log.end_offset - ingest_log.acked_offset
+        return worker_pool.qsize()
+    
+    admission = AdmissionController(
+        max_depth=Config.ADMISSION_MAX_DEPTH,
+        depth_fn=pending_events,
+        processed_fn=worker_pool.processed_total,
+        retry_after_min=Config.ADMISSION_RETRY_AFTER_MIN,
+        retry_after_max=Config.ADMISSION_RETRY_AFTER_MAX
+    )
+    
+    # Gauge /metrics dibaca saat scrape
+    metrics.QUEUE_DEPTH.set_function(worker_pool.queue_depths)
+    metrics.PENDING_EVENTS.set_function(pending_events)
     
-    # Start consumer task
-    consumer_task = asyncio.create_task(event_consumer())
+    if Config.LOOP_LAG_INTERVAL > 0:
+        loop_monitor = LoopLagMonitor(
+            interval=Config.LOOP_LAG_INTERVAL,
+            warn_threshold=Config.LOOP_LAG_WARN_MS / 1000
+        )
+        loop_monitor.start()
     
     start_time = datetime.utcnow()
     
@@ -119,13 +152,16 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down aggregator...")
     
-    # Cancel consumer task
-    if consumer_task:
-        consumer_task.cancel()
-        try:
-            await consumer_task
-        except asyncio.CancelledError:
-            pass
+    if loop_monitor:
+        await loop_monitor.stop()
+    
+    # Stop worker pool
+    if worker_pool:
+        await worker_pool.stop()
+    
+    # Checkpoint terakhir; event yang belum diproses di-replay saat start
+    if ingest_log:
+        await ingest_log.close()
     
     # Close dedup store
     if dedup_store:
@@ -134,6 +170,17 @@ async def lifespan(app: FastAPI):
     logger.info("Aggregator stopped")
 
 
+async def push_metrics_loop(interval: float):
+    # Ingest process: histogram latency /publish* hanya terisi di process
+    # ini, kirim berkala ke owner agar masuk /metrics
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await owner_client.push_metrics(metrics.export_process_metrics())
+        except Exception as e:
+            logger.warning(f"Failed to push metrics to owner: {e}")
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Pub-Sub Log Aggregator",
@@ -142,69 +189,318 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Latency request publish (termasuk parsing + validasi body) untuk /metrics
+app.add_middleware(
+    metrics.RequestTimingMiddleware,
+    histogram=metrics.PUBLISH_SECONDS,
+    paths=["/publish", "/publish/fast", "/publish/stream", "/internal/ingest"]
+)
+
+
+@app.exception_handler(OwnerUnavailable)
+async def owner_unavailable_handler(request: Request, exc: OwnerUnavailable):
+    logger.error(f"Owner process unavailable: {exc}")
+    return JSONResponse(status_code=503, content={"detail": "owner process unavailable"})
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+@app.exception_handler(BatchTooLarge)
+async def batch_too_large_handler(request: Request, exc: BatchTooLarge):
+    return JSONResponse(status_code=413, content={"detail": str(exc)})
+
+
+# Exception yang di-handle exception_handler di atas, bukan sebagai 500
+PASSTHROUGH_ERRORS = (OwnerUnavailable, Overloaded, BatchTooLarge)
+
+
+async def enqueue_events(events, block: bool = False) -> PublishResponse:
+    if owner_client is not None:
+        # Ingest process: event sudah divalidasi, admission + dedup + persist di owner
+        return PublishResponse(**await owner_client.forward(events, block=block))
+    
+    # All-or-nothing: seluruh batch diterima atau 429 (block=True: tunggu
+    # kapasitas, untuk backpressure /publish/stream)
+    if block:
+        await admission.admit_wait(len(events))
+    else:
+        admission.admit(len(events))
+    
+    try:
+        # Increment received counter
+        await dedup_store.increment_received(len(events))
+        metrics.count_topics(metrics.RECEIVED, events)
+        
+        if ingest_log is not None:
+            # Event di-ack setelah durable di log; worker pool membaca dari log
+            await ingest_log.append([encode_log_event(event) for event in events])
+            message = f"Received {len(events)} events, {len(events)} durably logged for processing"
+        else:
+            # Kapasitas sudah direservasi; queue worker tanpa batas saat
+            # log nonaktif (ADMISSION_MAX_DEPTH yang membatasi total)
+            for event in events:
+                worker_pool.put_nowait(event)
+            message = f"Received {len(events)} events, queued {len(events)} for processing"
+    finally:
+        admission.release(len(events))
+    
+    return PublishResponse(
+        status="accepted",
+        received=len(events),
+        queued=len(events),
+        message=message
+    )
+
 
 @app.post("/publish", response_model=PublishResponse)
 async def publish_events(request: PublishRequest):
     try:
         events = request.events if isinstance(request.events, list) else [request.events]
+        return await enqueue_events(events)
         
-        # Increment received counter
-        await dedup_store.increment_received(len(events))
+    except PASSTHROUGH_ERRORS:
+        raise
+    except Exception as e:
+        logger.error(f"Error publishing events: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/publish/fast", response_model=PublishResponse)
+async def publish_events_fast(request: Request):
+    # Opt-in fast path: body yang sama dengan /publish, di-decode langsung
+    # dari bytes menjadi EventRecord tanpa validasi pydantic per event
+    try:
+        events = decode_publish_request(await request.body())
+    except FastDecodeError as e:
+        return JSONResponse(status_code=422, content={"detail": e.errors})
+    
+    try:
+        return await enqueue_events(events)
         
-        # Add events to queue untuk processing
-        queued_count = 0
-        for event in events:
+    except PASSTHROUGH_ERRORS:
+        raise
+    except Exception as e:
+        logger.error(f"Error publishing events: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Jumlah maksimum detail error per baris di response /publish/stream
+STREAM_MAX_REPORTED_ERRORS = 100
+
+
+@app.post("/publish/stream", response_model=StreamPublishResponse)
+async def publish_stream(request: Request):
+    # Body NDJSON (satu event per baris) dibaca per chunk, divalidasi dan
+    # di-enqueue per baris. admission.admit_wait() menunggu jika depth penuh,
+    # sehingga pembacaan body (dan pengirim) ikut tertahan (backpressure).
+    accepted = 0
+    rejected = 0
+    errors: List[StreamLineError] = []
+    
+    def reject(line_number: int, error: str):
+        nonlocal rejected
+        rejected += 1
+        if len(errors) < STREAM_MAX_REPORTED_ERRORS:
+            errors.append(StreamLineError(line=line_number, error=error))
+    
+    # Ingest process / ingest log aktif: event dikirim per BATCH_MAX_SIZE
+    # (forward ke owner, atau satu append + group fsync ke log). Owner tanpa
+    # log menunggu queue (block) sehingga backpressure tetap sampai ke sini
+    pending: List[Event] = []
+    
+    async def submit(event: Event):
+        if owner_client is None and ingest_log is None:
+            # Backpressure per event, tetap dibatasi ADMISSION_MAX_DEPTH
+            await admission.admit_wait(1)
+            try:
+                worker_pool.put_nowait(event)
+                await dedup_store.increment_received()
+                metrics.RECEIVED.inc(event.topic)
+            finally:
+                admission.release(1)
+            return
+        pending.append(event)
+        if len(pending) >= Config.BATCH_MAX_SIZE:
+            await flush_pending()
+    
+    async def flush_pending():
+        await enqueue_events(pending, block=True)
+        pending.clear()
+    
+    try:
+        async for line_number, line, error in iter_ndjson_lines(
+            request.stream(), Config.STREAM_MAX_LINE_BYTES
+        ):
+            if error is not None:
+                reject(line_number, str(error))
+                continue
+            
             try:
-                # Non-blocking put dengan timeout
-                await asyncio.wait_for(
-                    event_queue.put(event),
-                    timeout=Config.QUEUE_PUT_TIMEOUT
-                )
-                queued_count += 1
-            except asyncio.TimeoutError:
-                logger.warning(f"Queue full, dropping event {event.event_id}")
+                event = Event.model_validate_json(line)
+            except ValidationError as e:
+                reject(line_number, "; ".join(err['msg'] for err in e.errors()))
+                continue
+            
+            await submit(event)
+            accepted += 1
+        
+        if pending:
+            await flush_pending()
         
-        return PublishResponse(
-            status="accepted",
-            received=len(events),
-            queued=queued_count,
-            message=f"Received {len(events)} events, queued {queued_count} for processing"
+        return StreamPublishResponse(
+            status="accepted" if accepted else "rejected",
+            accepted=accepted,
+            rejected=rejected,
+            errors=errors
         )
         
+    except PASSTHROUGH_ERRORS:
+        raise
     except Exception as e:
-        logger.error(f"Error publishing events: {str(e)}", exc_info=True)
+        logger.error(f"Error publishing event stream: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/internal/ingest", response_model=PublishResponse, include_in_schema=False)
+async def internal_ingest(request: Request, block: bool = False):
+    # Endpoint owner untuk event dari ingest process (sudah divalidasi,
+    # decode ulang via fast path). Tidak tersedia di role lain.
+    if Config.AGGREGATOR_ROLE != ROLE_OWNER:
+        raise HTTPException(status_code=404, detail="Not Found")
+    
+    try:
+        events = decode_publish_request(await request.body())
+    except FastDecodeError as e:
+        return JSONResponse(status_code=422, content={"detail": e.errors})
+    
+    pid = request.headers.get(PID_HEADER)
+    if pid and pid.isdigit():
+        process_registry.record(int(pid), len(events))
+    
+    # block=True dari /publish/stream: tunggu kapasitas (backpressure)
+    return await enqueue_events(events, block=block)
+
+
+@app.post("/internal/metrics", include_in_schema=False)
+async def internal_metrics(request: Request):
+    # Endpoint owner untuk snapshot histogram dari ingest process
+    # (menggantikan snapshot sebelumnya dari pid yang sama)
+    if Config.AGGREGATOR_ROLE != ROLE_OWNER:
+        raise HTTPException(status_code=404, detail="Not Found")
+    
+    pid = request.headers.get(PID_HEADER)
+    if not pid or not pid.isdigit():
+        raise HTTPException(status_code=400, detail=f"missing {PID_HEADER} header")
+    metrics.import_process_metrics(pid, await request.json())
+    return {"status": "ok"}
+
+
+async def proxy_to_owner(path: str, params: Optional[dict] = None) -> Response:
+    # Read endpoint di ingest process: response owner diteruskan apa adanya
+    response = await owner_client.get(
+        path, {k: v for k, v in (params or {}).items() if v is not None}
+    )
+    # Content-Type diteruskan sebagai header (media_type akan menambah charset lagi)
+    return Response(
+        content=response.content,
+        status_code=response.status_code,
+        headers={"Content-Type": response.headers.get("content-type", "application/json")}
+    )
+
+
 @app.get("/events", response_model=EventsResponse)
 async def get_events(
     topic: Optional[str] = Query(None, description="Filter by topic"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum events to return"),
-    offset: int = Query(0, ge=0, description="Offset for pagination")
+    offset: int = Query(0, ge=0, description="Offset for pagination"),
+    cursor: Optional[str] = Query(None, description="Cursor dari next_cursor halaman sebelumnya")
 ):
+    if owner_client is not None:
+        params = {'topic': topic, 'limit': limit, 'offset': offset, 'cursor': cursor}
+        return await proxy_to_owner("/events", params)
+    
     try:
-        events = await dedup_store.get_events(
-            topic=topic,
-            limit=limit,
-            offset=offset
-        )
+        # Row mentah + payload JSON text disisipkan langsung ke body;
+        # response_model hanya untuk dokumentasi OpenAPI
+        with metrics.EVENTS_QUERY_SECONDS.time():
+            rows = await dedup_store.get_event_rows(
+                topic=topic,
+                limit=limit,
+                offset=offset,
+                cursor=cursor
+            )
+            
+            total = await dedup_store.count_events(topic=topic)
         
-        total = await dedup_store.count_events(topic=topic)
+        next_cursor = None
+        if len(rows) == limit:
+            last = rows[-1]
+            next_cursor = encode_cursor(last[6], last[0])
         
-        return EventsResponse(
-            events=events,
-            total=total,
-            limit=limit,
-            offset=offset
+        return Response(
+            content=format_events_page(rows, total, limit, offset, next_cursor),
+            media_type="application/json"
         )
         
+    except ValueError as e:
+        # Cursor tidak valid
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting events: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/events/export")
+async def export_events(
+    topic: Optional[str] = Query(None, description="Filter by topic"),
+    since: Optional[str] = Query(None, description="processed_at >= since (ISO8601)"),
+    until: Optional[str] = Query(None, description="processed_at < until (ISO8601)"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson atau csv")
+):
+    for name, value in (("since", since), ("until", until)):
+        if value is not None:
+            try:
+                datetime.fromisoformat(value)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"{name} harus format ISO8601")
+    
+    formatter = format_csv if format == "csv" else format_ndjson
+    
+    async def body():
+        if owner_client is not None:
+            params = {'topic': topic, 'since': since, 'until': until, 'format': format}
+            async for chunk in owner_client.stream(
+                "/events/export", {k: v for k, v in params.items() if v is not None}
+            ):
+                yield chunk
+            return
+        
+        # Stream langsung dari cursor SQLite per chunk (memori konstan)
+        if format == "csv":
+            yield csv_header()
+        async for rows in dedup_store.export_events(topic=topic, since=since, until=until):
+            yield formatter(rows)
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=events.{format}"}
+    )
+
+
 @app.get("/stats", response_model=Stats)
 async def get_stats():
+    if owner_client is not None:
+        return await proxy_to_owner("/stats")
+    
     try:
         stats = await dedup_store.get_stats()
         
@@ -219,8 +515,19 @@ async def get_stats():
             unique_processed=stats['unique_processed'],
             duplicate_dropped=stats['duplicate_dropped'],
             topics=topics,
+            topic_counts=await dedup_store.get_topic_counts(),
             uptime_seconds=int(uptime_seconds),
-            queue_size=event_queue.qsize() if event_queue else 0
+            queue_size=worker_pool.qsize() if worker_pool else 0,
+            workers=worker_pool.get_stats() if worker_pool else [],
+            dedup_cache=dedup_store.get_cache_stats(),
+            bloom_filter=dedup_store.get_bloom_stats(),
+            payload_compression=dedup_store.get_compression_stats(),
+            read_pool=dedup_store.get_read_pool_stats(),
+            ingest_processes=process_registry.get_stats(),
+            ingest_log=ingest_log.get_stats() if ingest_log else None,
+            admission=admission.get_stats() if admission else None,
+            retention=await dedup_store.get_retention_stats(),
+            event_loop=loop_monitor.get_stats() if loop_monitor else None
         )
         
     except Exception as e:
@@ -228,8 +535,66 @@ async def get_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/metrics")
+async def get_metrics():
+    # Prometheus text format; di ingest process di-proxy ke owner
+    # (counter dan histogram pipeline ada di owner). Snapshot lokal dikirim
+    # dulu agar latency /publish* process ini ikut ter-render.
+    if owner_client is not None:
+        await owner_client.push_metrics(metrics.export_process_metrics())
+        return await proxy_to_owner("/metrics")
+    
+    return Response(
+        content=metrics.render_metrics(),
+        headers={"Content-Type": metrics.CONTENT_TYPE}
+    )
+
+
+@app.get("/debug/profile", include_in_schema=False)
+async def debug_profile(
+    seconds: float = Query(10, gt=0, le=Config.PROFILE_MAX_SECONDS, description="Durasi sampling"),
+    idle: bool = Query(False, description="Sertakan thread yang sedang menunggu (select, wait)"),
+    x_admin_token: Optional[str] = Header(None)
+):
+    # Admin-only: nonaktif tanpa ADMIN_TOKEN. Yang di-profile adalah process
+    # yang melayani request ini (di multi-process mode: ingest process).
+    if not Config.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, Config.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="invalid admin token")
+    
+    profiler = SamplingProfiler(interval=Config.PROFILE_INTERVAL_MS / 1000, idle=idle)
+    try:
+        # Sampling di thread executor; event loop tetap melayani traffic
+        await asyncio.to_thread(profiler.run, seconds)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return Response(
+        content=profiler.collapsed().encode("utf-8"),
+        media_type="text/plain",
+        headers={
+            "Content-Disposition": f"attachment; filename=profile-{os.getpid()}.folded",
+            "X-Profile-Samples": str(profiler.samples)
+        }
+    )
+
+
 @app.get("/health")
 async def health_check():
+    if owner_client is not None:
+        try:
+            return await proxy_to_owner("/health")
+        except OwnerUnavailable as e:
+            return JSONResponse(
+                status_code=503,
+                content={
+                    "status": "unhealthy",
+                    "error": f"owner process unavailable: {e}",
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+            )
+    
     try:
         # Check database connection
         await dedup_store.health_check()
@@ -252,10 +617,13 @@ async def health_check():
 
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "main:app",
-        host=Config.HOST,
-        port=Config.PORT,
-        log_level=Config.LOG_LEVEL.lower(),
-        reload=False
-    )
+    if Config.INGEST_PROCESSES > 1:
+        run_multiprocess("main:app")
+    else:
+        uvicorn.run(
+            "main:app",
+            host=Config.HOST,
+            port=Config.PORT,
+            log_level=Config.LOG_LEVEL.lower(),
+            reload=False
+        )
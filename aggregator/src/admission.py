@@ -0,0 +1,163 @@
+"""
+Admission control berbasis queue depth untuk endpoint publish.
+
+Satu batch diterima seluruhnya atau ditolak seluruhnya (429). Keputusan
+memakai depth saat ini (event yang belum diproses) ditambah reservasi
+batch lain yang sedang di-enqueue, sehingga request bersamaan tidak bisa
+bersama-sama melewati batas. Retry-After dihitung dari kelebihan depth
+dibagi drain rate (EWMA event/detik yang diproses consumer).
+"""
+
+import asyncio
+import math
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .metrics import ADMISSION_EVENTS, ADMISSION_REQUESTS
+
+
+class Overloaded(Exception):
+    """Batch ditolak karena queue penuh; retry_after dalam detik."""
+
+    def __init__(self, retry_after: int, message: str):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BatchTooLarge(Exception):
+    """Batch lebih besar dari kapasitas admission (tidak akan pernah diterima)."""
+
+
+class AdmissionController:
+    """
+    depth_fn: jumlah event yang sedang menunggu diproses.
+    processed_fn: total event yang sudah diproses (monoton naik), untuk
+    mengukur drain rate.
+    """
+
+    # Drain rate di-sample paling sering setiap SAMPLE_INTERVAL detik
+    SAMPLE_INTERVAL = 0.25
+    EWMA_ALPHA = 0.3
+    # Interval polling admit_wait() saat kapasitas penuh
+    WAIT_POLL_INTERVAL = 0.01
+
+    def __init__(
+        self,
+        max_depth: int,
+        depth_fn: Callable[[], int],
+        processed_fn: Callable[[], int],
+        retry_after_min: int = 1,
+        retry_after_max: int = 30
+    ):
+        self.max_depth = max_depth
+        self.depth_fn = depth_fn
+        self.processed_fn = processed_fn
+        self.retry_after_min = retry_after_min
+        self.retry_after_max = retry_after_max
+
+        self._reserved = 0
+        self._drain_rate: Optional[float] = None
+        self._last_sample_at = time.monotonic()
+        self._last_processed = processed_fn()
+
+        self.admitted_requests = 0
+        self.admitted_events = 0
+        self.rejected_requests = 0
+        self.rejected_events = 0
+        self.waited_requests = 0
+        self.last_retry_after = 0
+
+    def _sample_drain_rate(self, depth: int):
+        now = time.monotonic()
+        elapsed = now - self._last_sample_at
+        if elapsed < self.SAMPLE_INTERVAL:
+            return
+        processed = self.processed_fn()
+        drained = processed - self._last_processed
+        self._last_sample_at = now
+        self._last_processed = processed
+
+        # Tanpa backlog dan tanpa event yang diproses, drain rate tidak
+        # terukur (idle), jangan tarik estimasi ke 0
+        if drained <= 0 and depth == 0:
+            return
+        sample = drained / elapsed
+        if self._drain_rate is None:
+            self._drain_rate = sample
+        else:
+            self._drain_rate = self.EWMA_ALPHA * sample + (1 - self.EWMA_ALPHA) * self._drain_rate
+
+    def retry_after(self, excess: int) -> int:
+        if not self._drain_rate:
+            return self.retry_after_max
+        seconds = math.ceil(excess / self._drain_rate)
+        return max(self.retry_after_min, min(self.retry_after_max, seconds))
+
+    def _excess(self, count: int) -> int:
+        if count > self.max_depth:
+            raise BatchTooLarge(
+                f"batch of {count} events exceeds admission limit {self.max_depth}"
+            )
+        depth = self.depth_fn()
+        self._sample_drain_rate(depth)
+        return depth + self._reserved + count - self.max_depth
+
+    def _reserve(self, count: int):
+        self._reserved += count
+        self.admitted_requests += 1
+        self.admitted_events += count
+        ADMISSION_REQUESTS.inc("admitted")
+        ADMISSION_EVENTS.inc("admitted", count)
+
+    def try_admit(self, count: int) -> Optional[int]:
+        """
+        Reservasi kapasitas untuk count event. Return None jika diterima
+        (panggil release(count) setelah event masuk queue/log), atau
+        Retry-After dalam detik jika ditolak.
+        """
+        excess = self._excess(count)
+        if excess > 0:
+            self.rejected_requests += 1
+            self.rejected_events += count
+            ADMISSION_REQUESTS.inc("rejected")
+            ADMISSION_EVENTS.inc("rejected", count)
+            self.last_retry_after = self.retry_after(excess)
+            return self.last_retry_after
+
+        self._reserve(count)
+        return None
+
+    def admit(self, count: int):
+        """Seperti try_admit, tapi raise Overloaded jika ditolak."""
+        retry_after = self.try_admit(count)
+        if retry_after is not None:
+            raise Overloaded(
+                retry_after,
+                f"queue overloaded, retry after {retry_after}s"
+            )
+
+    async def admit_wait(self, count: int):
+        """Backpressure (untuk /publish/stream): tunggu sampai kapasitas tersedia."""
+        if self._excess(count) > 0:
+            self.waited_requests += 1
+            ADMISSION_REQUESTS.inc("waited")
+            while self._excess(count) > 0:
+                await asyncio.sleep(self.WAIT_POLL_INTERVAL)
+        self._reserve(count)
+
+    def release(self, count: int):
+        self._reserved -= count
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'max_depth': self.max_depth,
+            'depth': self.depth_fn(),
+            'reserved': self._reserved,
+            'drain_rate': round(self._drain_rate or 0.0, 2),
+            'admitted_requests': self.admitted_requests,
+            'admitted_events': self.admitted_events,
+            'rejected_requests': self.rejected_requests,
+            'rejected_events': self.rejected_events,
+            'waited_requests': self.waited_requests,
+            'last_retry_after': self.last_retry_after
+        }
@@ -0,0 +1,209 @@
+"""
+Scalable Bloom filter untuk prefilter dedup lookup.
+
+Bloom filter tidak pernah memberi false negative: jika might_contain()
+return False, key PASTI belum pernah ditambahkan, sehingga SELECT ke
+processed_events bisa dilewati. False positive tetap dicek ke SQLite.
+
+Scalable: jika slice terakhir penuh, slice baru ditambahkan dengan
+kapasitas x GROWTH_FACTOR dan fp rate x TIGHTENING_RATIO, sehingga total
+fp rate tetap konvergen ke target.
+"""
+
+import hashlib
+import json
+import math
+import os
+from typing import Any, Dict, List, Optional
+
+GROWTH_FACTOR = 2
+TIGHTENING_RATIO = 0.5
+
+SNAPSHOT_MAGIC = b"DEDUPBLOOM1\n"
+
+
+def _key_bytes(topic: str, event_id: str) -> bytes:
+    return f"{topic}\x00{event_id}".encode("utf-8")
+
+
+class BloomFilter:
+    """Bloom filter klasik dengan double hashing (blake2b 128-bit)."""
+
+    def __init__(
+        self,
+        num_bits: int,
+        num_hashes: int,
+        capacity: int,
+        fp_rate: float,
+        bits: Optional[bytearray] = None,
+        count: int = 0
+    ):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+        self.count = count
+
+    @classmethod
+    def for_memory(cls, num_bytes: int, fp_rate: float) -> "BloomFilter":
+        """Buat filter dengan ukuran memori tertentu dan target fp rate."""
+        num_bits = max(64, num_bytes * 8)
+        # Kapasitas optimal: n = -m * (ln 2)^2 / ln p
+        capacity = max(1, int(-num_bits * (math.log(2) ** 2) / math.log(fp_rate)))
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return cls(num_bits, num_hashes, capacity, fp_rate)
+
+    def _positions(self, key: bytes):
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: bytes):
+        bits = self.bits
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: bytes) -> bool:
+        bits = self.bits
+        for pos in self._positions(key):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    @property
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+    def header(self) -> Dict[str, Any]:
+        return {
+            'num_bits': self.num_bits,
+            'num_hashes': self.num_hashes,
+            'capacity': self.capacity,
+            'fp_rate': self.fp_rate,
+            'count': self.count
+        }
+
+
+class ScalableBloomFilter:
+    """
+    Kumpulan BloomFilter slice yang bertambah sesuai jumlah key.
+
+    initial_bytes: ukuran memori slice pertama
+    fp_rate: target false-positive rate keseluruhan
+    """
+
+    def __init__(self, fp_rate: float, initial_bytes: int):
+        self.fp_rate = fp_rate
+        self.initial_bytes = initial_bytes
+        # Slice pertama memakai fp_rate * (1 - r) agar jumlah deret
+        # geometrik fp semua slice <= fp_rate
+        self.filters: List[BloomFilter] = [
+            BloomFilter.for_memory(initial_bytes, fp_rate * (1 - TIGHTENING_RATIO))
+        ]
+
+    def add(self, topic: str, event_id: str):
+        current = self.filters[-1]
+        if current.is_full:
+            current = BloomFilter.for_memory(
+                math.ceil(current.num_bits / 8) * GROWTH_FACTOR,
+                current.fp_rate * TIGHTENING_RATIO
+            )
+            self.filters.append(current)
+        current.add(_key_bytes(topic, event_id))
+
+    def might_contain(self, topic: str, event_id: str) -> bool:
+        key = _key_bytes(topic, event_id)
+        # Slice terbaru paling mungkin berisi key baru
+        for bloom in reversed(self.filters):
+            if key in bloom:
+                return True
+        return False
+
+    @property
+    def count(self) -> int:
+        return sum(bloom.count for bloom in self.filters)
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(len(bloom.bits) for bloom in self.filters)
+
+    def estimated_fp_rate(self) -> float:
+        """Estimasi fp rate aktual: 1 - prod(1 - fp_i) dengan fp_i per slice."""
+        keep = 1.0
+        for bloom in self.filters:
+            if bloom.count == 0:
+                continue
+            fill = 1 - math.exp(-bloom.num_hashes * bloom.count / bloom.num_bits)
+            keep *= 1 - fill ** bloom.num_hashes
+        return 1 - keep
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'filters': len(self.filters),
+            'keys': self.count,
+            'memory_bytes': self.memory_bytes,
+            'target_fp_rate': self.fp_rate,
+            'estimated_fp_rate': round(self.estimated_fp_rate(), 6)
+        }
+
+    def save(self, path: str, last_id: int, db_token: str):
+        """
+        Simpan snapshot secara atomic (tulis ke file tmp lalu rename).
+
+        last_id: processed_events.id tertinggi yang sudah masuk filter.
+        db_token: identitas database sumber key (lihat DedupStore).
+        """
+        header = {
+            'last_id': last_id,
+            'db_token': db_token,
+            'fp_rate': self.fp_rate,
+            'initial_bytes': self.initial_bytes,
+            'filters': [bloom.header() for bloom in self.filters]
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            for bloom in self.filters:
+                f.write(bloom.bits)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, fp_rate: float, initial_bytes: int, db_token: str):
+        """
+        Load snapshot. Return (filter, last_id), atau None jika snapshot
+        tidak ada, rusak, dibuat dengan konfigurasi berbeda, atau berasal
+        dari database lain (db_token berbeda).
+        """
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, "rb") as f:
+                if f.readline() != SNAPSHOT_MAGIC:
+                    return None
+                header = json.loads(f.readline())
+                if header['fp_rate'] != fp_rate or header['initial_bytes'] != initial_bytes:
+                    return None
+                if header.get('db_token') != db_token:
+                    return None
+
+                instance = cls(fp_rate, initial_bytes)
+                instance.filters = []
+                for meta in header['filters']:
+                    num_bytes = (meta['num_bits'] + 7) // 8
+                    bits = bytearray(f.read(num_bytes))
+                    if len(bits) != num_bytes:
+                        return None
+                    instance.filters.append(BloomFilter(bits=bits, **meta))
+                if not instance.filters:
+                    return None
+                return instance, int(header['last_id'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
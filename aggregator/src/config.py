@@ -20,6 +20,27 @@ class Config:
     # Database configuration
     DB_PATH: str = os.getenv("DB_PATH", "/var/lib/aggregator/dedup.db")
     
+    # Jumlah shard SQLite (1 = single file di DB_PATH)
+    # Shard disimpan di direktori DB_PATH: dedup.shard00-of-04.db, dst.
+    # Mengubah nilai ini untuk data yang sudah ada: python -m tools.reshard
+    DB_SHARDS: int = int(os.getenv("DB_SHARDS", "1"))
+    
+    # Retention window dedup (partisi waktu processed_at)
+    # RETENTION_WINDOW_SECONDS: 0 = simpan selamanya (processed_events biasa);
+    # > 0 = event disimpan di tabel per bucket dan bucket yang seluruhnya
+    # lebih tua dari window di-DROP. Dedup dijamin selama window ini.
+    # RETENTION_BUCKET_SECONDS: lebar satu bucket (unit expiry)
+    # RETENTION_CHECK_INTERVAL: interval (detik) pengecekan bucket expired
+    RETENTION_WINDOW_SECONDS: int = int(os.getenv("RETENTION_WINDOW_SECONDS", "0"))
+    RETENTION_BUCKET_SECONDS: int = int(os.getenv("RETENTION_BUCKET_SECONDS", "86400"))
+    RETENTION_CHECK_INTERVAL: float = float(os.getenv("RETENTION_CHECK_INTERVAL", "60"))
+    
+    # Jumlah connection read-only untuk query API (/events, /health)
+    READ_POOL_SIZE: int = int(os.getenv("READ_POOL_SIZE", "4"))
+    # Connection read-only terpisah untuk /events/export, sehingga download
+    # lambat tidak menahan connection milik /events dan /health
+    EXPORT_POOL_SIZE: int = int(os.getenv("EXPORT_POOL_SIZE", "2"))
+    
     # Isolation level: READ_COMMITTED, SERIALIZABLE
     # READ_COMMITTED: lebih cepat, tapi bisa phantom reads
     # SERIALIZABLE: paling strict, tapi lebih lambat
@@ -28,7 +49,62 @@ class Config:
     
     # Queue configuration
     QUEUE_MAX_SIZE: int = int(os.getenv("QUEUE_MAX_SIZE", "10000"))
-    QUEUE_PUT_TIMEOUT: float = float(os.getenv("QUEUE_PUT_TIMEOUT", "1.0"))
+    
+    # Admission control publish (all-or-nothing per batch, 429 + Retry-After)
+    # ADMISSION_MAX_DEPTH: maksimum event menunggu diproses (queue / lag ingest log)
+    # ADMISSION_RETRY_AFTER_MIN/MAX: batas Retry-After (detik)
+    ADMISSION_MAX_DEPTH: int = int(os.getenv("ADMISSION_MAX_DEPTH", str(QUEUE_MAX_SIZE)))
+    ADMISSION_RETRY_AFTER_MIN: int = int(os.getenv("ADMISSION_RETRY_AFTER_MIN", "1"))
+    ADMISSION_RETRY_AFTER_MAX: int = int(os.getenv("ADMISSION_RETRY_AFTER_MAX", "30"))
+    
+    # Durable ingest log (event di-fsync ke log sebelum di-ack)
+    # INGEST_LOG_DIR: direktori segment + checkpoint, "" = nonaktif
+    # (event hanya di queue in-memory seperti sebelumnya)
+    # INGEST_LOG_SEGMENT_BYTES: ukuran segment sebelum rotate
+    # INGEST_LOG_CHECKPOINT_INTERVAL: interval (detik) simpan checkpoint consumer
+    # INGEST_LOG_FSYNC: false hanya untuk testing (tidak durable saat crash OS)
+    INGEST_LOG_DIR: str = os.getenv("INGEST_LOG_DIR", "/var/lib/aggregator/ingest-log")
+    INGEST_LOG_SEGMENT_BYTES: int = int(os.getenv("INGEST_LOG_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+    INGEST_LOG_CHECKPOINT_INTERVAL: float = float(os.getenv("INGEST_LOG_CHECKPOINT_INTERVAL", "1.0"))
+    INGEST_LOG_FSYNC: bool = os.getenv("INGEST_LOG_FSYNC", "true").lower() == "true"
+    
+    # Kompresi payload di SQLite (zlib + dictionary per topic)
+    # PAYLOAD_COMPRESSION: payload baru dikompresi dan row lama dikompresi
+    # oleh migrasi background; row terkompresi tetap terbaca jika dimatikan
+    # PAYLOAD_DICT_SAMPLES: jumlah sampel payload per topic sebelum dictionary dilatih
+    # PAYLOAD_DICT_MAX_BYTES: ukuran maksimum dictionary
+    # PAYLOAD_MIGRATION_BATCH: row lama per transaksi migrasi
+    PAYLOAD_COMPRESSION: bool = os.getenv("PAYLOAD_COMPRESSION", "false").lower() == "true"
+    PAYLOAD_COMPRESSION_LEVEL: int = int(os.getenv("PAYLOAD_COMPRESSION_LEVEL", "6"))
+    PAYLOAD_DICT_SAMPLES: int = int(os.getenv("PAYLOAD_DICT_SAMPLES", "200"))
+    PAYLOAD_DICT_MAX_BYTES: int = int(os.getenv("PAYLOAD_DICT_MAX_BYTES", "4096"))
+    PAYLOAD_MIGRATION_BATCH: int = int(os.getenv("PAYLOAD_MIGRATION_BATCH", "500"))
+    
+    # Batas ukuran satu baris (satu event) di /publish/stream
+    STREAM_MAX_LINE_BYTES: int = int(os.getenv("STREAM_MAX_LINE_BYTES", str(1024 * 1024)))
+    
+    # Batch configuration (group commit di consumer)
+    # BATCH_MAX_SIZE: jumlah maksimum event per transaksi
+    # BATCH_MAX_LINGER_MS: waktu maksimum menunggu batch terisi sebelum commit
+    BATCH_MAX_SIZE: int = int(os.getenv("BATCH_MAX_SIZE", "500"))
+    BATCH_MAX_LINGER_MS: float = float(os.getenv("BATCH_MAX_LINGER_MS", "10"))
+    
+    # Dedup cache configuration (LRU in-memory di depan SQLite)
+    # Budget memori dalam bytes, 0 = nonaktif
+    DEDUP_CACHE_MAX_BYTES: int = int(os.getenv("DEDUP_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    
+    # Bloom filter prefilter (negative lookup tanpa SELECT)
+    # BLOOM_FILTER: auto = hanya jika dipakai di jalur ingest (retention mode),
+    # on = selalu (juga untuk is_duplicate), off = nonaktif
+    # BLOOM_FP_RATE: target false-positive rate keseluruhan
+    # BLOOM_MEMORY_BYTES: ukuran slice pertama (bertambah x2 saat penuh), 0 = nonaktif
+    # Snapshot disimpan di DB_PATH + ".bloom"
+    BLOOM_FILTER: str = os.getenv("BLOOM_FILTER", "auto")
+    BLOOM_FP_RATE: float = float(os.getenv("BLOOM_FP_RATE", "0.01"))
+    BLOOM_MEMORY_BYTES: int = int(os.getenv("BLOOM_MEMORY_BYTES", str(1024 * 1024)))
+    
+    # Interval (detik) flush counter stats in-memory ke database
+    STATS_FLUSH_INTERVAL: float = float(os.getenv("STATS_FLUSH_INTERVAL", "1.0"))
     
     # Logging configuration
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
@@ -37,6 +113,31 @@ class Config:
     # Worker configuration (untuk concurrent processing)
     NUM_WORKERS: int = int(os.getenv("NUM_WORKERS", "3"))
     
+    # Multi-process mode (lihat src/multiprocess.py)
+    # INGEST_PROCESSES > 1: satu owner process (store + worker) di OWNER_SOCKET,
+    # N ingest process uvicorn di HOST:PORT yang mem-forward event ke owner.
+    # AGGREGATOR_ROLE di-set oleh supervisor: standalone, owner, ingest
+    INGEST_PROCESSES: int = int(os.getenv("INGEST_PROCESSES", "1"))
+    OWNER_SOCKET: str = os.getenv("OWNER_SOCKET", "/var/lib/aggregator/owner.sock")
+    AGGREGATOR_ROLE: str = os.getenv("AGGREGATOR_ROLE", "standalone")
+    # METRICS_PUSH_INTERVAL: interval (detik) ingest process mengirim
+    # histogram lokal (latency /publish*) ke owner untuk /metrics
+    METRICS_PUSH_INTERVAL: float = float(os.getenv("METRICS_PUSH_INTERVAL", "5"))
+    
+    # Endpoint admin (/debug/profile), header X-Admin-Token
+    # ADMIN_TOKEN: "" = endpoint debug nonaktif (404)
+    # PROFILE_MAX_SECONDS: batas parameter seconds
+    # PROFILE_INTERVAL_MS: jeda antar sample profiler
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+    PROFILE_MAX_SECONDS: int = int(os.getenv("PROFILE_MAX_SECONDS", "60"))
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    
+    # Monitor lag event loop (/stats event_loop, /metrics)
+    # LOOP_LAG_INTERVAL: interval pengukuran (detik), 0 = nonaktif
+    # LOOP_LAG_WARN_MS: lag yang dihitung sebagai blocked + log warning
+    LOOP_LAG_INTERVAL: float = float(os.getenv("LOOP_LAG_INTERVAL", "0.1"))
+    LOOP_LAG_WARN_MS: float = float(os.getenv("LOOP_LAG_WARN_MS", "100"))
+    
     @classmethod
     def get_log_level(cls) -> int:
         """Convert log level string to logging level."""
@@ -57,8 +158,25 @@ class Config:
         print("="*60)
         print(f"Host: {cls.HOST}:{cls.PORT}")
         print(f"Database: {cls.DB_PATH}")
+        print(f"Database Shards: {cls.DB_SHARDS}")
+        print(f"Retention Window: {cls.RETENTION_WINDOW_SECONDS}s (0 = disabled)")
+        print(f"Retention Bucket: {cls.RETENTION_BUCKET_SECONDS}s")
+        print(f"Read Pool Size: {cls.READ_POOL_SIZE}")
+        print(f"Export Pool Size: {cls.EXPORT_POOL_SIZE}")
         print(f"Isolation Level: {cls.ISOLATION_LEVEL}")
         print(f"Queue Max Size: {cls.QUEUE_MAX_SIZE}")
+        print(f"Admission Max Depth: {cls.ADMISSION_MAX_DEPTH}")
+        print(f"Ingest Log: {cls.INGEST_LOG_DIR or 'disabled'}")
+        print(f"Batch Max Size: {cls.BATCH_MAX_SIZE}")
+        print(f"Batch Max Linger: {cls.BATCH_MAX_LINGER_MS}ms")
+        print(f"Dedup Cache Max Bytes: {cls.DEDUP_CACHE_MAX_BYTES}")
+        print(f"Payload Compression: {cls.PAYLOAD_COMPRESSION} (level {cls.PAYLOAD_COMPRESSION_LEVEL})")
+        print(f"Bloom Filter: {cls.BLOOM_FILTER}, fp_rate={cls.BLOOM_FP_RATE}, memory={cls.BLOOM_MEMORY_BYTES} bytes")
+        print(f"Stats Flush Interval: {cls.STATS_FLUSH_INTERVAL}s")
         print(f"Log Level: {cls.LOG_LEVEL}")
         print(f"Workers: {cls.NUM_WORKERS}")
+        print(f"Role: {cls.AGGREGATOR_ROLE} (ingest processes: {cls.INGEST_PROCESSES})")
+        print(f"Metrics Push Interval: {cls.METRICS_PUSH_INTERVAL}s")
+        print(f"Loop Lag Monitor: {cls.LOOP_LAG_INTERVAL}s interval (0 = disabled)")
+        print(f"Debug Endpoints: {'enabled' if cls.ADMIN_TOKEN else 'disabled'}")
         print("="*60 + "\n")
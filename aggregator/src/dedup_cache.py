@@ -0,0 +1,95 @@
+"""
+In-memory LRU cache untuk key (topic, event_id) yang baru saja dilihat.
+
+Cache ini hanya mempercepat penolakan duplikat yang "panas"; UNIQUE
+constraint di SQLite tetap menjadi sumber kebenaran. Key hanya boleh
+dimasukkan setelah event-nya ter-commit di database.
+"""
+
+import sys
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+DedupKey = Tuple[str, str]
+
+# Perkiraan overhead per entry: tuple key (2 item) + node OrderedDict
+# (hash entry + linked list node)
+ENTRY_OVERHEAD_BYTES = 56 + 104
+
+
+class RecentKeyCache:
+    """
+    LRU cache dengan budget memori (dalam bytes).
+
+    max_bytes <= 0 berarti cache dinonaktifkan.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max(0, max_bytes)
+        self._entries: "OrderedDict[DedupKey, int]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def _entry_size(key: DedupKey) -> int:
+        return sys.getsizeof(key[0]) + sys.getsizeof(key[1]) + ENTRY_OVERHEAD_BYTES
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def contains(self, key: DedupKey) -> bool:
+        """Lookup dengan update LRU order dan hit/miss counter."""
+        if not self.enabled:
+            return False
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def add(self, key: DedupKey):
+        if not self.enabled:
+            return
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+
+        size = self._entry_size(key)
+        if size > self.max_bytes:
+            return
+
+        self._entries[key] = size
+        self._bytes += size
+
+        while self._bytes > self.max_bytes:
+            _, evicted_size = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def discard(self, key: DedupKey):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._bytes -= size
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
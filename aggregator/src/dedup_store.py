@@ -1,22 +1,162 @@
 
 import aiosqlite
 import asyncio
+import base64
 import logging
 import json
 import os
-from typing import List, Dict, Any, Optional
+import uuid
+from typing import List, Dict, Any, AsyncIterator, Optional, Sequence, Tuple
 from datetime import datetime
 
 from .config import Config
+from .dedup_cache import RecentKeyCache
+from .bloom import ScalableBloomFilter
+from .read_pool import ReadConnectionPool
+from .payload_codec import PayloadCodec, StoredPayload
+from .metrics import COMMIT_SECONDS, DEDUP_PROBE_SECONDS, MARK_PROCESSED_SECONDS
 
 logger = logging.getLogger(__name__)
 
+# (topic, event_id, timestamp, source, payload_json)
+EventRow = Tuple[str, str, str, str, str]
+
+
+class PartialCommitError(Exception):
+    """
+    mark_processed_many gagal sebagian (mis. satu shard gagal commit).
+
+    results sejajar dengan input: True/False untuk event yang sudah
+    ter-commit (counter-nya sudah di-update), None untuk event yang harus
+    dikirim ulang. Retry seluruh batch akan menghitung event yang sudah
+    ter-commit sebagai duplikat.
+    """
+    
+    def __init__(self, results: List[Optional[bool]], cause: BaseException):
+        super().__init__(str(cause))
+        self.results = results
+        self.cause = cause
+
+
+def encode_cursor(processed_at: str, event_row_id: int) -> str:
+    """Opaque cursor untuk keyset pagination pada (processed_at, id)."""
+    raw = json.dumps([processed_at, event_row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Decode cursor dari encode_cursor. Raise ValueError jika tidak valid."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        processed_at, event_row_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ValueError("cursor tidak valid")
+    if not isinstance(processed_at, str) or not isinstance(event_row_id, int):
+        raise ValueError("cursor tidak valid")
+    return processed_at, event_row_id
+
+
+
+def event_from_row(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    """Row dari get_event_rows -> dict event (payload di-parse)."""
+    return {
+        'id': row[0],
+        'topic': row[1],
+        'event_id': row[2],
+        'timestamp': row[3],
+        'source': row[4],
+        'payload': json.loads(row[5]),
+        'processed_at': row[6]
+    }
+
 
 class DedupStore:
     
-    def __init__(self, db_path: str):
+    # Bloom filter dipakai di jalur ingest (mark_processed_many)? Jika tidak,
+    # BLOOM_FILTER=auto tidak membangunnya (hanya is_duplicate yang membaca)
+    BLOOM_IN_WRITE_PATH = False
+    
+    def __init__(
+        self,
+        db_path: str,
+        cache_max_bytes: Optional[int] = None,
+        bloom_fp_rate: Optional[float] = None,
+        bloom_memory_bytes: Optional[int] = None,
+        read_pool_size: Optional[int] = None,
+        compress_payloads: Optional[bool] = None,
+        export_pool_size: Optional[int] = None,
+        bloom_filter: Optional[str] = None
+    ):
         self.db_path = db_path
+        # self.db: dedicated writer connection (dan lookup dedup)
+        # self.read_pool: connection read-only untuk query API
+        # self.export_pool: connection read-only khusus bulk export
         self.db: Optional[aiosqlite.Connection] = None
+        self.read_pool = ReadConnectionPool(
+            db_path,
+            max(1, read_pool_size if read_pool_size is not None else Config.READ_POOL_SIZE)
+        )
+        self.export_pool = ReadConnectionPool(
+            db_path,
+            max(1, export_pool_size if export_pool_size is not None else Config.EXPORT_POOL_SIZE)
+        )
+        
+        # LRU cache key yang sudah ter-commit, untuk menolak duplikat
+        # panas tanpa query ke SQLite
+        if cache_max_bytes is None:
+            cache_max_bytes = Config.DEDUP_CACHE_MAX_BYTES
+        self.cache = RecentKeyCache(cache_max_bytes)
+        
+        # Bloom filter untuk negative lookup, snapshot di samping file DB
+        self.bloom_fp_rate = bloom_fp_rate if bloom_fp_rate is not None else Config.BLOOM_FP_RATE
+        self.bloom_memory_bytes = (
+            bloom_memory_bytes if bloom_memory_bytes is not None else Config.BLOOM_MEMORY_BYTES
+        )
+        bloom_filter = bloom_filter if bloom_filter is not None else Config.BLOOM_FILTER
+        if bloom_filter not in ("auto", "on", "off"):
+            raise ValueError(f"bloom_filter harus auto, on atau off (bukan {bloom_filter!r})")
+        self.bloom_enabled = self.bloom_memory_bytes > 0 and (
+            bloom_filter == "on" or (bloom_filter == "auto" and self.BLOOM_IN_WRITE_PATH)
+        )
+        self.bloom_path = f"{db_path}.bloom"
+        self.bloom: Optional[ScalableBloomFilter] = None
+        # Identitas file DB (store_meta), mengikat snapshot bloom ke DB ini
+        self._db_token = ""
+        self._bloom_skipped = 0
+        self._bloom_checked = 0
+        
+        # Kompresi payload; decode selalu aktif untuk row yang sudah terkompresi
+        self.codec = PayloadCodec(
+            enabled=compress_payloads if compress_payloads is not None else Config.PAYLOAD_COMPRESSION,
+            level=Config.PAYLOAD_COMPRESSION_LEVEL,
+            dict_samples=Config.PAYLOAD_DICT_SAMPLES,
+            dict_max_bytes=Config.PAYLOAD_DICT_MAX_BYTES
+        )
+        # Migrasi background: row dengan id <= _migration_target dikompresi,
+        # progress (_migrated_id) disimpan di payload_migration
+        self._migrated_id = 0
+        self._migration_target = 0
+        self._migrated_rows = 0
+        self._migration_task: Optional[asyncio.Task] = None
+        
+        # Counter statistik di memori, di-flush ke tabel stats secara periodik.
+        # _last_event_id: processed_events.id tertinggi yang sudah di-commit;
+        # disimpan bersama counter sebagai watermark untuk rekonsiliasi
+        # setelah crash.
+        self._counters: Dict[str, int] = {
+            'received': 0,
+            'unique_processed': 0,
+            'duplicate_dropped': 0
+        }
+        self._last_event_id = 0
+        self._stats_dirty = False
+        
+        # Cache in-process dari tabel topics: topic -> jumlah event
+        self._topics: Dict[str, int] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        # Serialisasi semua write di satu connection
+        # (BEGIN IMMEDIATE tidak boleh nested, dan UPDATE stats tidak boleh
+        # ikut ter-commit di tengah transaksi batch)
         self._lock = asyncio.Lock()
         
         # Ensure directory exists
@@ -38,6 +178,144 @@ class DedupStore:
         await self.db.execute("PRAGMA journal_mode=WAL")
         await self.db.execute("PRAGMA synchronous=NORMAL")
         
+        await self._create_event_tables()
+        
+        async with self.db.execute(
+            f"SELECT COALESCE(MAX(id), 0) FROM {self._events_source()}"
+        ) as cursor:
+            self._last_event_id = (await cursor.fetchone())[0]
+        
+        # Topic registry + jumlah event per topic, di-update di transaksi
+        # yang sama dengan insert event
+        async with self.db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'topics'"
+        ) as cursor:
+            topics_exists = await cursor.fetchone() is not None
+        
+        await self.db.execute("""
+            CREATE TABLE IF NOT EXISTS topics (
+                topic TEXT PRIMARY KEY,
+                event_count INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+        """)
+        
+        if not topics_exists:
+            # Backfill sekali untuk database lama
+            await self.db.execute(f"""
+                INSERT OR IGNORE INTO topics (topic, event_count)
+                SELECT topic, COUNT(*) FROM {self._events_source()} GROUP BY topic
+            """)
+        else:
+            async with self.db.execute("PRAGMA table_info(topics)") as cursor:
+                topic_columns = [row[1] async for row in cursor]
+            if 'event_count' not in topic_columns:
+                # Migrasi registry tanpa counter
+                await self.db.execute(
+                    "ALTER TABLE topics ADD COLUMN event_count INTEGER NOT NULL DEFAULT 0"
+                )
+                await self._recompute_topic_counts()
+        
+        # Create stats table
+        # last_event_id: watermark processed_events.id saat counter di-flush
+        await self.db.execute("""
+            CREATE TABLE IF NOT EXISTS stats (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                received INTEGER NOT NULL DEFAULT 0,
+                unique_processed INTEGER NOT NULL DEFAULT 0,
+                duplicate_dropped INTEGER NOT NULL DEFAULT 0,
+                last_event_id INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        
+        # Migrasi database lama: counter lama di-commit per event sehingga
+        # sudah konsisten dengan seluruh isi processed_events
+        async with self.db.execute("PRAGMA table_info(stats)") as cursor:
+            columns = [row[1] async for row in cursor]
+        if 'last_event_id' not in columns:
+            await self.db.execute(
+                "ALTER TABLE stats ADD COLUMN last_event_id INTEGER NOT NULL DEFAULT 0"
+            )
+            await self.db.execute(
+                "UPDATE stats SET last_event_id = ? WHERE id = 1",
+                (self._last_event_id,)
+            )
+        
+        # Initialize stats if not exists
+        await self.db.execute("""
+            INSERT OR IGNORE INTO stats (id, received, unique_processed, duplicate_dropped)
+            VALUES (1, 0, 0, 0)
+        """)
+        
+        # Dictionary kompresi payload per topic (immutable, direferensikan row)
+        await self.db.execute("""
+            CREATE TABLE IF NOT EXISTS payload_dicts (
+                id INTEGER PRIMARY KEY,
+                topic TEXT NOT NULL,
+                dictionary BLOB NOT NULL
+            )
+        """)
+        await self.db.execute("""
+            CREATE TABLE IF NOT EXISTS payload_migration (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                migrated_id INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        await self.db.execute("INSERT OR IGNORE INTO payload_migration (id, migrated_id) VALUES (1, 0)")
+        
+        # Token acak dibuat sekali saat DB dibuat; DB yang dibuat ulang di
+        # path yang sama mendapat token baru
+        await self.db.execute("""
+            CREATE TABLE IF NOT EXISTS store_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        """)
+        await self.db.execute(
+            "INSERT OR IGNORE INTO store_meta (key, value) VALUES ('db_token', ?)",
+            (uuid.uuid4().hex,)
+        )
+        
+        await self.db.commit()
+        
+        logger.info("Database schema initialized")
+        
+        async with self.db.execute("SELECT topic, event_count FROM topics") as cursor:
+            self._topics = {row[0]: row[1] async for row in cursor}
+        
+        async with self.db.execute("SELECT id, topic, dictionary FROM payload_dicts") as cursor:
+            self.codec.load([row async for row in cursor])
+        
+        async with self.db.execute("SELECT value FROM store_meta WHERE key = 'db_token'") as cursor:
+            self._db_token = (await cursor.fetchone())[0]
+        
+        await self._load_stats()
+        await self._load_bloom()
+        
+        # Reader dibuka setelah schema dan WAL mode siap
+        await self.read_pool.open()
+        await self.export_pool.open()
+        
+        if Config.STATS_FLUSH_INTERVAL > 0:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        
+        if self.codec.enabled:
+            # Row yang di-insert setelah ini sudah dikompresi saat insert
+            async with self.db.execute("SELECT migrated_id FROM payload_migration WHERE id = 1") as cursor:
+                self._migrated_id = (await cursor.fetchone())[0]
+            self._migration_target = self._last_event_id
+            if self._migrated_id < self._migration_target:
+                self._migration_task = asyncio.create_task(self._migration_loop())
+    
+    async def _create_event_tables(self):
+        async with self.db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'retention_buckets'"
+        ) as cursor:
+            if await cursor.fetchone() is not None:
+                raise RuntimeError(
+                    f"{self.db_path} stores events in retention buckets; "
+                    f"set RETENTION_WINDOW_SECONDS to open it"
+                )
+        
         # Create processed_events table dengan unique constraint
         await self.db.execute("""
             CREATE TABLE IF NOT EXISTS processed_events (
@@ -63,33 +341,116 @@ class DedupStore:
             ON processed_events(topic)
         """)
         
-        # Create stats table
+        # Index untuk keyset pagination GET /events (ORDER BY processed_at, id)
         await self.db.execute("""
-            CREATE TABLE IF NOT EXISTS stats (
-                id INTEGER PRIMARY KEY CHECK (id = 1),
-                received INTEGER NOT NULL DEFAULT 0,
-                unique_processed INTEGER NOT NULL DEFAULT 0,
-                duplicate_dropped INTEGER NOT NULL DEFAULT 0
-            )
+            CREATE INDEX IF NOT EXISTS idx_processed_at_id
+            ON processed_events(processed_at, id)
         """)
         
-        # Initialize stats if not exists
         await self.db.execute("""
-            INSERT OR IGNORE INTO stats (id, received, unique_processed, duplicate_dropped)
-            VALUES (1, 0, 0, 0)
+            CREATE INDEX IF NOT EXISTS idx_topic_processed_at_id
+            ON processed_events(topic, processed_at, id)
         """)
+    
+    def _events_source(self) -> str:
+        """Sumber FROM untuk query agregat atas seluruh event yang tersimpan."""
+        return "processed_events"
+    
+    def _event_tables(self) -> List[str]:
+        """Tabel event, urut id (untuk migrasi payload)."""
+        return ["processed_events"]
+    
+    def _utcnow(self) -> datetime:
+        return datetime.utcnow()
+    
+    async def _load_stats(self):
+        async with self.db.execute(
+            "SELECT received, unique_processed, duplicate_dropped, last_event_id "
+            "FROM stats WHERE id = 1"
+        ) as cursor:
+            received, unique_processed, duplicate_dropped, watermark = await cursor.fetchone()
         
-        await self.db.commit()
+        # Rekonsiliasi setelah crash: event yang ter-commit setelah flush
+        # terakhir belum tercatat di counter
+        async with self.db.execute(
+            f"SELECT COUNT(*) FROM {self._events_source()} WHERE id > ?",
+            (watermark,)
+        ) as cursor:
+            missing = (await cursor.fetchone())[0]
         
-        logger.info("Database schema initialized")
+        unique_processed += missing
+        received = max(received, unique_processed + duplicate_dropped)
+        
+        self._counters = {
+            'received': received,
+            'unique_processed': unique_processed,
+            'duplicate_dropped': duplicate_dropped
+        }
+        
+        if missing:
+            logger.warning(
+                f"Stats reconciled from processed_events: {missing} events "
+                f"committed after the last flush"
+            )
+            self._stats_dirty = True
+            await self.flush_stats()
+    
+    async def _load_bloom(self):
+        if not self.bloom_enabled:
+            return
+        
+        loaded = ScalableBloomFilter.load(
+            self.bloom_path, self.bloom_fp_rate, self.bloom_memory_bytes, self._db_token
+        )
+        if loaded and loaded[1] <= self._last_event_id:
+            self.bloom, snapshot_last_id = loaded
+        else:
+            if loaded:
+                logger.warning("Bloom snapshot is ahead of the database, rebuilding")
+            self.bloom = ScalableBloomFilter(self.bloom_fp_rate, self.bloom_memory_bytes)
+            snapshot_last_id = 0
+        
+        # Catch up incremental dari id tertinggi di snapshot
+        caught_up = 0
+        async with self.db.execute(
+            f"SELECT topic, event_id FROM {self._events_source()} WHERE id > ? ORDER BY id",
+            (snapshot_last_id,)
+        ) as cursor:
+            async for topic, event_id in cursor:
+                self.bloom.add(topic, event_id)
+                caught_up += 1
+        
+        logger.info(
+            f"Bloom filter loaded: {self.bloom.count} keys, "
+            f"{caught_up} caught up from processed_events"
+        )
+    
+    def save_bloom_snapshot(self):
+        if self.bloom is not None:
+            self.bloom.save(self.bloom_path, self._last_event_id, self._db_token)
     
     async def is_duplicate(self, topic: str, event_id: str) -> bool:
+        if self.cache.contains((topic, event_id)):
+            return True
+        
+        if self.bloom is not None:
+            self._bloom_checked += 1
+            if not self.bloom.might_contain(topic, event_id):
+                # Pasti event baru, SELECT tidak diperlukan
+                self._bloom_skipped += 1
+                return False
+        
+        if await self._exists(topic, event_id):
+            self.cache.add((topic, event_id))
+            return True
+        return False
+    
+    async def _exists(self, topic: str, event_id: str) -> bool:
         async with self.db.execute(
             "SELECT 1 FROM processed_events WHERE topic = ? AND event_id = ? LIMIT 1",
             (topic, event_id)
         ) as cursor:
-            row = await cursor.fetchone()
-            return row is not None
+            return await cursor.fetchone() is not None
     
     async def mark_processed(
         self,
@@ -99,151 +460,522 @@ class DedupStore:
         source: str,
         payload: str
     ) -> bool:
-        processed_at = datetime.utcnow().isoformat()
+        try:
+            results = await self.mark_processed_many(
+                [(topic, event_id, timestamp, source, payload)],
+                update_stats=False
+            )
+            return results[0]
+        except Exception as e:
+            logger.error(f"Error marking event as processed: {e}", exc_info=True)
+            return False
+    
+    async def mark_processed_many(
+        self,
+        events: Sequence[EventRow],
+        update_stats: bool = True
+    ) -> List[bool]:
+        """
+        Persist batch event dalam SATU transaksi (group commit).
+        
+        Return list boolean sejajar dengan input: True jika event baru
+        di-insert, False jika duplikat (termasuk duplikat di dalam batch
+        yang sama). Jika update_stats=True, counter unique_processed dan
+        duplicate_dropped (in-memory) di-update setelah commit.
+        
+        Key yang ada di LRU cache langsung dianggap duplikat tanpa INSERT.
+        
+        Raise exception (setelah rollback) jika transaksi gagal.
+        """
+        if not events:
+            return []
+        
+        processed_at = self._utcnow().isoformat()
+        results: List[bool] = [False] * len(events)
+        last_id = 0
         
+        # Duplikat panas ditolak dari cache, sisanya ke database
+        with DEDUP_PROBE_SECONDS.time("cache"):
+            pending = [
+                i for i, event in enumerate(events)
+                if not self.cache.contains((event[0], event[1]))
+            ]
+        
+        async with self._lock:
+            if pending:
+                rows = events
+                if self.codec.enabled:
+                    payloads = await self._encode_payloads(
+                        [(events[i][0], events[i][4]) for i in pending]
+                    )
+                    rows = list(events)
+                    for i, payload in zip(pending, payloads):
+                        rows[i] = events[i][:4] + (payload,)
+                with MARK_PROCESSED_SECONDS.time():
+                    last_id = await self._insert_rows(rows, pending, results, processed_at)
+            
+            # Counter dan watermark di-update bersama (di dalam lock) agar
+            # flush selalu melihat pasangan yang konsisten
+            if last_id:
+                self._last_event_id = max(self._last_event_id, last_id)
+                self._stats_dirty = True
+            if update_stats:
+                inserted = sum(results)
+                self._counters['unique_processed'] += inserted
+                self._counters['duplicate_dropped'] += len(results) - inserted
+                self._stats_dirty = True
+        
+        # Cache, bloom filter dan topic registry hanya diisi setelah commit berhasil
+        for i in pending:
+            self.cache.add((events[i][0], events[i][1]))
+            if results[i]:
+                topic = events[i][0]
+                self._topics[topic] = self._topics.get(topic, 0) + 1
+                if self.bloom is not None:
+                    self.bloom.add(events[i][0], events[i][1])
+        
+        return results
+    
+    async def _insert_rows(
+        self,
+        events: Sequence[EventRow],
+        pending: List[int],
+        results: List[bool],
+        processed_at: str
+    ) -> int:
+        """Insert rows dalam satu transaksi, return id terakhir yang di-insert."""
+        last_id = 0
         try:
             # BEGIN TRANSACTION
             await self.db.execute("BEGIN IMMEDIATE")
             
-            # Idempotent INSERT with conflict resolution
-            # INSERT OR IGNORE: jika constraint violation, ignore dan return
-            cursor = await self.db.execute("""
-                INSERT OR IGNORE INTO processed_events 
-                (topic, event_id, timestamp, source, payload, processed_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (topic, event_id, timestamp, source, payload, processed_at))
+            for i in pending:
+                topic, event_id, timestamp, source, payload = events[i]
+                # Idempotent INSERT with conflict resolution
+                # INSERT OR IGNORE: jika constraint violation, ignore
+                cursor = await self.db.execute("""
+                    INSERT OR IGNORE INTO processed_events 
+                    (topic, event_id, timestamp, source, payload, processed_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (topic, event_id, timestamp, source, payload, processed_at))
+                
+                # rowcount > 0: inserted, rowcount = 0: ignored (duplikat)
+                if cursor.rowcount > 0:
+                    results[i] = True
+                    last_id = cursor.lastrowid
             
-            # Check if actually inserted (rowcount > 0) or ignored (rowcount = 0)
-            inserted = cursor.rowcount > 0
+            # Update registry + counter per topic di transaksi yang sama
+            topic_counts: Dict[str, int] = {}
+            for i in pending:
+                if results[i]:
+                    topic_counts[events[i][0]] = topic_counts.get(events[i][0], 0) + 1
+            for topic, count in topic_counts.items():
+                await self.db.execute("""
+                    INSERT INTO topics (topic, event_count) VALUES (?, ?)
+                    ON CONFLICT(topic) DO UPDATE SET event_count = event_count + excluded.event_count
+                """, (topic, count))
             
             # COMMIT TRANSACTION
-            await self.db.commit()
-            
-            return inserted
+            await self._commit_events()
             
-        except Exception as e:
+        except Exception:
             # ROLLBACK on error
             await self.db.rollback()
-            logger.error(f"Error marking event as processed: {e}", exc_info=True)
-            return False
+            raise
+        
+        return last_id
     
-    async def increment_received(self, count: int = 1):
-        async with self._lock:
-            try:
+    async def _commit_events(self):
+        """COMMIT transaksi batch event (latency dicatat di metrics)."""
+        with COMMIT_SECONDS.time():
+            await self.db.commit()
+    
+    async def _encode_payloads(self, items: List[Tuple[str, str]]) -> List[StoredPayload]:
+        """
+        Kompresi (topic, payload_json). Dictionary baru yang terlatih dari
+        sampel disimpan dulu (autocommit) sebelum dipakai row mana pun.
+        Dipanggil dengan self._lock dipegang, di luar transaksi.
+        """
+        encoded = []
+        for topic, payload in items:
+            trained = self.codec.sample(topic, payload)
+            if trained is not None:
                 await self.db.execute(
-                    "UPDATE stats SET received = received + ? WHERE id = 1",
-                    (count,)
+                    "INSERT INTO payload_dicts (id, topic, dictionary) VALUES (?, ?, ?)",
+                    trained
                 )
-                await self.db.commit()
-            except Exception as e:
-                await self.db.rollback()
-                logger.error(f"Error incrementing received: {e}")
+                self.codec.load([trained])
+                logger.info(f"Trained payload dictionary for topic {topic} ({len(trained[2])} bytes)")
+            encoded.append(self.codec.encode(topic, payload))
+        return encoded
     
-    async def increment_unique_processed(self):
+    async def _migrate_payload_batch(self, batch_size: int) -> int:
+        """Kompresi satu batch row lama. Return jumlah row yang dibaca."""
         async with self._lock:
+            rows: List[Tuple[str, int, str, Any]] = []
+            for table in self._event_tables():
+                async with self.db.execute(
+                    f"SELECT id, topic, payload FROM {table} "
+                    f"WHERE id > ? AND id <= ? ORDER BY id LIMIT ?",
+                    (self._migrated_id, self._migration_target, batch_size - len(rows))
+                ) as cursor:
+                    rows.extend([(table, *row) async for row in cursor])
+                if len(rows) >= batch_size:
+                    break
+            
+            updates = []
+            migrated_id = self._migration_target
+            if rows:
+                plain = [row for row in rows if type(row[3]) is str]
+                payloads = await self._encode_payloads([(row[2], row[3]) for row in plain])
+                updates = [
+                    (table, payload, row_id)
+                    for (table, row_id, _, _), payload in zip(plain, payloads)
+                    if type(payload) is bytes
+                ]
+                migrated_id = rows[-1][1]
+            
             try:
+                await self.db.execute("BEGIN IMMEDIATE")
+                for table, payload, row_id in updates:
+                    await self.db.execute(
+                        f"UPDATE {table} SET payload = ? WHERE id = ?", (payload, row_id)
+                    )
                 await self.db.execute(
-                    "UPDATE stats SET unique_processed = unique_processed + 1 WHERE id = 1"
+                    "UPDATE payload_migration SET migrated_id = ? WHERE id = 1",
+                    (migrated_id,)
                 )
                 await self.db.commit()
-            except Exception as e:
+            except Exception:
                 await self.db.rollback()
-                logger.error(f"Error incrementing unique_processed: {e}")
+                raise
+            
+            self._migrated_id = migrated_id
+            self._migrated_rows += len(updates)
+            return len(rows)
+    
+    async def _migration_loop(self):
+        logger.info(
+            f"Compressing existing payloads in the background "
+            f"(ids {self._migrated_id + 1}..{self._migration_target})"
+        )
+        while self._migrated_id < self._migration_target:
+            try:
+                await self._migrate_payload_batch(Config.PAYLOAD_MIGRATION_BATCH)
+            except Exception as e:
+                logger.error(f"Error compressing existing payloads: {e}", exc_info=True)
+                await asyncio.sleep(5)
+            # Beri kesempatan batch consumer mengambil lock
+            await asyncio.sleep(0)
+        logger.info(f"Payload migration finished: {self._migrated_rows} rows compressed")
+    
+    async def increment_received(self, count: int = 1):
+        self._counters['received'] += count
+        self._stats_dirty = True
+    
+    async def increment_unique_processed(self, count: int = 1):
+        self._counters['unique_processed'] += count
+        self._stats_dirty = True
     
     async def increment_duplicate_dropped(self):
+        self._counters['duplicate_dropped'] += 1
+        self._stats_dirty = True
+    
+    async def flush_stats(self):
+        """Tulis counter in-memory ke tabel stats (satu UPDATE + commit)."""
         async with self._lock:
+            if not self._stats_dirty:
+                return
             try:
-                await self.db.execute(
-                    "UPDATE stats SET duplicate_dropped = duplicate_dropped + 1 WHERE id = 1"
-                )
+                await self.db.execute("""
+                    UPDATE stats
+                    SET received = ?, unique_processed = ?, duplicate_dropped = ?,
+                        last_event_id = ?
+                    WHERE id = 1
+                """, (
+                    self._counters['received'],
+                    self._counters['unique_processed'],
+                    self._counters['duplicate_dropped'],
+                    self._last_event_id
+                ))
                 await self.db.commit()
+                self._stats_dirty = False
             except Exception as e:
                 await self.db.rollback()
-                logger.error(f"Error incrementing duplicate_dropped: {e}")
+                logger.error(f"Error flushing stats: {e}")
+    
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(Config.STATS_FLUSH_INTERVAL)
+            await self.flush_stats()
     
     async def get_stats(self) -> Dict[str, int]:
-        async with self.db.execute(
-            "SELECT received, unique_processed, duplicate_dropped FROM stats WHERE id = 1"
-        ) as cursor:
-            row = await cursor.fetchone()
-            if row:
-                return {
-                    'received': row[0],
-                    'unique_processed': row[1],
-                    'duplicate_dropped': row[2]
-                }
-            return {'received': 0, 'unique_processed': 0, 'duplicate_dropped': 0}
+        return dict(self._counters)
+    
+    def get_read_pool_stats(self) -> Dict[str, Any]:
+        return self.read_pool.get_stats()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        return self.cache.get_stats()
+    
+    async def get_retention_stats(self) -> Optional[Dict[str, Any]]:
+        # Tanpa retention: event disimpan selamanya
+        return None
+    
+    def get_compression_stats(self) -> Dict[str, Any]:
+        return {
+            **self.codec.get_stats(),
+            'migrated_rows': self._migrated_rows,
+            'migration_pending': self._migration_task is not None and not self._migration_task.done()
+        }
+    
+    def get_bloom_stats(self) -> Optional[Dict[str, Any]]:
+        if self.bloom is None:
+            return None
+        return {
+            **self.bloom.get_stats(),
+            'lookups': self._bloom_checked,
+            'selects_skipped': self._bloom_skipped
+        }
     
     async def get_events(
         self,
         topic: Optional[str] = None,
         limit: int = 100,
-        offset: int = 0
+        offset: int = 0,
+        cursor: Optional[str] = None
     ) -> List[Dict[str, Any]]:
+        """
+        Ambil processed events, terbaru dulu (processed_at DESC, id DESC).
+        
+        cursor: token dari encode_cursor() event terakhir halaman sebelumnya
+        (keyset pagination, tidak perlu skip row). offset tetap didukung.
+        """
+        rows = await self.get_event_rows(topic=topic, limit=limit, offset=offset, cursor=cursor)
+        return [event_from_row(row) for row in rows]
+    
+    async def get_event_rows(
+        self,
+        topic: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> List[Tuple[Any, ...]]:
+        """
+        Seperti get_events, tapi return row mentah (id, topic, event_id,
+        timestamp, source, payload, processed_at) dengan payload sebagai
+        JSON text (sudah di-decode, belum di-parse). Dipakai GET /events
+        untuk menyisipkan payload langsung ke response.
+        """
+        conditions = []
+        params: List[Any] = []
+        
         if topic:
-            query = """
-                SELECT id, topic, event_id, timestamp, source, payload, processed_at
-                FROM processed_events
-                WHERE topic = ?
-                ORDER BY processed_at DESC
-                LIMIT ? OFFSET ?
-            """
-            params = (topic, limit, offset)
-        else:
-            query = """
-                SELECT id, topic, event_id, timestamp, source, payload, processed_at
-                FROM processed_events
-                ORDER BY processed_at DESC
-                LIMIT ? OFFSET ?
-            """
-            params = (limit, offset)
-        
-        events = []
-        async with self.db.execute(query, params) as cursor:
-            async for row in cursor:
-                events.append({
-                    'id': row[0],
-                    'topic': row[1],
-                    'event_id': row[2],
-                    'timestamp': row[3],
-                    'source': row[4],
-                    'payload': json.loads(row[5]),
-                    'processed_at': row[6]
-                })
-        
-        return events
+            conditions.append("topic = ?")
+            params.append(topic)
+        
+        if cursor:
+            processed_at, event_row_id = decode_cursor(cursor)
+            conditions.append("(processed_at, id) < (?, ?)")
+            params.extend([processed_at, event_row_id])
+        
+        rows = await self._select_events(conditions, params, limit, offset)
+        return self.codec.decode_rows(rows)
     
-    async def count_events(self, topic: Optional[str] = None) -> int:
+    @staticmethod
+    def _events_query(table: str, conditions: List[str], order: str) -> str:
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return f"""
+            SELECT id, topic, event_id, timestamp, source, payload, processed_at
+            FROM {table}
+            {where}
+            ORDER BY {order}
+        """
+    
+    async def _select_events(
+        self,
+        conditions: List[str],
+        params: List[Any],
+        limit: int,
+        offset: int
+    ) -> List[Tuple[Any, ...]]:
+        query = self._events_query(
+            "processed_events", conditions, "processed_at DESC, id DESC"
+        ) + " LIMIT ? OFFSET ?"
+        async with self.read_pool.acquire() as conn:
+            async with conn.execute(query, params + [limit, offset]) as db_cursor:
+                return await db_cursor.fetchall()
+    
+    async def export_events(
+        self,
+        topic: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        chunk_size: int = 1000
+    ) -> AsyncIterator[List[Tuple[Any, ...]]]:
+        """
+        Async generator untuk bulk export, urut (processed_at, id) ASC.
+        
+        Yield list row mentah (id, topic, event_id, timestamp, source,
+        payload_text, processed_at) per chunk, sehingga memori konstan.
+        Payload terkompresi di-decompress ke JSON text, tidak di-parse.
+        
+        since/until: filter processed_at (since <= processed_at < until).
+        """
+        conditions, params = self._export_conditions(topic, since, until)
+        async for rows in self._export_chunks("processed_events", conditions, params, chunk_size):
+            yield rows
+    
+    async def _export_chunks(
+        self,
+        table: str,
+        conditions: List[str],
+        params: List[Any],
+        chunk_size: int
+    ) -> AsyncIterator[List[Tuple[Any, ...]]]:
+        # Satu query keyset (processed_at, id) per chunk dari export_pool.
+        # Connection dikembalikan sebelum yield, sehingga client yang lambat
+        # tidak menahan connection maupun read transaction (snapshot yang
+        # terbuka lama mencegah checkpoint WAL mengecilkan file -wal).
+        after: Optional[Tuple[str, int]] = None
+        while True:
+            chunk_conditions = list(conditions)
+            chunk_params = list(params)
+            if after is not None:
+                chunk_conditions.append("(processed_at, id) > (?, ?)")
+                chunk_params.extend(after)
+            query = self._events_query(table, chunk_conditions, "processed_at, id") + " LIMIT ?"
+            async with self.export_pool.acquire() as conn:
+                async with conn.execute(query, chunk_params + [chunk_size]) as db_cursor:
+                    rows = await db_cursor.fetchall()
+            if not rows:
+                return
+            yield self.codec.decode_rows(rows)
+            if len(rows) < chunk_size:
+                return
+            after = (rows[-1][6], rows[-1][0])
+    
+    @staticmethod
+    def _export_conditions(
+        topic: Optional[str],
+        since: Optional[str],
+        until: Optional[str]
+    ) -> Tuple[List[str], List[Any]]:
+        conditions = []
+        params: List[Any] = []
+        
         if topic:
-            query = "SELECT COUNT(*) FROM processed_events WHERE topic = ?"
-            params = (topic,)
-        else:
-            query = "SELECT COUNT(*) FROM processed_events"
-            params = ()
+            conditions.append("topic = ?")
+            params.append(topic)
+        if since:
+            conditions.append("processed_at >= ?")
+            params.append(since)
+        if until:
+            conditions.append("processed_at < ?")
+            params.append(until)
         
-        async with self.db.execute(query, params) as cursor:
-            row = await cursor.fetchone()
-            return row[0] if row else 0
+        return conditions, params
+    
+    async def count_events(self, topic: Optional[str] = None) -> int:
+        # Dari counter per topic (di-maintain transaksional), O(1) per topic
+        if topic:
+            return self._topics.get(topic, 0)
+        return sum(self._topics.values())
     
     async def get_topics(self) -> List[str]:
-        topics = []
-        async with self.db.execute(
-            "SELECT DISTINCT topic FROM processed_events ORDER BY topic"
-        ) as cursor:
-            async for row in cursor:
-                topics.append(row[0])
-        return topics
+        # Dari cache tabel topics, O(jumlah topic)
+        return sorted(self._topics)
+    
+    async def get_topic_counts(self) -> Dict[str, int]:
+        return dict(sorted(self._topics.items()))
+    
+    async def _recompute_topic_counts(self):
+        await self.db.execute("UPDATE topics SET event_count = 0")
+        await self.db.execute(f"""
+            INSERT INTO topics (topic, event_count)
+            SELECT topic, COUNT(*) FROM {self._events_source()} GROUP BY topic
+            ON CONFLICT(topic) DO UPDATE SET event_count = excluded.event_count
+        """)
+    
+    async def verify_topic_counts(self, repair: bool = False) -> Dict[str, Tuple[int, int]]:
+        """
+        Consistency check: hitung ulang jumlah event per topic dari
+        processed_events dan bandingkan dengan counter di tabel topics.
+        
+        Return {topic: (stored, actual)} untuk topic yang tidak konsisten.
+        Jika repair=True, counter diperbaiki dalam satu transaksi.
+        """
+        async with self._lock:
+            async with self.db.execute("SELECT topic, event_count FROM topics") as cursor:
+                stored = {row[0]: row[1] async for row in cursor}
+            async with self.db.execute(
+                f"SELECT topic, COUNT(*) FROM {self._events_source()} GROUP BY topic"
+            ) as cursor:
+                actual = {row[0]: row[1] async for row in cursor}
+            
+            mismatches = {
+                topic: (stored.get(topic, 0), actual.get(topic, 0))
+                for topic in set(stored) | set(actual)
+                if stored.get(topic, 0) != actual.get(topic, 0)
+            }
+            
+            if repair and mismatches:
+                try:
+                    await self.db.execute("BEGIN IMMEDIATE")
+                    await self._recompute_topic_counts()
+                    await self.db.commit()
+                except Exception:
+                    await self.db.rollback()
+                    raise
+                async with self.db.execute("SELECT topic, event_count FROM topics") as cursor:
+                    self._topics = {row[0]: row[1] async for row in cursor}
+            
+            return mismatches
     
     async def health_check(self) -> bool:
         try:
-            async with self.db.execute("SELECT 1") as cursor:
-                await cursor.fetchone()
+            async with self.read_pool.acquire() as conn:
+                async with conn.execute("SELECT 1") as cursor:
+                    await cursor.fetchone()
             return True
         except Exception as e:
             logger.error(f"Health check failed: {e}")
             raise
     
     async def close(self):
+        if self._migration_task:
+            self._migration_task.cancel()
+            try:
+                await self._migration_task
+            except asyncio.CancelledError:
+                pass
+            self._migration_task = None
+        
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        
+        await self.read_pool.close()
+        await self.export_pool.close()
+        
+        if self.db:
+            await self.flush_stats()
+            if self.codec.enabled and self._migrated_id >= self._migration_target:
+                # Row sejak startup sudah dikompresi saat insert
+                await self.db.execute(
+                    "UPDATE payload_migration SET migrated_id = ? WHERE id = 1",
+                    (self._last_event_id,)
+                )
+        
+        try:
+            self.save_bloom_snapshot()
+        except OSError as e:
+            logger.error(f"Failed to save bloom snapshot: {e}")
+        
         if self.db:
             await self.db.close()
             logger.info("Database connection closed")
@@ -0,0 +1,57 @@
+"""
+Formatter untuk GET /events dan GET /events/export.
+
+Row mentah dari DedupStore (get_event_rows / export_events) diformat
+langsung ke JSON, NDJSON atau CSV. Payload yang tersimpan sebagai JSON
+text disisipkan apa adanya, tanpa json.loads / json.dumps ulang dan tanpa
+validasi pydantic per event.
+"""
+
+import csv
+import io
+import json
+from typing import Any, Optional, Sequence, Tuple
+
+CSV_COLUMNS = ["id", "topic", "event_id", "timestamp", "source", "payload", "processed_at"]
+
+_dumps = json.dumps
+
+
+def _event_json(row: Tuple[Any, ...]) -> str:
+    row_id, topic, event_id, timestamp, source, payload, processed_at = row
+    return (
+        f'{{"id":{row_id},"topic":{_dumps(topic)},"event_id":{_dumps(event_id)},'
+        f'"timestamp":{_dumps(timestamp)},"source":{_dumps(source)},'
+        f'"payload":{payload},"processed_at":{_dumps(processed_at)}}}'
+    )
+
+
+def format_ndjson(rows: Sequence[Tuple[Any, ...]]) -> bytes:
+    return "".join([_event_json(row) + "\n" for row in rows]).encode("utf-8")
+
+
+def format_events_page(
+    rows: Sequence[Tuple[Any, ...]],
+    total: int,
+    limit: int,
+    offset: int,
+    next_cursor: Optional[str]
+) -> bytes:
+    """Body JSON GET /events, shape sama dengan EventsResponse."""
+    events = ",".join([_event_json(row) for row in rows])
+    return (
+        f'{{"events":[{events}],"total":{total},"limit":{limit},"offset":{offset},'
+        f'"next_cursor":{_dumps(next_cursor)}}}'
+    ).encode("utf-8")
+
+
+def csv_header() -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(CSV_COLUMNS)
+    return buffer.getvalue().encode("utf-8")
+
+
+def format_csv(rows: Sequence[Tuple[Any, ...]]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode("utf-8")
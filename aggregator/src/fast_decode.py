@@ -0,0 +1,186 @@
+"""
+Fast-path decoding untuk /publish/fast.
+
+Body request (bytes) di-decode dengan orjson (jika terinstall, fallback ke
+json stdlib) lalu divalidasi dalam satu loop Python biasa, tanpa membuat
+instance BaseModel per event. Aturan validasi HARUS identik dengan
+models.Event dan models.PublishRequest:
+
+- topic, event_id, source: wajib, string, tidak boleh kosong; di-strip
+- timestamp: wajib, string ISO8601 (datetime.fromisoformat, parser C-level)
+- payload: optional object, default {}
+- field lain diabaikan
+- events: satu event atau list event yang tidak kosong
+"""
+
+import json
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson optional
+    orjson = None
+
+
+class EventRecord(NamedTuple):
+    """Event ringan hasil fast-path (atribut sama dengan models.Event)."""
+    topic: str
+    event_id: str
+    timestamp: str
+    source: str
+    payload: Dict[str, Any]
+
+
+class FastDecodeError(ValueError):
+    """Request tidak valid; errors berformat seperti detail 422 FastAPI."""
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        super().__init__(f"{len(errors)} validation error(s)")
+        self.errors = errors
+
+
+def _loads(raw: bytes) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # orjson lebih ketat dari json stdlib (mis. NaN, integer besar);
+            # fallback agar input yang diterima tetap sama dengan /publish
+            pass
+    return json.loads(raw)
+
+
+def _error(loc: List[Any], msg: str, error_type: str) -> Dict[str, Any]:
+    return {'type': error_type, 'loc': loc, 'msg': msg}
+
+
+def _non_empty_string(event: Dict[str, Any], field: str, loc: List[Any], errors: List[Dict[str, Any]]):
+    if field not in event:
+        errors.append(_error(loc + [field], "Field required", "missing"))
+        return None
+    value = event[field]
+    if not isinstance(value, str):
+        errors.append(_error(loc + [field], "Input should be a valid string", "string_type"))
+        return None
+    value = value.strip()
+    if not value:
+        errors.append(_error(loc + [field], f"Value error, {field} tidak boleh kosong", "value_error"))
+        return None
+    return value
+
+
+_MISSING = object()
+
+# Konstruksi NamedTuple via tuple.__new__ melewati __new__ Python-level
+_new_tuple = tuple.__new__
+
+
+def decode_event(event: Any, loc: List[Any], errors: List[Dict[str, Any]]):
+    """Validasi satu event dict. Return EventRecord atau None (error ditambahkan)."""
+    # Fast path: kasus umum (semua valid) dicek inline tanpa function call
+    # per field; jika ada yang tidak cocok, ulangi dengan path lengkap
+    # untuk menghasilkan pesan error yang tepat.
+    if type(event) is dict:
+        topic = event.get('topic')
+        event_id = event.get('event_id')
+        timestamp = event.get('timestamp')
+        source = event.get('source')
+        payload = event.get('payload', _MISSING)
+        if (
+            type(topic) is str and type(event_id) is str
+            and type(source) is str and type(timestamp) is str
+        ):
+            topic = topic.strip()
+            event_id = event_id.strip()
+            source = source.strip()
+            if payload is _MISSING:
+                payload = {}
+            if topic and event_id and source and type(payload) is dict:
+                try:
+                    datetime.fromisoformat(
+                        timestamp.replace('Z', '+00:00') if 'Z' in timestamp else timestamp
+                    )
+                except ValueError:
+                    pass
+                else:
+                    return _new_tuple(EventRecord, (topic, event_id, timestamp, source, payload))
+
+    return _decode_event_checked(event, loc, errors)
+
+
+def _decode_event_checked(event: Any, loc: List[Any], errors: List[Dict[str, Any]]):
+    if not isinstance(event, dict):
+        errors.append(_error(loc, "Input should be a valid dictionary or instance of Event", "model_type"))
+        return None
+
+    error_count = len(errors)
+
+    topic = _non_empty_string(event, 'topic', loc, errors)
+    event_id = _non_empty_string(event, 'event_id', loc, errors)
+    source = _non_empty_string(event, 'source', loc, errors)
+
+    timestamp = event.get('timestamp')
+    if 'timestamp' not in event:
+        errors.append(_error(loc + ['timestamp'], "Field required", "missing"))
+    elif not isinstance(timestamp, str):
+        errors.append(_error(loc + ['timestamp'], "Input should be a valid string", "string_type"))
+    else:
+        try:
+            datetime.fromisoformat(timestamp.replace('Z', '+00:00') if 'Z' in timestamp else timestamp)
+        except ValueError:
+            errors.append(_error(
+                loc + ['timestamp'], "Value error, timestamp harus format ISO8601", "value_error"
+            ))
+
+    payload = event.get('payload', {})
+    if not isinstance(payload, dict):
+        errors.append(_error(loc + ['payload'], "Input should be a valid dictionary", "dict_type"))
+
+    if len(errors) != error_count:
+        return None
+    return EventRecord(topic, event_id, timestamp, source, payload)
+
+
+def decode_publish_request(raw: bytes) -> List[EventRecord]:
+    """
+    Decode body /publish ({"events": event | [event, ...]}).
+
+    Raise FastDecodeError jika ada event yang tidak valid (semua-atau-tidak,
+    sama seperti PublishRequest).
+    """
+    try:
+        body = _loads(raw)
+    except ValueError as e:
+        raise FastDecodeError([_error(['body'], f"JSON decode error: {e}", "json_invalid")])
+
+    if not isinstance(body, dict):
+        raise FastDecodeError([_error(['body'], "Input should be a valid dictionary", "dict_type")])
+    if 'events' not in body:
+        raise FastDecodeError([_error(['body', 'events'], "Field required", "missing")])
+
+    events = body['events']
+    errors: List[Dict[str, Any]] = []
+
+    if isinstance(events, dict):
+        record = decode_event(events, ['body', 'events'], errors)
+        records = [record] if record is not None else []
+    elif isinstance(events, list):
+        if not events:
+            raise FastDecodeError([_error(
+                ['body', 'events'], "Value error, events list tidak boleh kosong", "value_error"
+            )])
+        records = []
+        append = records.append
+        for index, event in enumerate(events):
+            record = decode_event(event, ['body', 'events', index], errors)
+            if record is not None:
+                append(record)
+    else:
+        raise FastDecodeError([_error(
+            ['body', 'events'], "Input should be a valid dictionary or list", "model_type"
+        )])
+
+    if errors:
+        raise FastDecodeError(errors)
+    return records
@@ -0,0 +1,379 @@
+"""
+Durable append-only ingest log.
+
+Event yang diterima /publish ditulis ke log (dan di-fsync) SEBELUM
+di-ack, sehingga crash tidak menghilangkan event yang sudah "accepted".
+Consumer (WorkerPool) membaca event dari log, lalu meng-ack offset
+setelah event ter-commit di DedupStore. Checkpoint (offset yang semua
+event sebelumnya sudah diproses) ditulis periodik; saat startup event
+mulai dari checkpoint di-replay. Replay bersifat at-least-once, dedup di
+DedupStore membuatnya tetap exactly-once.
+
+Format:
+- Direktori berisi segment "<base_offset 20 digit>.log" dan file
+  "checkpoint" (JSON {"offset": N}).
+- Setiap record: header 8 byte (length, crc32 payload; big-endian)
+  diikuti payload. Offset record = base_offset segment + urutan record.
+- Segment di-rotate setelah melewati segment_max_bytes dan dihapus setelah
+  seluruh isinya berada di bawah checkpoint.
+
+Group fsync: append() menulis ke file lalu menunggu fsync bersama. Selama
+satu fsync berjalan, append lain menumpuk dan di-fsync sekaligus di
+putaran berikutnya, sehingga biaya fsync dibagi ke request yang
+bersamaan.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import struct
+import zlib
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Set, Tuple
+
+from .fast_decode import EventRecord
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct(">II")
+SEGMENT_SUFFIX = ".log"
+CHECKPOINT_FILE = "checkpoint"
+
+_new_tuple = tuple.__new__
+
+
+def encode_log_event(event: Any) -> bytes:
+    """Serialize event (Event atau EventRecord) ke payload record log."""
+    return json.dumps(
+        [event.topic, event.event_id, event.timestamp, event.source, event.payload],
+        separators=(',', ':')
+    ).encode("utf-8")
+
+
+def decode_log_event(payload: bytes) -> EventRecord:
+    # Payload log sudah divalidasi saat ingest
+    return _new_tuple(EventRecord, json.loads(payload))
+
+
+class IngestLog:
+
+    def __init__(
+        self,
+        directory: str,
+        segment_max_bytes: int = 64 * 1024 * 1024,
+        checkpoint_interval: float = 1.0,
+        fsync: bool = True
+    ):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.checkpoint_interval = checkpoint_interval
+        self.fsync = fsync
+
+        # Segment: list base offset (urut), segment terakhir = aktif
+        self._segments: List[int] = []
+        self._file: Optional[BinaryIO] = None
+        self._file_size = 0
+        self._retired: List[BinaryIO] = []
+        self._dir_dirty = False
+
+        # _end_offset: offset record berikutnya yang akan ditulis
+        # _synced_offset: semua record < offset ini sudah di-fsync
+        self._end_offset = 0
+        self._synced_offset = 0
+        self._sync_task: Optional[asyncio.Future] = None
+        self._data_available = asyncio.Event()
+
+        # Ack dari consumer (bisa tidak urut antar worker)
+        self._acked_offset = 0
+        self._acked_pending: Set[int] = set()
+        self._checkpoint_offset = 0
+
+        # Reader sequential: (base segment, file, offset record berikutnya)
+        self._reader: Optional[Tuple[int, BinaryIO, int]] = None
+        self._checkpoint_task: Optional[asyncio.Task] = None
+
+        self.appended = 0
+        self.fsyncs = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def end_offset(self) -> int:
+        return self._end_offset
+
+    @property
+    def acked_offset(self) -> int:
+        return self._acked_offset
+
+    @property
+    def checkpoint_offset(self) -> int:
+        return self._checkpoint_offset
+
+    def _segment_path(self, base: int) -> str:
+        return os.path.join(self.directory, f"{base:020d}{SEGMENT_SUFFIX}")
+
+    async def open(self):
+        self._checkpoint_offset = self._read_checkpoint()
+
+        self._segments = sorted(
+            int(name[:-len(SEGMENT_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit()
+        )
+
+        if self._segments:
+            last = self._segments[-1]
+            count, valid_size = self._scan_segment(self._segment_path(last))
+            self._end_offset = last + count
+            self._file = open(self._segment_path(last), "r+b")
+            if valid_size != os.path.getsize(self._segment_path(last)):
+                # Record terakhir tidak utuh (crash di tengah write)
+                logger.warning(f"Truncating torn record at end of segment {last}")
+                self._file.truncate(valid_size)
+            self._file.seek(valid_size)
+            self._file_size = valid_size
+        else:
+            self._end_offset = self._checkpoint_offset
+            self._open_segment(self._end_offset)
+
+        if self._checkpoint_offset > self._end_offset:
+            logger.warning("Ingest log checkpoint is ahead of the log, resetting")
+            self._checkpoint_offset = self._end_offset
+        elif self._checkpoint_offset < self._segments[0]:
+            logger.warning("Ingest log checkpoint points before the first segment, skipping ahead")
+            self._checkpoint_offset = self._segments[0]
+
+        self._synced_offset = self._end_offset
+        self._acked_offset = self._checkpoint_offset
+
+        logger.info(
+            f"Ingest log opened at {self.directory}: {len(self._segments)} segments, "
+            f"{self._end_offset - self._checkpoint_offset} events to replay"
+        )
+
+        if self.checkpoint_interval > 0:
+            self._checkpoint_task = asyncio.create_task(self._checkpoint_loop())
+
+    def _scan_segment(self, path: str) -> Tuple[int, int]:
+        """Return (jumlah record valid, ukuran byte record valid)."""
+        count = 0
+        valid_size = 0
+        with open(path, "rb") as f:
+            while True:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    break
+                length, crc = HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                count += 1
+                valid_size += HEADER.size + length
+        return count, valid_size
+
+    def _open_segment(self, base: int):
+        self._file = open(self._segment_path(base), "ab")
+        self._file_size = 0
+        self._segments.append(base)
+        self._dir_dirty = True
+
+    def _read_checkpoint(self) -> int:
+        try:
+            with open(os.path.join(self.directory, CHECKPOINT_FILE), "r") as f:
+                return int(json.load(f)['offset'])
+        except FileNotFoundError:
+            return 0
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Invalid ingest log checkpoint, replaying from the first segment")
+            return 0
+
+    async def append(self, payloads: List[bytes]) -> int:
+        """
+        Tulis record ke log dan tunggu sampai durable (group fsync).
+
+        Return offset record pertama.
+        """
+        if self._file_size >= self.segment_max_bytes:
+            # Rotate; segment lama di-fsync dan ditutup oleh sync berikutnya
+            self._file.flush()
+            self._retired.append(self._file)
+            self._open_segment(self._end_offset)
+
+        first = self._end_offset
+        chunks = []
+        for payload in payloads:
+            chunks.append(HEADER.pack(len(payload), zlib.crc32(payload)))
+            chunks.append(payload)
+        data = b"".join(chunks)
+        self._file.write(data)
+        self._file_size += len(data)
+        self._end_offset += len(payloads)
+        self.appended += len(payloads)
+
+        await self._sync(self._end_offset)
+        return first
+
+    async def _sync(self, offset: int):
+        while self._synced_offset < offset:
+            if self._sync_task is None:
+                self._sync_task = asyncio.ensure_future(self._do_sync())
+            # shield: request yang dibatalkan tidak membatalkan fsync bersama
+            await asyncio.shield(self._sync_task)
+
+    async def _do_sync(self):
+        try:
+            target = self._end_offset
+            files = self._retired + [self._file]
+            self._retired = []
+            dir_dirty, self._dir_dirty = self._dir_dirty, False
+
+            for f in files:
+                f.flush()
+            if self.fsync:
+                loop = asyncio.get_running_loop()
+                for f in files:
+                    await loop.run_in_executor(None, os.fsync, f.fileno())
+                if dir_dirty:
+                    await loop.run_in_executor(None, self._fsync_directory)
+            for f in files[:-1]:
+                f.close()
+
+            self.fsyncs += 1
+            self._synced_offset = max(self._synced_offset, target)
+            self._data_available.set()
+        finally:
+            self._sync_task = None
+
+    def _fsync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    async def read(self, offset: int, max_records: int) -> List[Tuple[int, bytes]]:
+        """
+        Baca record durable mulai dari offset (maks max_records).
+
+        Menunggu jika belum ada record baru.
+        """
+        while offset >= self._synced_offset:
+            self._data_available.clear()
+            await self._data_available.wait()
+        return self.read_available(offset, max_records)
+
+    def read_available(self, offset: int, max_records: int) -> List[Tuple[int, bytes]]:
+        end = min(self._synced_offset, offset + max_records)
+        if offset >= end:
+            return []
+
+        if self._reader is None or self._reader[2] != offset:
+            self._position_reader(offset)
+
+        base, f, next_offset = self._reader
+        records = []
+        while next_offset < end:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                # Akhir segment, lanjut ke segment berikutnya
+                f.close()
+                base = next_offset
+                f = open(self._segment_path(base), "rb")
+                continue
+            length, _ = HEADER.unpack(header)
+            records.append((next_offset, f.read(length)))
+            next_offset += 1
+
+        self._reader = (base, f, next_offset)
+        return records
+
+    def _position_reader(self, offset: int):
+        if self._reader is not None:
+            self._reader[1].close()
+        base = max(b for b in self._segments if b <= offset)
+        f = open(self._segment_path(base), "rb")
+        for _ in range(offset - base):
+            length, _ = HEADER.unpack(f.read(HEADER.size))
+            f.seek(length, os.SEEK_CUR)
+        self._reader = (base, f, offset)
+
+    def ack(self, offsets: Iterable[int]):
+        """Tandai offset sudah diproses (ter-commit di DedupStore)."""
+        pending = self._acked_pending
+        pending.update(offsets)
+        watermark = self._acked_offset
+        while watermark in pending:
+            pending.remove(watermark)
+            watermark += 1
+        self._acked_offset = watermark
+
+    def checkpoint(self):
+        """Simpan checkpoint (atomic) lalu hapus segment yang sudah habis dikonsumsi."""
+        offset = self._acked_offset
+        if offset == self._checkpoint_offset:
+            return
+
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({'offset': offset}, f)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._checkpoint_offset = offset
+
+        # Segment i habis jika segment berikutnya dimulai <= checkpoint
+        while len(self._segments) > 1 and self._segments[1] <= offset:
+            base = self._segments.pop(0)
+            if self._reader is not None and self._reader[0] == base:
+                self._reader[1].close()
+                self._reader = None
+            os.remove(self._segment_path(base))
+            logger.info(f"Ingest log segment {base} fully consumed, deleted")
+
+    async def _checkpoint_loop(self):
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            try:
+                self.checkpoint()
+            except OSError as e:
+                logger.error(f"Error writing ingest log checkpoint: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        total_bytes = 0
+        for base in self._segments:
+            try:
+                total_bytes += os.path.getsize(self._segment_path(base))
+            except OSError:
+                pass
+        return {
+            'segments': len(self._segments),
+            'bytes': total_bytes,
+            'end_offset': self._end_offset,
+            'acked_offset': self._acked_offset,
+            'checkpoint_offset': self._checkpoint_offset,
+            'lag': self._end_offset - self._acked_offset,
+            'fsyncs': self.fsyncs,
+            'records_per_fsync': round(self.appended / self.fsyncs, 2) if self.fsyncs else 0.0
+        }
+
+    async def close(self):
+        if self._checkpoint_task:
+            self._checkpoint_task.cancel()
+            try:
+                await self._checkpoint_task
+            except asyncio.CancelledError:
+                pass
+            self._checkpoint_task = None
+
+        await self._sync(self._end_offset)
+        self.checkpoint()
+
+        if self._reader is not None:
+            self._reader[1].close()
+            self._reader = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        logger.info("Ingest log closed")
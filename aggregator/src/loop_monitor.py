@@ -0,0 +1,74 @@
+"""
+Monitor lag event loop.
+
+Task kecil yang tidur interval detik lalu mengukur berapa lama
+terlambat dibangunkan. Keterlambatan itu adalah waktu loop diblok
+callback lain (kode sync, logging, json besar, GC) sehingga request dan
+consumer tidak bisa berjalan. Hasil di /stats (event_loop) dan histogram
+aggregator_event_loop_lag_seconds di /metrics.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from .metrics import EVENT_LOOP_LAG_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """
+    interval: jeda antar pengukuran (detik).
+    warn_threshold: lag (detik) yang dicatat sebagai blocked + log warning.
+    """
+
+    def __init__(self, interval: float = 0.1, warn_threshold: float = 0.1):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self._task: Optional[asyncio.Task] = None
+
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.samples = 0
+        self.blocked = 0
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def record(self, lag: float):
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.total_lag += lag
+        self.samples += 1
+        EVENT_LOOP_LAG_SECONDS.observe(lag)
+        if lag >= self.warn_threshold:
+            self.blocked += 1
+            logger.warning(f"Event loop blocked for {lag * 1000:.1f}ms")
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, time.perf_counter() - expected))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'interval_ms': round(self.interval * 1000, 3),
+            'last_lag_ms': round(self.last_lag * 1000, 3),
+            'avg_lag_ms': round(self.total_lag / self.samples * 1000, 3) if self.samples else 0.0,
+            'max_lag_ms': round(self.max_lag * 1000, 3),
+            'samples': self.samples,
+            'blocked': self.blocked
+        }
@@ -0,0 +1,316 @@
+"""
+Metrics Prometheus (text exposition format 0.0.4) untuk GET /metrics.
+
+Implementasi minimal tanpa dependency prometheus_client: histogram
+dengan bucket tetap, counter berlabel dan gauge berbasis callback.
+observe()/inc() hanya bisect + increment (tanpa lock; semua dipanggil
+dari event loop yang sama), sehingga aman dibiarkan aktif di hot path
+consumer. Label di-render hanya saat scrape.
+
+Metric bersifat global per process: semua shard DedupStore menulis ke
+histogram yang sama. Dalam mode multi-process, histogram yang hanya terisi
+di ingest process (PUBLISH_SECONDS) dikirim berkala ke owner
+(export_process_metrics / import_process_metrics) dan dijumlahkan ke
+series owner saat render, sehingga /metrics dari process mana pun
+memuat semua process.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Bucket latency (detik), 100us sampai 10s
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs: Iterable[Tuple[str, str]]) -> str:
+    rendered = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+    return f"{{{rendered}}}" if rendered else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Histogram:
+    """
+    Histogram kumulatif. label: nama satu label opsional (mis. endpoint);
+    nilai label diberikan saat observe().
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        label: Optional[str] = None
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.bounds = tuple(sorted(buckets))
+        self.label = label
+        # nilai label -> [count per bucket (+Inf terakhir), sum]
+        self._series: Dict[str, List[Any]] = {}
+        # source (pid ingest process) -> series terakhir yang dikirim
+        self._remote: Dict[str, Dict[str, List[Any]]] = {}
+
+    def observe(self, value: float, label_value: str = ""):
+        series = self._series.get(label_value)
+        if series is None:
+            series = self._series[label_value] = [[0] * (len(self.bounds) + 1), 0.0]
+        series[0][bisect_left(self.bounds, value)] += 1
+        series[1] += value
+
+    def time(self, label_value: str = "") -> "_Timer":
+        """Context manager: observe durasi blok (detik)."""
+        return _Timer(self, label_value)
+
+    def export_series(self) -> Dict[str, List[Any]]:
+        """Series lokal (JSON-serializable) untuk dikirim ke process lain."""
+        return {label_value: [list(counts), total] for label_value, (counts, total) in self._series.items()}
+
+    def set_remote(self, source: str, series: Dict[str, List[Any]]):
+        """Simpan series kumulatif terbaru dari process lain (menggantikan kiriman sebelumnya)."""
+        size = len(self.bounds) + 1
+        self._remote[source] = {
+            label_value: [list(counts), float(total)]
+            for label_value, (counts, total) in series.items()
+            if len(counts) == size
+        }
+
+    def _merged_series(self) -> Dict[str, List[Any]]:
+        if not self._remote:
+            return self._series
+        merged = {label_value: [list(counts), total] for label_value, (counts, total) in self._series.items()}
+        for series in self._remote.values():
+            for label_value, (counts, total) in series.items():
+                target = merged.setdefault(label_value, [[0] * len(counts), 0.0])
+                target[0] = [a + b for a, b in zip(target[0], counts)]
+                target[1] += total
+        return merged
+
+    def snapshot(self, label_value: str = "") -> Dict[str, Any]:
+        counts, total = self._merged_series().get(label_value, [[0] * (len(self.bounds) + 1), 0.0])
+        return {'count': sum(counts), 'sum': total, 'buckets': list(counts)}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        series = self._merged_series()
+        if not series and not self.label:
+            # Histogram tanpa label tetap di-export (semua 0) sebelum observasi pertama
+            series = {"": [[0] * (len(self.bounds) + 1), 0.0]}
+        for label_value, (counts, total) in sorted(series.items()):
+            base = [(self.label, label_value)] if self.label else []
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), counts):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_labels(base + [('le', _number(bound))])} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(base)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(base)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "label_value", "started")
+
+    def __init__(self, histogram: Histogram, label_value: str):
+        self.histogram = histogram
+        self.label_value = label_value
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, self.label_value)
+
+
+class Counter:
+    """Counter monoton dengan satu label (mis. topic)."""
+
+    def __init__(self, name: str, documentation: str, label: str):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self._values: Dict[str, int] = {}
+
+    def inc(self, label_value: str, amount: int = 1):
+        self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def value(self, label_value: str) -> int:
+        return self._values.get(label_value, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for label_value, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels([(self.label, label_value)])} {value}")
+        return lines
+
+
+class Gauge:
+    """
+    Gauge yang nilainya dibaca saat scrape. fn return angka (tanpa label)
+    atau dict nilai label -> angka.
+    """
+
+    def __init__(self, name: str, documentation: str, label: Optional[str] = None):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.fn: Optional[Callable[[], Any]] = None
+
+    def set_function(self, fn: Optional[Callable[[], Any]]):
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        if self.fn is None:
+            return []
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        value = self.fn()
+        if isinstance(value, dict):
+            for label_value, item in sorted(value.items()):
+                lines.append(f"{self.name}{_labels([(self.label, str(label_value))])} {_number(item)}")
+        else:
+            lines.append(f"{self.name} {_number(value)}")
+        return lines
+
+
+# Latency per tahap
+PUBLISH_SECONDS = Histogram(
+    "aggregator_publish_request_seconds",
+    "Durasi request publish sampai response dikirim (termasuk parsing dan validasi).",
+    label="endpoint"
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "aggregator_queue_wait_seconds",
+    "Waktu event menunggu di queue worker sebelum diambil consumer."
+)
+DEDUP_PROBE_SECONDS = Histogram(
+    "aggregator_dedup_probe_seconds",
+    "Latency probe duplikat per batch sebelum INSERT: stage=cache (LRU, semua mode), "
+    "stage=bucket_lookup (bloom + lookup lintas bucket, retention mode).",
+    label="stage"
+)
+MARK_PROCESSED_SECONDS = Histogram(
+    "aggregator_mark_processed_transaction_seconds",
+    "Durasi transaksi mark_processed_many (BEGIN IMMEDIATE sampai COMMIT)."
+)
+COMMIT_SECONDS = Histogram(
+    "aggregator_commit_seconds",
+    "Durasi COMMIT transaksi batch event."
+)
+EVENTS_QUERY_SECONDS = Histogram(
+    "aggregator_events_query_seconds",
+    "Durasi query GET /events (rows + count)."
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "aggregator_event_loop_lag_seconds",
+    "Keterlambatan event loop membangunkan timer (waktu loop diblok)."
+)
+
+# Counter per topic, mirror dari Stats
+RECEIVED = Counter(
+    "aggregator_received_total", "Event diterima endpoint publish.", "topic"
+)
+UNIQUE_PROCESSED = Counter(
+    "aggregator_unique_processed_total", "Event unik yang diproses.", "topic"
+)
+DUPLICATE_DROPPED = Counter(
+    "aggregator_duplicate_dropped_total", "Event duplikat yang di-drop.", "topic"
+)
+
+# Keputusan admission control, mirror dari admission di /stats
+ADMISSION_REQUESTS = Counter(
+    "aggregator_admission_requests_total",
+    "Request publish per keputusan admission (admitted, rejected, waited).", "result"
+)
+ADMISSION_EVENTS = Counter(
+    "aggregator_admission_events_total",
+    "Event dalam request publish per keputusan admission (admitted, rejected).", "result"
+)
+
+# Gauge, fungsi di-set saat startup
+QUEUE_DEPTH = Gauge(
+    "aggregator_queue_depth", "Jumlah event di queue per worker.", "worker"
+)
+PENDING_EVENTS = Gauge(
+    "aggregator_pending_events",
+    "Event yang belum diproses (lag ingest log atau isi queue), basis admission control."
+)
+
+REGISTRY: List[Any] = [
+    PUBLISH_SECONDS, QUEUE_WAIT_SECONDS, DEDUP_PROBE_SECONDS,
+    MARK_PROCESSED_SECONDS, COMMIT_SECONDS, EVENTS_QUERY_SECONDS, EVENT_LOOP_LAG_SECONDS,
+    RECEIVED, UNIQUE_PROCESSED, DUPLICATE_DROPPED, ADMISSION_REQUESTS, ADMISSION_EVENTS,
+    QUEUE_DEPTH, PENDING_EVENTS
+]
+
+# Histogram yang terisi di ingest process (mode multi-process)
+PROCESS_HISTOGRAMS: Dict[str, Histogram] = {PUBLISH_SECONDS.name: PUBLISH_SECONDS}
+
+
+def count_topics(counter: Counter, events: Iterable[Any]):
+    """inc counter per topic untuk batch event (satu inc per topic)."""
+    per_topic: Dict[str, int] = {}
+    for event in events:
+        per_topic[event.topic] = per_topic.get(event.topic, 0) + 1
+    for topic, count in per_topic.items():
+        counter.inc(topic, count)
+
+
+def export_process_metrics() -> Dict[str, Dict[str, List[Any]]]:
+    """Snapshot PROCESS_HISTOGRAMS lokal untuk dikirim ke owner."""
+    return {name: histogram.export_series() for name, histogram in PROCESS_HISTOGRAMS.items()}
+
+
+def import_process_metrics(source: str, data: Dict[str, Dict[str, List[Any]]]):
+    """Terima snapshot dari ingest process source (hasil export_process_metrics)."""
+    for name, series in data.items():
+        histogram = PROCESS_HISTOGRAMS.get(name)
+        if histogram is not None:
+            histogram.set_remote(source, series)
+
+
+def render_metrics(metrics: Iterable[Any] = REGISTRY) -> bytes:
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class RequestTimingMiddleware:
+    """
+    ASGI middleware (tanpa BaseHTTPMiddleware) yang mengukur durasi request
+    untuk path tertentu sampai response selesai dikirim.
+    """
+
+    def __init__(self, app, histogram: Histogram, paths: Sequence[str]):
+        self.app = app
+        self.histogram = histogram
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.histogram.observe(time.perf_counter() - started, scope["path"])
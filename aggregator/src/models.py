@@ -87,6 +87,23 @@ class PublishResponse(BaseModel):
     message: str = Field(..., description="Detail message")
 
 
+class StreamLineError(BaseModel):
+    """Detail baris NDJSON yang ditolak."""
+    line: int = Field(..., description="Nomor baris (mulai dari 1)")
+    error: str = Field(..., description="Alasan penolakan")
+
+
+class StreamPublishResponse(BaseModel):
+    """Response dari publish streaming (NDJSON) endpoint."""
+    status: str = Field(..., description="Status: accepted/rejected")
+    accepted: int = Field(..., description="Jumlah baris valid yang masuk queue")
+    rejected: int = Field(..., description="Jumlah baris yang ditolak")
+    errors: List[StreamLineError] = Field(
+        default_factory=list,
+        description="Detail baris yang ditolak (dibatasi jumlahnya)"
+    )
+
+
 class ProcessedEvent(BaseModel):
     """
     Processed event dari database.
@@ -106,6 +123,125 @@ class EventsResponse(BaseModel):
     total: int = Field(..., description="Total events (untuk pagination)")
     limit: int = Field(..., description="Limit yang digunakan")
     offset: int = Field(..., description="Offset yang digunakan")
+    next_cursor: Optional[str] = Field(
+        default=None,
+        description="Cursor untuk halaman berikutnya (null jika tidak ada lagi)"
+    )
+
+
+class WorkerStats(BaseModel):
+    """Statistik per consumer worker."""
+    worker_id: int
+    queue_size: int = Field(..., description="Current queue depth worker ini")
+    processed: int = Field(..., description="Total events diproses worker ini")
+    unique_processed: int
+    duplicate_dropped: int
+    batches: int = Field(..., description="Total micro-batch yang diproses")
+    failed_attempts: int = Field(0, description="Percobaan batch yang gagal lalu diulang")
+    busy_seconds: float = Field(..., description="Waktu yang dipakai untuk memproses batch")
+    events_per_sec: float = Field(..., description="Rata-rata throughput sejak start")
+    utilization: float = Field(..., description="Fraksi waktu worker sibuk (0-1)")
+
+
+class CacheStats(BaseModel):
+    """Statistik LRU dedup cache."""
+    entries: int = Field(..., description="Jumlah key di cache")
+    bytes: int = Field(..., description="Perkiraan memori yang dipakai")
+    max_bytes: int = Field(..., description="Budget memori cache")
+    hits: int
+    misses: int
+    evictions: int
+    hit_rate: float
+
+
+class CompressionStats(BaseModel):
+    """Statistik kompresi payload (sejak startup)."""
+    enabled: bool
+    dictionaries: int = Field(..., description="Jumlah dictionary per topic")
+    compressed_payloads: int
+    raw_bytes: int = Field(..., description="Ukuran JSON payload sebelum kompresi")
+    stored_bytes: int = Field(..., description="Ukuran payload terkompresi")
+    ratio: float = Field(..., description="stored_bytes / raw_bytes")
+    migrated_rows: int = Field(..., description="Row lama yang dikompresi migrasi background")
+    migration_pending: bool
+
+
+class BloomStats(BaseModel):
+    """Statistik bloom filter prefilter."""
+    filters: int = Field(..., description="Jumlah slice filter")
+    keys: int = Field(..., description="Jumlah key di filter")
+    memory_bytes: int
+    target_fp_rate: float
+    estimated_fp_rate: float
+    lookups: int = Field(..., description="Jumlah lookup is_duplicate yang melewati filter")
+    selects_skipped: int = Field(..., description="Lookup yang tidak perlu SELECT")
+
+
+class ReadPoolStats(BaseModel):
+    """Statistik pool connection read-only."""
+    size: int
+    available: int = Field(..., description="Connection yang sedang idle")
+    acquisitions: int
+    waits: int = Field(..., description="Acquire yang harus menunggu connection")
+    avg_wait_ms: float
+    max_wait_ms: float
+
+
+class RetentionStats(BaseModel):
+    """Statistik retention window (partisi waktu)."""
+    window_seconds: int = Field(..., description="Window jaminan dedup")
+    bucket_seconds: int = Field(..., description="Lebar satu bucket")
+    buckets: int = Field(..., description="Jumlah bucket yang tersimpan")
+    oldest_bucket_start: Optional[str] = Field(default=None, description="Awal bucket tertua")
+    retained_events: int = Field(..., description="Event di bucket yang tersimpan")
+    retained_bytes: int = Field(..., description="Ukuran page database yang terpakai")
+    free_bytes: int = Field(..., description="Page bebas dari bucket yang di-drop (dipakai ulang)")
+    expired_buckets: int
+    expired_events: int
+
+
+class AdmissionStats(BaseModel):
+    """Statistik admission control endpoint publish."""
+    max_depth: int = Field(..., description="Batas event yang menunggu diproses")
+    depth: int = Field(..., description="Event yang sedang menunggu diproses")
+    reserved: int = Field(..., description="Event dari batch yang sedang di-enqueue")
+    drain_rate: float = Field(..., description="EWMA event/detik yang diproses consumer")
+    admitted_requests: int
+    admitted_events: int
+    rejected_requests: int = Field(..., description="Batch yang ditolak dengan 429")
+    rejected_events: int
+    waited_requests: int = Field(..., description="Batch stream yang menunggu kapasitas")
+    last_retry_after: int = Field(..., description="Retry-After (detik) penolakan terakhir")
+
+
+class IngestLogStats(BaseModel):
+    """Statistik durable ingest log."""
+    segments: int = Field(..., description="Jumlah segment file")
+    bytes: int = Field(..., description="Total ukuran segment")
+    end_offset: int = Field(..., description="Offset event berikutnya yang ditulis")
+    acked_offset: int = Field(..., description="Semua event sebelum offset ini sudah diproses")
+    checkpoint_offset: int = Field(..., description="Offset checkpoint terakhir di disk")
+    lag: int = Field(..., description="Event di log yang belum diproses")
+    fsyncs: int
+    records_per_fsync: float = Field(..., description="Rata-rata event per group fsync")
+
+
+class EventLoopStats(BaseModel):
+    """Statistik lag event loop."""
+    interval_ms: float = Field(..., description="Interval pengukuran")
+    last_lag_ms: float = Field(..., description="Lag pengukuran terakhir")
+    avg_lag_ms: float
+    max_lag_ms: float = Field(..., description="Lag terbesar sejak startup")
+    samples: int
+    blocked: int = Field(..., description="Pengukuran dengan lag >= LOOP_LAG_WARN_MS")
+
+
+class IngestProcessStats(BaseModel):
+    """Statistik per ingest process (multi-process mode)."""
+    pid: int
+    requests: int = Field(..., description="Request yang di-forward ke owner")
+    events: int = Field(..., description="Event yang di-forward ke owner")
+    last_seen_seconds: float = Field(..., description="Detik sejak forward terakhir")
 
 
 class Stats(BaseModel):
@@ -117,15 +253,39 @@ class Stats(BaseModel):
         unique_processed: Total unique events yang diproses
         duplicate_dropped: Total duplicate events yang di-drop
         topics: List of topics yang ada
+        topic_counts: Jumlah event per topic
         uptime_seconds: Uptime dalam detik
         queue_size: Current queue size
+        workers: Statistik per consumer worker
+        dedup_cache: Statistik LRU dedup cache
+        bloom_filter: Statistik bloom filter prefilter
+        payload_compression: Statistik kompresi payload
+        read_pool: Statistik pool connection read-only
+        ingest_processes: Statistik per ingest process (multi-process mode)
+        ingest_log: Statistik durable ingest log
+        admission: Statistik admission control
+        retention: Statistik retention window (None jika nonaktif)
+        event_loop: Statistik lag event loop (None jika nonaktif)
     """
     received: int = Field(..., description="Total events received")
     unique_processed: int = Field(..., description="Total unique events processed")
     duplicate_dropped: int = Field(..., description="Total duplicate events dropped")
     topics: List[str] = Field(..., description="List of topics")
+    topic_counts: Dict[str, int] = Field(default_factory=dict, description="Event count per topic")
     uptime_seconds: int = Field(..., description="Uptime in seconds")
     queue_size: int = Field(default=0, description="Current queue size")
+    workers: List[WorkerStats] = Field(default_factory=list, description="Per-worker statistics")
+    dedup_cache: Optional[CacheStats] = Field(default=None, description="Dedup cache statistics")
+    bloom_filter: Optional[BloomStats] = Field(default=None, description="Bloom filter statistics")
+    payload_compression: Optional[CompressionStats] = Field(default=None, description="Payload compression statistics")
+    read_pool: Optional[ReadPoolStats] = Field(default=None, description="Read connection pool statistics")
+    ingest_processes: List[IngestProcessStats] = Field(
+        default_factory=list, description="Per-ingest-process statistics (multi-process mode)"
+    )
+    ingest_log: Optional[IngestLogStats] = Field(default=None, description="Ingest log statistics")
+    admission: Optional[AdmissionStats] = Field(default=None, description="Admission control statistics")
+    retention: Optional[RetentionStats] = Field(default=None, description="Retention window statistics")
+    event_loop: Optional[EventLoopStats] = Field(default=None, description="Event loop lag statistics")
     
     @property
     def duplicate_rate(self) -> float:
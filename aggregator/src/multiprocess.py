@@ -0,0 +1,223 @@
+"""
+Multi-process deployment mode.
+
+uvicorn --workers N saja tidak aman: setiap process punya queue, worker
+pool, cache dan counter sendiri yang berebut file SQLite yang sama. Mode
+ini memisahkan peran:
+
+- owner: SATU process yang memiliki DedupStore + WorkerPool (semua write,
+  dedup dan counter). Listen di Unix domain socket (OWNER_SOCKET).
+- ingest: N process uvicorn di HOST:PORT. Parsing dan validasi request
+  (pydantic / fast decode / NDJSON) dilakukan di sini lalu event yang
+  sudah valid di-forward ke owner lewat socket. Read endpoint (/events,
+  /stats, /health) di-proxy ke owner.
+
+Karena hanya owner yang menulis, dedup dan persistence tetap exactly-once
+seperti mode single-process. Owner mencatat statistik per ingest process
+(dari header X-Ingest-Pid) untuk /stats.
+
+Dijalankan dengan INGEST_PROCESSES > 1: `python main.py` menjadi
+supervisor yang men-spawn owner lalu menjalankan uvicorn dengan N worker.
+"""
+
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+import httpx
+
+from .admission import BatchTooLarge, Overloaded
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+ROLE_STANDALONE = "standalone"
+ROLE_OWNER = "owner"
+ROLE_INGEST = "ingest"
+
+PID_HEADER = "X-Ingest-Pid"
+
+# Base URL dummy; request dikirim lewat Unix domain socket
+OWNER_BASE_URL = "http://owner"
+
+
+class OwnerUnavailable(Exception):
+    """Owner process tidak bisa dihubungi dari ingest process."""
+
+
+def encode_forward_body(events: Sequence[Any]) -> bytes:
+    """Serialize event yang sudah divalidasi (Event atau EventRecord) ke body /publish."""
+    return json.dumps({
+        'events': [
+            {
+                'topic': event.topic,
+                'event_id': event.event_id,
+                'timestamp': event.timestamp,
+                'source': event.source,
+                'payload': event.payload
+            }
+            for event in events
+        ]
+    }).encode("utf-8")
+
+
+class OwnerClient:
+    """
+    HTTP client dari ingest process ke owner (keep-alive lewat UDS).
+
+    transport bisa di-override (mis. httpx.ASGITransport untuk test).
+    """
+
+    REQUEST_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+    # Forward block=True menunggu admit_wait di owner tanpa batas waktu
+    # (sama seperti /publish/stream di standalone); timeout read di sini
+    # akan membuat stream 503 padahal owner tetap menerima batch-nya
+    BLOCKING_TIMEOUT = httpx.Timeout(None, connect=5.0)
+
+    def __init__(self, socket_path: str, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.socket_path = socket_path
+        self.pid = os.getpid()
+        self.client = httpx.AsyncClient(
+            transport=transport or httpx.AsyncHTTPTransport(uds=socket_path),
+            base_url=OWNER_BASE_URL,
+            headers={PID_HEADER: str(self.pid)},
+            timeout=self.REQUEST_TIMEOUT
+        )
+
+    async def forward(self, events: Sequence[Any], block: bool = False) -> Dict[str, Any]:
+        """
+        Kirim batch event ke owner. block=True: owner menunggu kapasitas
+        (backpressure untuk /publish/stream) alih-alih menolak dengan 429.
+        Penolakan admission owner di-raise ulang sebagai Overloaded /
+        BatchTooLarge.
+        """
+        response = await self._request(
+            "POST", "/internal/ingest",
+            params={'block': 'true'} if block else None,
+            content=encode_forward_body(events),
+            headers={'Content-Type': 'application/json'},
+            timeout=self.BLOCKING_TIMEOUT if block else httpx.USE_CLIENT_DEFAULT
+        )
+        if response.status_code == 429:
+            raise Overloaded(
+                int(response.headers.get("Retry-After", "1")),
+                response.json().get("detail", "queue overloaded")
+            )
+        if response.status_code == 413:
+            raise BatchTooLarge(response.json().get("detail", "batch too large"))
+        response.raise_for_status()
+        return response.json()
+
+    async def push_metrics(self, data: Dict[str, Any]):
+        """Kirim snapshot metrics lokal (export_process_metrics) ke owner."""
+        response = await self._request("POST", "/internal/metrics", json=data)
+        response.raise_for_status()
+
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> httpx.Response:
+        return await self._request("GET", path, params=params)
+
+    async def stream(self, path: str, params: Optional[Dict[str, Any]] = None) -> AsyncIterator[bytes]:
+        try:
+            async with self.client.stream("GET", path, params=params) as response:
+                async for chunk in response.aiter_raw():
+                    yield chunk
+        except httpx.TransportError as e:
+            raise OwnerUnavailable(str(e))
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        try:
+            return await self.client.request(method, path, **kwargs)
+        except httpx.TransportError as e:
+            raise OwnerUnavailable(str(e))
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class ProcessRegistry:
+    """Statistik per ingest process, di-maintain oleh owner."""
+
+    def __init__(self):
+        self._processes: Dict[int, Dict[str, Any]] = {}
+
+    def record(self, pid: int, events: int):
+        stats = self._processes.get(pid)
+        if stats is None:
+            stats = self._processes[pid] = {'requests': 0, 'events': 0, 'last_seen': 0.0}
+        stats['requests'] += 1
+        stats['events'] += events
+        stats['last_seen'] = time.monotonic()
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {
+                'pid': pid,
+                'requests': stats['requests'],
+                'events': stats['events'],
+                'last_seen_seconds': round(now - stats['last_seen'], 3)
+            }
+            for pid, stats in sorted(self._processes.items())
+        ]
+
+
+def _wait_for_owner(owner: subprocess.Popen, socket_path: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    with httpx.Client(transport=httpx.HTTPTransport(uds=socket_path), base_url=OWNER_BASE_URL) as client:
+        while time.monotonic() < deadline:
+            if owner.poll() is not None:
+                raise RuntimeError(f"Owner process exited with code {owner.returncode}")
+            try:
+                if client.get("/health").status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            time.sleep(0.2)
+    raise RuntimeError(f"Owner process not ready after {timeout}s")
+
+
+def run_multiprocess(app: str = "main:app"):
+    """
+    Supervisor: spawn owner process (UDS), lalu uvicorn dengan
+    INGEST_PROCESSES worker sebagai ingest process. Owner dihentikan
+    saat uvicorn selesai.
+    """
+    import uvicorn
+
+    socket_path = Config.OWNER_SOCKET
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    owner = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", app,
+            "--uds", socket_path,
+            "--log-level", Config.LOG_LEVEL.lower()
+        ],
+        env={**os.environ, 'AGGREGATOR_ROLE': ROLE_OWNER}
+    )
+    logger.info(f"Owner process started (pid {owner.pid}) on {socket_path}")
+
+    try:
+        _wait_for_owner(owner, socket_path, timeout=60)
+
+        # Worker uvicorn mewarisi environment ini saat di-spawn
+        os.environ['AGGREGATOR_ROLE'] = ROLE_INGEST
+        uvicorn.run(
+            app,
+            host=Config.HOST,
+            port=Config.PORT,
+            workers=Config.INGEST_PROCESSES,
+            log_level=Config.LOG_LEVEL.lower()
+        )
+    finally:
+        owner.terminate()
+        try:
+            owner.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            owner.kill()
+        logger.info("Owner process stopped")
@@ -0,0 +1,56 @@
+"""
+Helper parsing NDJSON (newline-delimited JSON) secara streaming.
+
+Body request dibaca per chunk dan dipecah per baris tanpa pernah
+memuat seluruh body ke memori. Memori dibatasi oleh max_line_bytes.
+"""
+
+from typing import AsyncIterable, AsyncIterator, Optional, Tuple
+
+
+class LineTooLong(Exception):
+    """Baris NDJSON melebihi batas max_line_bytes."""
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterable[bytes],
+    max_line_bytes: int
+) -> AsyncIterator[Tuple[int, Optional[bytes], Optional[Exception]]]:
+    """
+    Yield (line_number, line, error) untuk setiap baris non-kosong.
+
+    line_number adalah nomor baris fisik (mulai dari 1). Baris yang
+    melebihi max_line_bytes di-yield sekali dengan line=None dan
+    error=LineTooLong; sisa baris tersebut dibuang sampai newline berikutnya.
+    """
+    buffer = bytearray()
+    line_number = 1
+    too_long = False
+
+    async for chunk in chunks:
+        start = 0
+        while True:
+            newline = chunk.find(b"\n", start)
+            end = len(chunk) if newline == -1 else newline
+
+            if not too_long:
+                buffer += chunk[start:end]
+                if len(buffer) > max_line_bytes:
+                    too_long = True
+                    buffer.clear()
+                    yield line_number, None, LineTooLong(
+                        f"line exceeds {max_line_bytes} bytes"
+                    )
+
+            if newline == -1:
+                break
+
+            if not too_long and buffer.strip():
+                yield line_number, bytes(buffer), None
+            buffer.clear()
+            too_long = False
+            line_number += 1
+            start = newline + 1
+
+    if not too_long and buffer.strip():
+        yield line_number, bytes(buffer), None
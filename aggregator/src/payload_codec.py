@@ -0,0 +1,176 @@
+"""
+Kompresi payload event di SQLite (zlib + dictionary per topic).
+
+Payload log sangat repetitif antar event (key JSON, nilai level/host/
+service, prefix message). zlib biasa tidak efektif untuk payload kecil
+(rasio ~0.85 untuk payload publisher), sehingga setiap topic mendapat
+preset dictionary (zdict) berisi sampel payload paling representatif
+topic tersebut (rasio ~0.35).
+
+Format kolom payload:
+- TEXT: JSON apa adanya (row lama, payload kecil, atau kompresi nonaktif)
+- BLOB: header ">BI" (FORMAT_ZLIB, dict_id; 0 = tanpa dictionary)
+  diikuti stream zlib
+
+Dictionary disimpan di tabel payload_dicts dan tidak pernah diubah
+(row yang sudah ada mereferensikan dict_id). Decode hanya dilakukan saat
+payload benar-benar dikembalikan (GET /events, export).
+"""
+
+import re
+import struct
+import zlib
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+HEADER = struct.Struct(">BI")
+FORMAT_ZLIB = 1
+
+# Fragmen JSON kandidat isi dictionary: key (dengan ':'), string, angka, literal
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"\s*:?|-?\d+(?:\.\d+)?|true|false|null')
+
+StoredPayload = Union[str, bytes]
+
+
+def train_dictionary(samples: Sequence[str], max_bytes: int) -> bytes:
+    """
+    Bangun preset dictionary zlib dari sampel payload.
+
+    Setiap sampel diberi skor dari fragmen JSON (key, string, angka) yang
+    juga muncul di sampel lain; sampel paling representatif disusun
+    sampai max_bytes. zlib paling murah mereferensikan byte di akhir
+    dictionary, jadi sampel dengan skor tertinggi diletakkan paling
+    belakang.
+    """
+    tokens = [set(_TOKEN.findall(sample)) for sample in samples]
+    document_frequency: Counter = Counter()
+    for sample_tokens in tokens:
+        document_frequency.update(sample_tokens)
+
+    scored = sorted(
+        (
+            sum(len(token) for token in sample_tokens if document_frequency[token] > 1) / len(sample),
+            sample
+        )
+        for sample, sample_tokens in zip(samples, tokens)
+        if sample
+    )
+
+    selected: List[bytes] = []
+    size = 0
+    for score, sample in reversed(scored):
+        if score <= 0:
+            break
+        encoded = sample.encode("utf-8")
+        if size + len(encoded) > max_bytes:
+            break
+        selected.append(encoded)
+        size += len(encoded)
+    return b"".join(reversed(selected))
+
+
+class PayloadCodec:
+    """
+    enabled=False: hanya decode (row terkompresi tetap bisa dibaca).
+
+    dict_samples: jumlah payload per topic sebelum dictionary dilatih;
+    sampai saat itu payload dikompresi tanpa dictionary.
+    min_bytes: payload lebih kecil disimpan sebagai TEXT.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        level: int = 6,
+        dict_samples: int = 200,
+        dict_max_bytes: int = 4096,
+        min_bytes: int = 32
+    ):
+        self.enabled = enabled
+        self.level = level
+        self.dict_samples = dict_samples
+        self.dict_max_bytes = dict_max_bytes
+        self.min_bytes = min_bytes
+
+        self._dictionaries: Dict[int, bytes] = {}
+        self._topic_dicts: Dict[str, int] = {}
+        self._samples: Dict[str, List[str]] = {}
+
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.compressed = 0
+
+    def load(self, rows: Iterable[Tuple[int, str, bytes]]):
+        """Muat dictionary dari row (dict_id, topic, dictionary) payload_dicts."""
+        for dict_id, topic, dictionary in rows:
+            self._dictionaries[dict_id] = dictionary
+            self._topic_dicts[topic] = dict_id
+
+    def sample(self, topic: str, payload: str) -> Optional[Tuple[int, str, bytes]]:
+        """
+        Catat sampel payload. Return (dict_id, topic, dictionary) baru saat
+        sampel topic cukup; caller menyimpannya lalu memanggil load().
+        """
+        if not self.enabled or self.dict_samples <= 0 or topic in self._topic_dicts:
+            return None
+        samples = self._samples.setdefault(topic, [])
+        samples.append(payload)
+        if len(samples) < self.dict_samples:
+            return None
+
+        del self._samples[topic]
+        dictionary = train_dictionary(samples, self.dict_max_bytes)
+        if not dictionary:
+            # Tidak ada fragmen berulang; jangan latih ulang topic ini
+            self._topic_dicts[topic] = 0
+            return None
+        return max(self._dictionaries, default=0) + 1, topic, dictionary
+
+    def encode(self, topic: str, payload: str) -> StoredPayload:
+        raw = payload.encode("utf-8")
+        if not self.enabled or len(raw) < self.min_bytes:
+            return payload
+
+        dict_id = self._topic_dicts.get(topic, 0)
+        if dict_id:
+            compressor = zlib.compressobj(self.level, zdict=self._dictionaries[dict_id])
+        else:
+            compressor = zlib.compressobj(self.level)
+        stored = HEADER.pack(FORMAT_ZLIB, dict_id) + compressor.compress(raw) + compressor.flush()
+        if len(stored) >= len(raw):
+            return payload
+
+        self.raw_bytes += len(raw)
+        self.stored_bytes += len(stored)
+        self.compressed += 1
+        return stored
+
+    def decode(self, stored: StoredPayload) -> str:
+        if type(stored) is str:
+            return stored
+        payload_format, dict_id = HEADER.unpack_from(stored)
+        if payload_format != FORMAT_ZLIB:
+            raise ValueError(f"Unknown payload format {payload_format}")
+        if dict_id:
+            decompressor = zlib.decompressobj(zdict=self._dictionaries[dict_id])
+        else:
+            decompressor = zlib.decompressobj()
+        return (decompressor.decompress(stored[HEADER.size:]) + decompressor.flush()).decode("utf-8")
+
+    def decode_rows(self, rows: List[Tuple[Any, ...]], index: int = 5) -> List[Tuple[Any, ...]]:
+        """Decode kolom payload (posisi index) pada row yang terkompresi."""
+        return [
+            row if type(row[index]) is str
+            else row[:index] + (self.decode(row[index]),) + row[index + 1:]
+            for row in rows
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'dictionaries': len(self._dictionaries),
+            'compressed_payloads': self.compressed,
+            'raw_bytes': self.raw_bytes,
+            'stored_bytes': self.stored_bytes,
+            'ratio': round(self.stored_bytes / self.raw_bytes, 4) if self.raw_bytes else 0.0
+        }
@@ -0,0 +1,101 @@
+"""
+Sampling profiler untuk GET /debug/profile.
+
+Thread terpisah mengambil snapshot stack semua thread
+(sys._current_frames) setiap interval dan menghitung stack yang sama.
+Tidak ada hook per pemanggilan fungsi (beda dengan cProfile), sehingga
+overhead hanya sebanding dengan frekuensi sampling dan aman dijalankan
+pada aggregator yang sedang melayani traffic.
+
+Output berformat collapsed stacks ("frame;frame;frame count" per baris),
+langsung bisa dipakai flamegraph.pl, speedscope atau inferno. Frame
+teratas adalah nama thread, sehingga waktu di event loop (MainThread),
+thread aiosqlite dan thread lain terpisah.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict
+
+# Frame Python teratas thread yang sedang menunggu: event loop di
+# selector.select, thread aiosqlite / executor di Condition.wait
+_IDLE_FRAMES = frozenset({"select", "wait"})
+
+
+class ProfilerBusy(Exception):
+    """Profiling lain sedang berjalan di process ini."""
+
+
+def _frame_label(code) -> str:
+    path = code.co_filename
+    parent = os.path.basename(os.path.dirname(path))
+    location = f"{parent}/{os.path.basename(path)}" if parent else path
+    return f"{code.co_name} ({location}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    interval: jeda antar sample (detik).
+    idle: False = buang sample yang frame teratasnya menunggu (select,
+    Condition.wait, queue.get), yaitu thread yang tidak sedang bekerja.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, interval: float = 0.005, idle: bool = False):
+        self.interval = interval
+        self.idle = idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._labels: Dict[int, str] = {}
+
+    def _label(self, code) -> str:
+        # Cache label per code object (format string per frame per sample mahal)
+        label = self._labels.get(id(code))
+        if label is None:
+            label = self._labels[id(code)] = _frame_label(code)
+        return label
+
+    def _sample(self, own_thread: int, thread_names: Dict[int, str]):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            if not self.idle and frame.f_code.co_name in _IDLE_FRAMES:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(self._label(frame.f_code))
+                frame = frame.f_back
+            labels.append(thread_names.get(thread_id, f"thread-{thread_id}"))
+            labels.reverse()
+            self.stacks[";".join(labels)] += 1
+        self.samples += 1
+
+    def run(self, seconds: float):
+        """Sample selama seconds (blocking; panggil dari thread lain)."""
+        if not SamplingProfiler._lock.acquire(blocking=False):
+            raise ProfilerBusy("profiling already in progress")
+        try:
+            own_thread = threading.get_ident()
+            started = time.perf_counter()
+            deadline = started + seconds
+            next_sample = started
+            while True:
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+                self._sample(own_thread, thread_names)
+                next_sample += self.interval
+                time.sleep(max(0.0, min(next_sample, deadline) - time.perf_counter()))
+            self.duration = time.perf_counter() - started
+        finally:
+            SamplingProfiler._lock.release()
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, stack terbanyak dulu."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
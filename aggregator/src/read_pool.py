@@ -0,0 +1,81 @@
+"""
+Pool connection read-only untuk DedupStore.
+
+Database berjalan dalam WAL mode sehingga reader tidak diblok oleh writer.
+Dengan connection terpisah (masing-masing punya worker thread aiosqlite
+sendiri), query /events dan /health tidak lagi antre di belakang transaksi
+BEGIN IMMEDIATE milik consumer.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+
+class ReadConnectionPool:
+    """
+    Pool tetap berisi `size` connection dengan PRAGMA query_only.
+
+    Waktu tunggu untuk mendapatkan connection diinstrumentasi untuk
+    sizing pool (lihat get_stats()).
+    """
+
+    def __init__(self, db_path: str, size: int):
+        self.db_path = db_path
+        self.size = size
+        self._connections: List[aiosqlite.Connection] = []
+        self._available: asyncio.Queue = asyncio.Queue()
+
+        self.acquisitions = 0
+        self.waits = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    async def open(self):
+        for _ in range(self.size):
+            conn = await aiosqlite.connect(self.db_path)
+            await conn.execute("PRAGMA query_only = 1")
+            self._connections.append(conn)
+            self._available.put_nowait(conn)
+        logger.info(f"Read connection pool opened with {self.size} connections")
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[aiosqlite.Connection]:
+        started = time.perf_counter()
+        if self._available.empty():
+            self.waits += 1
+        conn = await self._available.get()
+
+        waited = time.perf_counter() - started
+        self.acquisitions += 1
+        self.total_wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+        try:
+            yield conn
+        finally:
+            self._available.put_nowait(conn)
+
+    async def close(self):
+        for conn in self._connections:
+            await conn.close()
+        self._connections = []
+        self._available = asyncio.Queue()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'size': self.size,
+            'available': self._available.qsize(),
+            'acquisitions': self.acquisitions,
+            'waits': self.waits,
+            'avg_wait_ms': round(
+                self.total_wait_seconds / self.acquisitions * 1000, 3
+            ) if self.acquisitions else 0.0,
+            'max_wait_ms': round(self.max_wait_seconds * 1000, 3)
+        }
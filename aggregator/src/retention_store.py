@@ -0,0 +1,512 @@
+"""
+Dedup store dengan retention window berbasis partisi waktu.
+
+Tanpa retention, processed_events (dan index dedup-nya) tumbuh terus.
+RetentionDedupStore menyimpan event di tabel per bucket waktu
+processed_at ("processed_events_<start>", mis. satu tabel per hari) di
+file SQLite yang sama. Registry bucket ada di tabel retention_buckets
+(rentang [start_at, end_at) dan jumlah event, di-update di transaksi yang
+sama dengan insert).
+
+- Dedup: key dicek di bucket yang masih berada di dalam window (satu
+  query join per bucket per batch), lalu INSERT OR IGNORE ke bucket
+  aktif. Duplikat dijamin terdeteksi minimal selama window_seconds
+  (paling lama window_seconds + bucket_seconds).
+- Expiry: bucket yang seluruhnya lebih tua dari window di-DROP TABLE
+  sekaligus (bukan DELETE per row). Page yang dibebaskan dipakai ulang
+  oleh bucket baru sehingga ukuran file stabil. Counter per topic
+  dikurangi di transaksi yang sama; bloom filter dibangun ulang dari
+  bucket yang tersisa.
+- Id event tetap global dan monoton (di-assign eksplisit), sehingga
+  cursor (processed_at, id), watermark stats dan sharding tetap berlaku.
+  Karena rentang bucket tidak overlap, hasil per bucket cukup
+  disambung untuk urutan global.
+
+Tabel processed_events dari database lama didaftarkan sebagai bucket
+pertama dan ikut expire.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
+
+import aiosqlite
+
+from .bloom import ScalableBloomFilter
+from .config import Config
+from .dedup_store import DedupStore, EventRow
+from .metrics import DEDUP_PROBE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+LEGACY_TABLE = "processed_events"
+EPOCH = datetime(1970, 1, 1)
+
+# Jumlah key per query lookup lintas bucket (2 parameter per key)
+LOOKUP_CHUNK_SIZE = 400
+
+DedupKey = Tuple[str, str]
+
+
+class RetentionDedupStore(DedupStore):
+    """
+    window_seconds: lama jaminan dedup (event lebih tua akan di-expire).
+    bucket_seconds: lebar satu partisi; expiry membuang satu bucket utuh.
+    """
+
+    # Bloom filter menyaring key sebelum lookup lintas bucket (_insert_rows)
+    BLOOM_IN_WRITE_PATH = True
+
+    def __init__(
+        self,
+        db_path: str,
+        window_seconds: Optional[int] = None,
+        bucket_seconds: Optional[int] = None,
+        check_interval: Optional[float] = None,
+        **kwargs
+    ):
+        super().__init__(db_path, **kwargs)
+        self.window_seconds = (
+            window_seconds if window_seconds is not None else Config.RETENTION_WINDOW_SECONDS
+        )
+        self.bucket_seconds = (
+            bucket_seconds if bucket_seconds is not None else Config.RETENTION_BUCKET_SECONDS
+        )
+        self.check_interval = (
+            check_interval if check_interval is not None else Config.RETENTION_CHECK_INTERVAL
+        )
+        if self.window_seconds <= 0 or self.bucket_seconds <= 0:
+            raise ValueError("window_seconds dan bucket_seconds harus > 0")
+
+        # Bucket urut start_at; bucket terakhir = aktif (tujuan insert)
+        self._buckets: List[Dict[str, Any]] = []
+        self._next_id = 1
+        self._expiry_task: Optional[asyncio.Task] = None
+
+        self.expired_buckets = 0
+        self.expired_events = 0
+
+    async def initialize(self):
+        await super().initialize()
+
+        # Id tidak boleh dipakai ulang walaupun bucket dengan id tertinggi
+        # sudah di-drop (watermark stats ikut di-commit saat expiry)
+        async with self.db.execute("SELECT last_event_id FROM stats WHERE id = 1") as cursor:
+            watermark = (await cursor.fetchone())[0]
+        self._next_id = max(self._last_event_id, watermark) + 1
+
+        await self.expire_buckets()
+        if self.check_interval > 0:
+            self._expiry_task = asyncio.create_task(self._expiry_loop())
+
+    async def _create_event_tables(self):
+        await self.db.execute("""
+            CREATE TABLE IF NOT EXISTS retention_buckets (
+                name TEXT PRIMARY KEY,
+                start_at TEXT NOT NULL,
+                end_at TEXT NOT NULL,
+                event_count INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+        """)
+
+        async with self.db.execute(
+            "SELECT name, start_at, end_at, event_count FROM retention_buckets ORDER BY start_at"
+        ) as cursor:
+            self._buckets = [
+                {'name': row[0], 'start_at': row[1], 'end_at': row[2], 'event_count': row[3]}
+                async for row in cursor
+            ]
+
+        if not self._buckets:
+            await self._register_legacy_table()
+        if not self._buckets:
+            self._buckets.append(await self._create_bucket(self._utcnow().isoformat()))
+
+    async def _register_legacy_table(self):
+        async with self.db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (LEGACY_TABLE,)
+        ) as cursor:
+            if await cursor.fetchone() is None:
+                return
+
+        # Semua event lama processed_at < sekarang; bucket berikutnya mulai
+        # dari end_at sehingga rentang tidak overlap
+        async with self.db.execute(
+            f"SELECT MIN(processed_at), COUNT(*) FROM {LEGACY_TABLE}"
+        ) as cursor:
+            start_at, count = await cursor.fetchone()
+        bucket = {
+            'name': LEGACY_TABLE,
+            'start_at': start_at or "",
+            'end_at': self._utcnow().isoformat(),
+            'event_count': count
+        }
+        await self.db.execute(
+            "INSERT INTO retention_buckets (name, start_at, end_at, event_count) VALUES (?, ?, ?, ?)",
+            (bucket['name'], bucket['start_at'], bucket['end_at'], bucket['event_count'])
+        )
+        self._buckets.append(bucket)
+        logger.info(f"Registered existing {LEGACY_TABLE} ({count} events) as the first retention bucket")
+
+    def _bucket_range(self, processed_at: str) -> Tuple[str, str]:
+        now = datetime.fromisoformat(processed_at)
+        seconds = int((now - EPOCH).total_seconds())
+        aligned = EPOCH + timedelta(seconds=seconds - seconds % self.bucket_seconds)
+        start_at = aligned.isoformat()
+        if self._buckets and self._buckets[-1]['end_at'] > start_at:
+            start_at = self._buckets[-1]['end_at']
+        return start_at, (aligned + timedelta(seconds=self.bucket_seconds)).isoformat()
+
+    async def _create_bucket(self, processed_at: str) -> Dict[str, Any]:
+        """
+        Buat tabel bucket untuk processed_at dan daftarkan di registry.
+        Caller menambahkan bucket ke self._buckets setelah commit.
+        """
+        start_at, end_at = self._bucket_range(processed_at)
+        name = f"{LEGACY_TABLE}_{datetime.fromisoformat(start_at):%Y%m%d%H%M%S}"
+
+        # UNIQUE(topic, event_id) sekaligus index lookup dedup dan per topic
+        await self.db.execute(f"""
+            CREATE TABLE IF NOT EXISTS {name} (
+                id INTEGER PRIMARY KEY,
+                topic TEXT NOT NULL,
+                event_id TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                source TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                processed_at TEXT NOT NULL,
+                UNIQUE(topic, event_id)
+            )
+        """)
+        await self.db.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{name}_processed_at_id
+            ON {name}(processed_at, id)
+        """)
+        await self.db.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{name}_topic_processed_at_id
+            ON {name}(topic, processed_at, id)
+        """)
+        await self.db.execute(
+            "INSERT INTO retention_buckets (name, start_at, end_at, event_count) VALUES (?, ?, ?, 0)",
+            (name, start_at, end_at)
+        )
+
+        return {'name': name, 'start_at': start_at, 'end_at': end_at, 'event_count': 0}
+
+    def _events_source(self) -> str:
+        return "(" + " UNION ALL ".join(
+            f"SELECT id, topic, event_id, timestamp, source, payload, processed_at FROM {b['name']}"
+            for b in self._buckets
+        ) + ")"
+
+    def _event_tables(self) -> List[str]:
+        return [b['name'] for b in self._buckets]
+
+    def _window_start(self) -> str:
+        return (self._utcnow() - timedelta(seconds=self.window_seconds)).isoformat()
+
+    def _live_buckets(self) -> List[Dict[str, Any]]:
+        """Bucket yang masih (sebagian) berada di dalam window, terbaru dulu."""
+        window_start = self._window_start()
+        return [b for b in reversed(self._buckets) if b['end_at'] > window_start]
+
+    async def _exists(self, topic: str, event_id: str) -> bool:
+        for bucket in self._live_buckets():
+            async with self.db.execute(
+                f"SELECT 1 FROM {bucket['name']} WHERE topic = ? AND event_id = ? LIMIT 1",
+                (topic, event_id)
+            ) as cursor:
+                if await cursor.fetchone() is not None:
+                    return True
+        return False
+
+    async def _find_existing(
+        self,
+        buckets: List[Dict[str, Any]],
+        keys: List[DedupKey]
+    ) -> Set[DedupKey]:
+        """Key yang sudah ada di salah satu bucket (satu query per bucket per chunk)."""
+        found: Set[DedupKey] = set()
+        for bucket in buckets:
+            remaining = [key for key in keys if key not in found]
+            for start in range(0, len(remaining), LOOKUP_CHUNK_SIZE):
+                chunk = remaining[start:start + LOOKUP_CHUNK_SIZE]
+                values = ", ".join(["(?, ?)"] * len(chunk))
+                params = [part for key in chunk for part in key]
+                async with self.db.execute(f"""
+                    WITH k(topic, event_id) AS (VALUES {values})
+                    SELECT k.topic, k.event_id FROM k
+                    JOIN {bucket['name']} e ON e.topic = k.topic AND e.event_id = k.event_id
+                """, params) as cursor:
+                    found.update([(row[0], row[1]) async for row in cursor])
+        return found
+
+    async def _insert_rows(
+        self,
+        events: Sequence[EventRow],
+        pending: List[int],
+        results: List[bool],
+        processed_at: str
+    ) -> int:
+        last_id = 0
+        next_id = self._next_id
+        new_bucket = None
+        try:
+            await self.db.execute("BEGIN IMMEDIATE")
+
+            target = self._buckets[-1]
+            if processed_at >= target['end_at']:
+                new_bucket = target = await self._create_bucket(processed_at)
+
+            # Key yang mungkin sudah ada di bucket lain dalam window; bloom
+            # filter (berisi semua key yang tersimpan) menyaring key baru
+            with DEDUP_PROBE_SECONDS.time("bucket_lookup"):
+                candidates = [(events[i][0], events[i][1]) for i in pending]
+                if self.bloom is not None:
+                    candidates = [key for key in candidates if self.bloom.might_contain(*key)]
+                older = [b for b in self._live_buckets() if b is not target]
+                existing = await self._find_existing(older, candidates) if candidates and older else set()
+
+            for i in pending:
+                topic, event_id, timestamp, source, payload = events[i]
+                if (topic, event_id) in existing:
+                    continue
+                cursor = await self.db.execute(f"""
+                    INSERT OR IGNORE INTO {target['name']}
+                    (id, topic, event_id, timestamp, source, payload, processed_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (next_id, topic, event_id, timestamp, source, payload, processed_at))
+
+                if cursor.rowcount > 0:
+                    results[i] = True
+                    last_id = next_id
+                    next_id += 1
+
+            topic_counts: Dict[str, int] = {}
+            for i in pending:
+                if results[i]:
+                    topic_counts[events[i][0]] = topic_counts.get(events[i][0], 0) + 1
+            for topic, count in topic_counts.items():
+                await self.db.execute("""
+                    INSERT INTO topics (topic, event_count) VALUES (?, ?)
+                    ON CONFLICT(topic) DO UPDATE SET event_count = event_count + excluded.event_count
+                """, (topic, count))
+
+            inserted = sum(topic_counts.values())
+            if inserted:
+                await self.db.execute(
+                    "UPDATE retention_buckets SET event_count = event_count + ? WHERE name = ?",
+                    (inserted, target['name'])
+                )
+
+            await self._commit_events()
+
+        except Exception:
+            await self.db.rollback()
+            raise
+
+        self._next_id = next_id
+        if new_bucket is not None:
+            self._buckets.append(new_bucket)
+        target['event_count'] += inserted
+        return last_id
+
+    async def expire_buckets(self) -> int:
+        """
+        DROP bucket yang seluruhnya di luar window. Return jumlah event
+        yang di-expire.
+        """
+        window_start = self._window_start()
+        async with self._lock:
+            expired = [b for b in self._buckets if b['end_at'] <= window_start]
+            if not expired:
+                return 0
+
+            topic_counts: Dict[str, int] = {}
+            replacement = None
+            try:
+                await self.db.execute("BEGIN IMMEDIATE")
+                for bucket in expired:
+                    async with self.db.execute(
+                        f"SELECT topic, COUNT(*) FROM {bucket['name']} GROUP BY topic"
+                    ) as cursor:
+                        async for topic, count in cursor:
+                            topic_counts[topic] = topic_counts.get(topic, 0) + count
+                    await self.db.execute(f"DROP TABLE {bucket['name']}")
+                    await self.db.execute(
+                        "DELETE FROM retention_buckets WHERE name = ?", (bucket['name'],)
+                    )
+
+                for topic, count in topic_counts.items():
+                    await self.db.execute(
+                        "UPDATE topics SET event_count = event_count - ? WHERE topic = ?",
+                        (count, topic)
+                    )
+                await self.db.execute("DELETE FROM topics WHERE event_count <= 0")
+
+                if len(expired) == len(self._buckets):
+                    # Selalu ada bucket aktif untuk insert berikutnya
+                    replacement = await self._create_bucket(self._utcnow().isoformat())
+
+                # Watermark id ikut durable agar id bucket yang di-drop
+                # tidak dipakai ulang setelah restart
+                await self.db.execute("""
+                    UPDATE stats
+                    SET received = ?, unique_processed = ?, duplicate_dropped = ?,
+                        last_event_id = ?
+                    WHERE id = 1
+                """, (
+                    self._counters['received'],
+                    self._counters['unique_processed'],
+                    self._counters['duplicate_dropped'],
+                    self._last_event_id
+                ))
+                await self.db.commit()
+            except Exception:
+                await self.db.rollback()
+                raise
+
+            self._stats_dirty = False
+            expired_names = {b['name'] for b in expired}
+            self._buckets = [b for b in self._buckets if b['name'] not in expired_names]
+            if replacement is not None:
+                self._buckets.append(replacement)
+            for topic, count in topic_counts.items():
+                remaining = self._topics.get(topic, 0) - count
+                if remaining > 0:
+                    self._topics[topic] = remaining
+                else:
+                    self._topics.pop(topic, None)
+
+            # Key yang di-expire tidak boleh lagi dianggap duplikat
+            self.cache.clear()
+
+        expired_events = sum(b['event_count'] for b in expired)
+        self.expired_buckets += len(expired)
+        self.expired_events += expired_events
+        logger.info(
+            f"Expired {len(expired)} retention buckets ({expired_events} events) "
+            f"older than {window_start}"
+        )
+
+        await self._rebuild_bloom()
+        return expired_events
+
+    async def _rebuild_bloom(self):
+        """Bangun ulang bloom filter dari bucket yang tersisa (key expired dibuang)."""
+        if self.bloom is None:
+            return
+
+        bloom = ScalableBloomFilter(self.bloom_fp_rate, self.bloom_memory_bytes)
+        scanned_to = self._last_event_id
+        async with self.read_pool.acquire() as conn:
+            for bucket in list(self._buckets):
+                try:
+                    async with conn.execute(
+                        f"SELECT topic, event_id FROM {bucket['name']} WHERE id <= ?",
+                        (scanned_to,)
+                    ) as cursor:
+                        async for topic, event_id in cursor:
+                            bloom.add(topic, event_id)
+                except aiosqlite.OperationalError:
+                    if bucket in self._buckets:
+                        raise
+
+        # Catch up event yang di-commit selama scan, lalu swap
+        async with self._lock:
+            async with self.db.execute(
+                f"SELECT topic, event_id FROM {self._events_source()} WHERE id > ?",
+                (scanned_to,)
+            ) as cursor:
+                async for topic, event_id in cursor:
+                    bloom.add(topic, event_id)
+            self.bloom = bloom
+
+    async def _expiry_loop(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.expire_buckets()
+            except Exception as e:
+                logger.error(f"Error expiring retention buckets: {e}", exc_info=True)
+
+    async def _select_events(
+        self,
+        conditions: List[str],
+        params: List[Any],
+        limit: int,
+        offset: int
+    ) -> List[Tuple[Any, ...]]:
+        # Bucket tidak overlap: ambil dari bucket terbaru sampai cukup
+        wanted = limit + offset
+        rows: List[Tuple[Any, ...]] = []
+        async with self.read_pool.acquire() as conn:
+            for bucket in reversed(list(self._buckets)):
+                query = self._events_query(
+                    bucket['name'], conditions, "processed_at DESC, id DESC"
+                ) + " LIMIT ?"
+                try:
+                    async with conn.execute(query, params + [wanted - len(rows)]) as cursor:
+                        rows.extend(await cursor.fetchall())
+                except aiosqlite.OperationalError:
+                    # Bucket di-drop oleh expiry di tengah query
+                    if bucket in self._buckets:
+                        raise
+                if len(rows) >= wanted:
+                    break
+        return rows[offset:offset + limit]
+
+    async def export_events(
+        self,
+        topic: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        chunk_size: int = 1000
+    ) -> AsyncIterator[List[Tuple[Any, ...]]]:
+        conditions, params = self._export_conditions(topic, since, until)
+        buckets = [
+            b for b in self._buckets
+            if (not since or b['end_at'] > since) and (not until or b['start_at'] < until)
+        ]
+
+        for bucket in buckets:
+            try:
+                async for rows in self._export_chunks(bucket['name'], conditions, params, chunk_size):
+                    yield rows
+            except aiosqlite.OperationalError:
+                # Bucket di-drop oleh expiry di tengah export
+                if bucket in self._buckets:
+                    raise
+
+    async def get_retention_stats(self) -> Optional[Dict[str, Any]]:
+        async with self.read_pool.acquire() as conn:
+            sizes = []
+            for pragma in ("page_size", "page_count", "freelist_count"):
+                async with conn.execute(f"PRAGMA {pragma}") as cursor:
+                    sizes.append((await cursor.fetchone())[0])
+        page_size, page_count, freelist_count = sizes
+
+        return {
+            'window_seconds': self.window_seconds,
+            'bucket_seconds': self.bucket_seconds,
+            'buckets': len(self._buckets),
+            'oldest_bucket_start': self._buckets[0]['start_at'] if self._buckets else None,
+            'retained_events': sum(b['event_count'] for b in self._buckets),
+            'retained_bytes': (page_count - freelist_count) * page_size,
+            'free_bytes': freelist_count * page_size,
+            'expired_buckets': self.expired_buckets,
+            'expired_events': self.expired_events
+        }
+
+    async def close(self):
+        if self._expiry_task:
+            self._expiry_task.cancel()
+            try:
+                await self._expiry_task
+            except asyncio.CancelledError:
+                pass
+            self._expiry_task = None
+
+        await super().close()
@@ -0,0 +1,10 @@
+"""
+Routing key (topic, event_id) ke partisi (worker atau shard).
+"""
+
+import zlib
+
+
+def route_key(topic: str, event_id: str, num_partitions: int) -> int:
+    """Hash stabil (tidak tergantung PYTHONHASHSEED) untuk routing."""
+    return zlib.crc32(f"{topic}\x00{event_id}".encode("utf-8")) % num_partitions
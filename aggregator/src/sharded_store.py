@@ -0,0 +1,468 @@
+"""
+Sharded dedup store: N file SQLite, masing-masing satu DedupStore.
+
+Satu file SQLite berarti satu write lock global. Dengan sharding, key
+(topic, event_id) di-route ke shard via hash stabil (routing.route_key),
+dan setiap shard punya writer connection + lock sendiri sehingga commit
+ke shard berbeda berjalan paralel.
+
+Id event global: local_id * num_shards + shard_index. Id global tetap
+monoton di dalam satu shard, sehingga urutan (processed_at, id) per shard
+sama dengan urutan global dan hasil antar shard cukup di-merge (k-way).
+
+File shard disimpan di direktori DB_PATH dengan nama
+"<stem>.shardXX-of-NN<ext>", mis. dedup.shard00-of-04.db. Jumlah shard
+ada di nama file karena routing bergantung pada jumlah shard; database
+single-file atau dengan jumlah shard lain harus dipindah dengan
+tools.reshard terlebih dahulu.
+"""
+
+import asyncio
+import glob
+import heapq
+import logging
+import os
+import re
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from .config import Config
+from .dedup_store import (
+    DedupStore, EventRow, PartialCommitError, decode_cursor, encode_cursor, event_from_row
+)
+from .retention_store import RetentionDedupStore
+from .routing import route_key
+
+logger = logging.getLogger(__name__)
+
+# Connection read minimum per shard: /events dan /health menyentuh semua
+# shard, sehingga pool satu connection per shard langsung antre
+MIN_SHARD_READ_POOL_SIZE = 2
+
+
+def shard_paths(db_path: str, num_shards: int) -> List[str]:
+    """Path file SQLite untuk setiap shard dari db_path."""
+    stem, ext = os.path.splitext(db_path)
+    return [
+        f"{stem}.shard{index:02d}-of-{num_shards:02d}{ext}"
+        for index in range(num_shards)
+    ]
+
+
+def existing_shard_counts(db_path: str) -> List[int]:
+    """Jumlah shard dari file shard yang sudah ada di samping db_path."""
+    stem, ext = os.path.splitext(db_path)
+    pattern = re.compile(re.escape(stem) + r"\.shard\d+-of-(\d+)" + re.escape(ext) + "$")
+    counts = set()
+    for path in glob.glob(f"{glob.escape(stem)}.shard*-of-*{glob.escape(ext)}"):
+        match = pattern.match(path)
+        if match:
+            counts.add(int(match.group(1)))
+    return sorted(counts)
+
+
+def new_store(
+    db_path: str,
+    retention_seconds: Optional[int] = None,
+    bucket_seconds: Optional[int] = None,
+    **kwargs
+) -> DedupStore:
+    """Store untuk satu file SQLite: RetentionDedupStore jika retention aktif."""
+    if retention_seconds is None:
+        retention_seconds = Config.RETENTION_WINDOW_SECONDS
+    if retention_seconds > 0:
+        return RetentionDedupStore(
+            db_path, window_seconds=retention_seconds, bucket_seconds=bucket_seconds, **kwargs
+        )
+    return DedupStore(db_path, **kwargs)
+
+
+def create_store(db_path: str, num_shards: Optional[int] = None, **kwargs):
+    """Store untuk satu file jika num_shards <= 1, selain itu ShardedDedupStore."""
+    if num_shards is None:
+        num_shards = Config.DB_SHARDS
+    if num_shards <= 1:
+        return new_store(db_path, **kwargs)
+    return ShardedDedupStore(db_path, num_shards, **kwargs)
+
+
+class ShardedDedupStore:
+    """
+    Interface sama dengan DedupStore, data dibagi ke num_shards file.
+
+    Budget memori dedup cache dan bloom filter dibagi rata antar shard.
+    Counter received disimpan di shard 0; unique_processed dan
+    duplicate_dropped di shard yang memproses event tersebut.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        num_shards: int,
+        cache_max_bytes: Optional[int] = None,
+        bloom_fp_rate: Optional[float] = None,
+        bloom_memory_bytes: Optional[int] = None,
+        read_pool_size: Optional[int] = None,
+        retention_seconds: Optional[int] = None,
+        bucket_seconds: Optional[int] = None,
+        compress_payloads: Optional[bool] = None,
+        export_pool_size: Optional[int] = None,
+        bloom_filter: Optional[str] = None
+    ):
+        if num_shards < 2:
+            raise ValueError("num_shards harus >= 2")
+
+        self.db_path = db_path
+        self.num_shards = num_shards
+
+        if cache_max_bytes is None:
+            cache_max_bytes = Config.DEDUP_CACHE_MAX_BYTES
+        if bloom_memory_bytes is None:
+            bloom_memory_bytes = Config.BLOOM_MEMORY_BYTES
+        if read_pool_size is None:
+            read_pool_size = Config.READ_POOL_SIZE
+        if export_pool_size is None:
+            export_pool_size = Config.EXPORT_POOL_SIZE
+
+        self.shards: List[DedupStore] = [
+            new_store(
+                path,
+                retention_seconds=retention_seconds,
+                bucket_seconds=bucket_seconds,
+                cache_max_bytes=cache_max_bytes // num_shards,
+                bloom_fp_rate=bloom_fp_rate,
+                bloom_memory_bytes=bloom_memory_bytes // num_shards,
+                bloom_filter=bloom_filter,
+                read_pool_size=max(MIN_SHARD_READ_POOL_SIZE, read_pool_size // num_shards),
+                export_pool_size=max(1, export_pool_size // num_shards),
+                compress_payloads=compress_payloads
+            )
+            for path in shard_paths(db_path, num_shards)
+        ]
+
+        logger.info(f"Sharded dedup store initialized with {num_shards} shards at {db_path}")
+
+    def shard_for(self, topic: str, event_id: str) -> int:
+        return route_key(topic, event_id, self.num_shards)
+
+    def _global_id(self, shard_index: int, local_id: int) -> int:
+        return local_id * self.num_shards + shard_index
+
+    def _local_cursor(self, shard_index: int, processed_at: str, global_id: int) -> str:
+        # (processed_at, gid') < (p, gid) dengan gid' = local' * N + s
+        # <=> (processed_at, local') < (p, ceil((gid - s) / N))
+        bound = (global_id - shard_index + self.num_shards - 1) // self.num_shards
+        return encode_cursor(processed_at, bound)
+
+    async def initialize(self):
+        other_counts = [
+            count for count in existing_shard_counts(self.db_path)
+            if count != self.num_shards
+        ]
+        if other_counts:
+            raise RuntimeError(
+                f"Found shard files for {other_counts} shards next to {self.db_path}, "
+                f"DB_SHARDS={self.num_shards}; run tools.reshard first"
+            )
+
+        is_new = not any(os.path.exists(path) for path in shard_paths(self.db_path, self.num_shards))
+        if is_new and os.path.exists(self.db_path):
+            raise RuntimeError(
+                f"Single-file database {self.db_path} exists; "
+                f"run tools.reshard to split it into {self.num_shards} shards"
+            )
+
+        await asyncio.gather(*(shard.initialize() for shard in self.shards))
+
+    async def is_duplicate(self, topic: str, event_id: str) -> bool:
+        return await self.shards[self.shard_for(topic, event_id)].is_duplicate(topic, event_id)
+
+    async def mark_processed(
+        self,
+        topic: str,
+        event_id: str,
+        timestamp: str,
+        source: str,
+        payload: str
+    ) -> bool:
+        shard = self.shards[self.shard_for(topic, event_id)]
+        return await shard.mark_processed(topic, event_id, timestamp, source, payload)
+
+    async def mark_processed_many(
+        self,
+        events: Sequence[EventRow],
+        update_stats: bool = True
+    ) -> List[bool]:
+        """
+        Bagi batch per shard lalu commit semua shard secara paralel.
+
+        Setiap shard tetap satu transaksi (atomic per shard, tidak atomic
+        antar shard). Return list boolean sejajar dengan input. Jika ada
+        shard yang gagal, raise PartialCommitError berisi hasil shard yang
+        sudah ter-commit (None untuk event di shard yang gagal).
+        """
+        if not events:
+            return []
+
+        positions: List[List[int]] = [[] for _ in self.shards]
+        for i, event in enumerate(events):
+            positions[self.shard_for(event[0], event[1])].append(i)
+
+        used = [index for index, shard_positions in enumerate(positions) if shard_positions]
+        shard_results = await asyncio.gather(*(
+            self.shards[index].mark_processed_many(
+                [events[i] for i in positions[index]],
+                update_stats=update_stats
+            )
+            for index in used
+        ), return_exceptions=True)
+
+        results: List[Optional[bool]] = [None] * len(events)
+        error: Optional[BaseException] = None
+        for index, shard_result in zip(used, shard_results):
+            if isinstance(shard_result, asyncio.CancelledError):
+                raise shard_result
+            if isinstance(shard_result, BaseException):
+                error = error or shard_result
+                continue
+            for i, is_new in zip(positions[index], shard_result):
+                results[i] = is_new
+        if error is not None:
+            raise PartialCommitError(results, error) from error
+        return results
+
+    async def increment_received(self, count: int = 1):
+        await self.shards[0].increment_received(count)
+
+    async def increment_unique_processed(self, count: int = 1):
+        await self.shards[0].increment_unique_processed(count)
+
+    async def increment_duplicate_dropped(self):
+        await self.shards[0].increment_duplicate_dropped()
+
+    async def flush_stats(self):
+        await asyncio.gather(*(shard.flush_stats() for shard in self.shards))
+
+    async def get_stats(self) -> Dict[str, int]:
+        per_shard = [await shard.get_stats() for shard in self.shards]
+        unique_processed = sum(s['unique_processed'] for s in per_shard)
+        duplicate_dropped = sum(s['duplicate_dropped'] for s in per_shard)
+        # received hanya dihitung di shard 0; rekonsiliasi crash di shard
+        # lain menaikkan received lokalnya sehingga tidak dijumlahkan
+        return {
+            'received': max(per_shard[0]['received'], unique_processed + duplicate_dropped),
+            'unique_processed': unique_processed,
+            'duplicate_dropped': duplicate_dropped
+        }
+
+    def get_read_pool_stats(self) -> Dict[str, Any]:
+        stats = [shard.get_read_pool_stats() for shard in self.shards]
+        acquisitions = sum(s['acquisitions'] for s in stats)
+        return {
+            'size': sum(s['size'] for s in stats),
+            'available': sum(s['available'] for s in stats),
+            'acquisitions': acquisitions,
+            'waits': sum(s['waits'] for s in stats),
+            'avg_wait_ms': round(
+                sum(s['avg_wait_ms'] * s['acquisitions'] for s in stats) / acquisitions, 3
+            ) if acquisitions else 0.0,
+            'max_wait_ms': max(s['max_wait_ms'] for s in stats)
+        }
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        stats = [shard.get_cache_stats() for shard in self.shards]
+        totals = {
+            key: sum(s[key] for s in stats)
+            for key in ('entries', 'bytes', 'max_bytes', 'hits', 'misses', 'evictions')
+        }
+        lookups = totals['hits'] + totals['misses']
+        totals['hit_rate'] = round(totals['hits'] / lookups, 4) if lookups else 0.0
+        return totals
+
+    def get_compression_stats(self) -> Dict[str, Any]:
+        stats = [shard.get_compression_stats() for shard in self.shards]
+        totals = {
+            key: sum(s[key] for s in stats)
+            for key in ('dictionaries', 'compressed_payloads', 'raw_bytes', 'stored_bytes', 'migrated_rows')
+        }
+        return {
+            'enabled': stats[0]['enabled'],
+            **totals,
+            'ratio': round(totals['stored_bytes'] / totals['raw_bytes'], 4) if totals['raw_bytes'] else 0.0,
+            'migration_pending': any(s['migration_pending'] for s in stats)
+        }
+
+    def get_bloom_stats(self) -> Optional[Dict[str, Any]]:
+        stats = [shard.get_bloom_stats() for shard in self.shards]
+        if any(s is None for s in stats):
+            return None
+        return {
+            'filters': sum(s['filters'] for s in stats),
+            'keys': sum(s['keys'] for s in stats),
+            'memory_bytes': sum(s['memory_bytes'] for s in stats),
+            'target_fp_rate': stats[0]['target_fp_rate'],
+            'estimated_fp_rate': max(s['estimated_fp_rate'] for s in stats),
+            'lookups': sum(s['lookups'] for s in stats),
+            'selects_skipped': sum(s['selects_skipped'] for s in stats)
+        }
+
+    async def get_retention_stats(self) -> Optional[Dict[str, Any]]:
+        stats = [await shard.get_retention_stats() for shard in self.shards]
+        if any(s is None for s in stats):
+            return None
+        starts = [s['oldest_bucket_start'] for s in stats if s['oldest_bucket_start'] is not None]
+        return {
+            'window_seconds': stats[0]['window_seconds'],
+            'bucket_seconds': stats[0]['bucket_seconds'],
+            'buckets': sum(s['buckets'] for s in stats),
+            'oldest_bucket_start': min(starts) if starts else None,
+            **{
+                key: sum(s[key] for s in stats)
+                for key in (
+                    'retained_events', 'retained_bytes', 'free_bytes',
+                    'expired_buckets', 'expired_events'
+                )
+            }
+        }
+
+    async def get_events(
+        self,
+        topic: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        rows = await self.get_event_rows(topic=topic, limit=limit, offset=offset, cursor=cursor)
+        return [event_from_row(row) for row in rows]
+
+    async def get_event_rows(
+        self,
+        topic: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> List[Tuple[Any, ...]]:
+        """
+        Merge hasil semua shard, terbaru dulu (processed_at DESC, id DESC).
+
+        Setiap shard mengambil limit + offset row teratas (cursor
+        diterjemahkan ke id lokal shard), lalu di-merge dan di-slice.
+        """
+        position = decode_cursor(cursor) if cursor else None
+
+        async def fetch(index: int) -> List[Tuple[Any, ...]]:
+            local_cursor = self._local_cursor(index, *position) if position else None
+            rows = await self.shards[index].get_event_rows(
+                topic=topic, limit=limit + offset, offset=0, cursor=local_cursor
+            )
+            return [(self._global_id(index, row[0]),) + row[1:] for row in rows]
+
+        per_shard = await asyncio.gather(*(fetch(index) for index in range(self.num_shards)))
+        merged = heapq.merge(
+            *per_shard,
+            key=lambda row: (row[6], row[0]),
+            reverse=True
+        )
+
+        rows = []
+        for i, row in enumerate(merged):
+            if i >= offset + limit:
+                break
+            if i >= offset:
+                rows.append(row)
+        return rows
+
+    async def export_events(
+        self,
+        topic: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        chunk_size: int = 1000
+    ) -> AsyncIterator[List[Tuple[Any, ...]]]:
+        """
+        K-way merge export semua shard, urut (processed_at, id) ASC.
+
+        Memori tetap O(num_shards * chunk_size): setiap shard hanya
+        menyimpan satu chunk di buffer. Export shard memakai export_pool
+        dan melepas connection setiap chunk, sehingga merge yang menunggu
+        client lambat tidak menahan connection shard mana pun.
+        """
+        generators = [
+            shard.export_events(topic=topic, since=since, until=until, chunk_size=chunk_size)
+            for shard in self.shards
+        ]
+        buffers: List[List[Tuple[Any, ...]]] = [[] for _ in generators]
+        heap: List[Tuple[str, int, int, int]] = []
+
+        async def refill(index: int):
+            try:
+                rows = await generators[index].__anext__()
+            except StopAsyncIteration:
+                return
+            buffers[index] = rows
+            row = rows[0]
+            heapq.heappush(heap, (row[6], self._global_id(index, row[0]), index, 0))
+
+        try:
+            for index in range(self.num_shards):
+                await refill(index)
+
+            out: List[Tuple[Any, ...]] = []
+            while heap:
+                _, global_id, index, position = heapq.heappop(heap)
+                row = buffers[index][position]
+                out.append((global_id,) + tuple(row[1:]))
+
+                position += 1
+                if position < len(buffers[index]):
+                    row = buffers[index][position]
+                    heapq.heappush(heap, (row[6], self._global_id(index, row[0]), index, position))
+                else:
+                    await refill(index)
+
+                if len(out) >= chunk_size:
+                    yield out
+                    out = []
+
+            if out:
+                yield out
+        finally:
+            # Kembalikan read connection setiap shard
+            for generator in generators:
+                await generator.aclose()
+
+    async def count_events(self, topic: Optional[str] = None) -> int:
+        counts = [await shard.count_events(topic) for shard in self.shards]
+        return sum(counts)
+
+    async def get_topics(self) -> List[str]:
+        topics = set()
+        for shard in self.shards:
+            topics.update(await shard.get_topics())
+        return sorted(topics)
+
+    async def get_topic_counts(self) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        for shard in self.shards:
+            for topic, count in (await shard.get_topic_counts()).items():
+                totals[topic] = totals.get(topic, 0) + count
+        return dict(sorted(totals.items()))
+
+    async def verify_topic_counts(self, repair: bool = False) -> Dict[str, Tuple[int, int]]:
+        """Seperti DedupStore.verify_topic_counts, dijumlahkan per topic."""
+        totals: Dict[str, Tuple[int, int]] = {}
+        for shard in self.shards:
+            for topic, (stored, actual) in (await shard.verify_topic_counts(repair)).items():
+                prev_stored, prev_actual = totals.get(topic, (0, 0))
+                totals[topic] = (prev_stored + stored, prev_actual + actual)
+        return totals
+
+    async def health_check(self) -> bool:
+        await asyncio.gather(*(shard.health_check() for shard in self.shards))
+        return True
+
+    def save_bloom_snapshot(self):
+        for shard in self.shards:
+            shard.save_bloom_snapshot()
+
+    async def close(self):
+        await asyncio.gather(*(shard.close() for shard in self.shards))
@@ -0,0 +1,405 @@
+"""
+Worker pool untuk consumer Pub-Sub Log Aggregator
+
+Event di-route ke worker berdasarkan hash stabil dari (topic, event_id),
+sehingga event dengan key yang sama selalu diproses oleh worker yang sama
+secara FIFO (ordering per key terjaga). Semua write ke SQLite melewati
+satu BatchWriter sehingga worker tidak berebut write lock SQLite.
+
+Jika ingest log aktif, event dibaca dari log (bukan di-put oleh handler
+HTTP) dan offset-nya di-ack ke log setelah batch ter-commit.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .dedup_store import DedupStore, EventRow, PartialCommitError
+from .ingest_log import IngestLog, decode_log_event
+from .metrics import DUPLICATE_DROPPED, QUEUE_WAIT_SECONDS, UNIQUE_PROCESSED, count_topics
+from .routing import route_key
+
+logger = logging.getLogger(__name__)
+
+# Backoff retry batch yang gagal ditulis (detik): 0.1, 0.2, 0.4, ... maks 5
+RETRY_BACKOFF_INITIAL = 0.1
+RETRY_BACKOFF_MAX = 5.0
+
+
+async def collect_batch(
+    queue: asyncio.Queue,
+    max_size: int,
+    max_linger_ms: float
+) -> List[Any]:
+    # Tunggu item pertama, lalu kumpulkan item berikutnya sampai
+    # max_size atau max_linger_ms habis
+    batch = [await queue.get()]
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_linger_ms / 1000
+
+    while len(batch) < max_size:
+        try:
+            batch.append(queue.get_nowait())
+            continue
+        except asyncio.QueueEmpty:
+            pass
+
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+        except asyncio.TimeoutError:
+            break
+
+    return batch
+
+
+class BatchWriter:
+    """
+    Single serialized writer.
+
+    Worker men-submit batch rows dan menunggu hasilnya. Writer menggabungkan
+    semua batch yang sedang menunggu menjadi satu transaksi
+    mark_processed_many, lalu membagikan hasil per-event ke tiap worker.
+    Urutan submit dipertahankan (FIFO).
+    """
+
+    def __init__(self, store: DedupStore):
+        self.store = store
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self.transactions = 0
+
+    async def submit(self, rows: List[EventRow]) -> List[bool]:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((rows, future))
+        return await future
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        logger.info("Batch writer started")
+
+        while True:
+            pending: List[Tuple[List[EventRow], asyncio.Future]] = [await self._queue.get()]
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+
+            rows: List[EventRow] = []
+            for batch_rows, _ in pending:
+                rows.extend(batch_rows)
+
+            try:
+                results = await self.store.mark_processed_many(rows)
+                self.transactions += 1
+            except asyncio.CancelledError:
+                for _, future in pending:
+                    if not future.done():
+                        future.cancel()
+                raise
+            except PartialCommitError as e:
+                # Hasil yang sudah ter-commit dibagikan per worker agar retry
+                # hanya mengirim ulang event yang belum ter-commit
+                start = 0
+                for batch_rows, future in pending:
+                    end = start + len(batch_rows)
+                    if not future.done():
+                        future.set_exception(PartialCommitError(e.results[start:end], e.cause))
+                    start = end
+                continue
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            start = 0
+            for batch_rows, future in pending:
+                end = start + len(batch_rows)
+                if not future.done():
+                    future.set_result(results[start:end])
+                start = end
+
+
+class WorkerPool:
+    """
+    Pool N consumer worker, masing-masing dengan queue sendiri.
+    """
+
+    def __init__(
+        self,
+        store: DedupStore,
+        num_workers: int,
+        queue_max_size: int,
+        batch_max_size: int,
+        batch_max_linger_ms: float,
+        ingest_log: Optional[IngestLog] = None
+    ):
+        self.num_workers = max(1, num_workers)
+        self.ingest_log = ingest_log
+        self.batch_max_size = batch_max_size
+        self.batch_max_linger_ms = batch_max_linger_ms
+
+        # Queue worker hanya dibatasi jika feeder membaca dari ingest log
+        # (put menunggu, event tetap aman di log). Tanpa log, batas depth
+        # adalah admission control atas total qsize(): routing hash bisa
+        # memenuhi satu queue lebih dulu (hot key / topic), dan put ke queue
+        # terbatas akan memblok request publish tanpa batas waktu
+        per_worker_size = math.ceil(queue_max_size / self.num_workers) if ingest_log is not None else 0
+        self.queues: List[asyncio.Queue] = [
+            asyncio.Queue(maxsize=per_worker_size) for _ in range(self.num_workers)
+        ]
+        self.writer = BatchWriter(store)
+        self._tasks: List[asyncio.Task] = []
+        self._feeder: Optional[asyncio.Task] = None
+        self._started_at = time.monotonic()
+        self._worker_stats: List[Dict[str, Any]] = [
+            {
+                'processed': 0,
+                'unique_processed': 0,
+                'duplicate_dropped': 0,
+                'batches': 0,
+                'failed_attempts': 0,
+                'busy_seconds': 0.0
+            }
+            for _ in range(self.num_workers)
+        ]
+
+    def _queue_for(self, event) -> asyncio.Queue:
+        return self.queues[route_key(event.topic, event.event_id, self.num_workers)]
+
+    # Item queue: (event, offset ingest log atau None, waktu enqueue)
+    async def put(self, event, offset: Optional[int] = None):
+        await self._queue_for(event).put((event, offset, time.perf_counter()))
+
+    def put_nowait(self, event, offset: Optional[int] = None):
+        self._queue_for(event).put_nowait((event, offset, time.perf_counter()))
+
+    def queue_depths(self) -> Dict[int, int]:
+        return {worker_id: queue.qsize() for worker_id, queue in enumerate(self.queues)}
+
+    def qsize(self) -> int:
+        return sum(q.qsize() for q in self.queues)
+
+    async def join(self):
+        """Tunggu sampai semua event di queue selesai diproses."""
+        for queue in self.queues:
+            await queue.join()
+
+    def start(self):
+        self._started_at = time.monotonic()
+        self.writer.start()
+        self._tasks = [
+            asyncio.create_task(self._worker(worker_id))
+            for worker_id in range(self.num_workers)
+        ]
+        if self.ingest_log is not None:
+            self._feeder = asyncio.create_task(self._feed_from_log())
+        logger.info(f"Worker pool started with {self.num_workers} workers")
+
+    async def stop(self):
+        if self._feeder:
+            self._feeder.cancel()
+            try:
+                await self._feeder
+            except asyncio.CancelledError:
+                pass
+            self._feeder = None
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        await self.writer.stop()
+
+    def processed_total(self) -> int:
+        return sum(counters['processed'] for counters in self._worker_stats)
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        uptime = max(time.monotonic() - self._started_at, 1e-9)
+        stats = []
+        for worker_id, (queue, counters) in enumerate(zip(self.queues, self._worker_stats)):
+            stats.append({
+                'worker_id': worker_id,
+                'queue_size': queue.qsize(),
+                'events_per_sec': round(counters['processed'] / uptime, 2),
+                'utilization': round(min(counters['busy_seconds'] / uptime, 1.0), 4),
+                **counters,
+                'busy_seconds': round(counters['busy_seconds'], 3)
+            })
+        return stats
+
+    async def _feed_from_log(self):
+        # Baca event durable dari ingest log secara berurutan; put() menunggu
+        # jika queue worker penuh (event tetap aman di log)
+        offset = self.ingest_log.acked_offset
+        logger.info(f"Ingest log consumer started at offset {offset}")
+
+        while True:
+            records = await self.ingest_log.read(offset, self.batch_max_size)
+            for record_offset, payload in records:
+                await self.put(decode_log_event(payload), record_offset)
+            offset = records[-1][0] + 1
+
+    async def _worker(self, worker_id: int):
+        logger.info(f"Event consumer {worker_id} started")
+        queue = self.queues[worker_id]
+
+        while True:
+            # Get micro-batch from queue
+            batch = await collect_batch(
+                queue, self.batch_max_size, self.batch_max_linger_ms
+            )
+            try:
+                await self._process_with_retry(worker_id, batch)
+            finally:
+                # Mark task done untuk setiap event di batch
+                for _ in batch:
+                    queue.task_done()
+
+    async def _process_with_retry(self, worker_id: int, batch: List[Any]):
+        # Batch yang gagal (mis. database locked / disk penuh sementara)
+        # diulang sampai berhasil, tidak di-drop: offset ingest log di-ack
+        # berurutan, sehingga satu batch yang hilang akan menahan watermark
+        # ack (checkpoint, hapus segment, depth admission) selamanya. Selama
+        # retry, queue worker ini penuh dan admission menolak dengan 429.
+        # Insert idempotent (INSERT OR IGNORE), sehingga retry aman; event
+        # yang sudah ter-commit di attempt sebelumnya (PartialCommitError,
+        # mis. shard lain yang gagal) tidak dikirim ulang agar tidak
+        # terhitung sebagai duplikat.
+        counters = self._worker_stats[worker_id]
+        results: List[Optional[bool]] = [None] * len(batch)
+        delay = RETRY_BACKOFF_INITIAL
+        while True:
+            try:
+                await self._process_batch(worker_id, batch, results)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                counters['failed_attempts'] += 1
+                logger.error(
+                    f"Error in event consumer {worker_id}, retrying batch of "
+                    f"{len(batch)} events in {delay:.1f}s: {str(e)}",
+                    exc_info=True
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RETRY_BACKOFF_MAX)
+
+    async def _process_batch(self, worker_id: int, batch: List[Any], results: List[Optional[bool]]):
+        counters = self._worker_stats[worker_id]
+        started = time.monotonic()
+
+        dequeued = time.perf_counter()
+        observe_wait = QUEUE_WAIT_SECONDS.observe
+        for _, _, enqueued in batch:
+            observe_wait(dequeued - enqueued)
+
+        todo = [i for i, is_new in enumerate(results) if is_new is None]
+        rows = [
+            (event.topic, event.event_id, event.timestamp, event.source,
+             json.dumps(event.payload))
+            for event, _, _ in (batch[i] for i in todo)
+        ]
+
+        # Satu transaksi untuk seluruh batch (insert + update stats),
+        # digabung dengan batch worker lain oleh BatchWriter.
+        # INSERT OR IGNORE pada UNIQUE(topic, event_id) yang menentukan
+        # apakah event baru atau duplikat, termasuk duplikat dalam batch.
+        try:
+            committed = await self.writer.submit(rows)
+        except PartialCommitError as e:
+            for i, is_new in zip(todo, e.results):
+                results[i] = is_new
+            raise
+        for i, is_new in zip(todo, committed):
+            results[i] = is_new
+
+        inserted = 0
+        for (event, _, _), is_new in zip(batch, results):
+            if is_new:
+                inserted += 1
+                UNIQUE_PROCESSED.inc(event.topic)
+                logger.info(
+                    f"EVENT PROCESSED - topic: {event.topic}, "
+                    f"event_id: {event.event_id}, source: {event.source}"
+                )
+            else:
+                # Event sudah pernah diproses, drop
+                DUPLICATE_DROPPED.inc(event.topic)
+                logger.warning(
+                    f"DUPLICATE DROPPED - topic: {event.topic}, "
+                    f"event_id: {event.event_id}, source: {event.source}"
+                )
+
+        counters['processed'] += len(batch)
+        counters['unique_processed'] += inserted
+        counters['duplicate_dropped'] += len(batch) - inserted
+        counters['batches'] += 1
+        counters['busy_seconds'] += time.monotonic() - started
+
+        if self.ingest_log is not None:
+            self.ingest_log.ack(offset for _, offset, _ in batch if offset is not None)
+
+
+async def replay_ingest_log(
+    ingest_log: IngestLog,
+    store: DedupStore,
+    batch_size: int
+) -> Tuple[int, int]:
+    """
+    Replay event di ingest log dari checkpoint sampai akhir log, sebelum
+    worker pool start. Return (jumlah event di-replay, jumlah event baru).
+
+    Event yang sudah ter-commit sebelum crash (tapi belum masuk checkpoint)
+    terdeteksi sebagai duplikat oleh DedupStore dan tidak dihitung sebagai
+    duplicate_dropped; hanya event baru yang menambah unique_processed.
+    """
+    offset = ingest_log.acked_offset
+    replayed = 0
+    inserted = 0
+
+    while offset < ingest_log.end_offset:
+        records = ingest_log.read_available(offset, batch_size)
+        events = [decode_log_event(payload) for _, payload in records]
+        rows = [
+            (event.topic, event.event_id, event.timestamp, event.source,
+             json.dumps(event.payload))
+            for event in events
+        ]
+        results = await store.mark_processed_many(rows, update_stats=False)
+        count_topics(UNIQUE_PROCESSED, (event for event, is_new in zip(events, results) if is_new))
+
+        replayed += len(records)
+        inserted += sum(results)
+        ingest_log.ack(record_offset for record_offset, _ in records)
+        offset = records[-1][0] + 1
+
+    if inserted:
+        await store.increment_unique_processed(inserted)
+    if replayed:
+        ingest_log.checkpoint()
+        logger.warning(
+            f"Replayed {replayed} events from ingest log, "
+            f"{inserted} were not yet processed before shutdown"
+        )
+
+    return replayed, inserted
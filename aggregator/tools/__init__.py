@@ -0,0 +1,6 @@
+"""
+Maintenance tools untuk Pub-Sub Log Aggregator.
+
+Jalankan dari direktori aggregator/, contoh:
+    python -m tools.check_counters --db /var/lib/aggregator/dedup.db
+"""
@@ -0,0 +1,60 @@
+"""
+Consistency check counter per topic.
+
+Menghitung ulang jumlah event per topic dari processed_events dan
+membandingkannya dengan counter di tabel topics. Dengan --repair,
+counter yang tidak konsisten diperbaiki.
+
+Usage (dari direktori aggregator/):
+    python -m tools.check_counters [--db PATH] [--shards N] [--repair]
+
+Jalankan --repair saat aggregator tidak berjalan, karena aggregator
+menyimpan cache counter di memori.
+"""
+
+import argparse
+import asyncio
+import sys
+
+from src.config import Config
+from src.sharded_store import create_store
+
+
+async def check_counters(db_path: str, repair: bool, num_shards: int = 1) -> int:
+    store = create_store(db_path, num_shards, cache_max_bytes=0, bloom_memory_bytes=0)
+    await store.initialize()
+
+    try:
+        mismatches = await store.verify_topic_counts(repair=repair)
+
+        if not mismatches:
+            counts = await store.get_topic_counts()
+            print(f"OK: {len(counts)} topics, {sum(counts.values())} events, counters consistent")
+            return 0
+
+        print(f"{'topic':<30} {'stored':>12} {'actual':>12}")
+        for topic, (stored, actual) in sorted(mismatches.items()):
+            print(f"{topic:<30} {stored:>12} {actual:>12}")
+
+        if repair:
+            print(f"REPAIRED: {len(mismatches)} topic counters recomputed")
+            return 0
+
+        print(f"MISMATCH: {len(mismatches)} topic counters inconsistent (run with --repair)")
+        return 1
+    finally:
+        await store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check per-topic event counters")
+    parser.add_argument("--db", default=Config.DB_PATH, help="Path ke SQLite database")
+    parser.add_argument("--shards", type=int, default=Config.DB_SHARDS, help="Jumlah shard database")
+    parser.add_argument("--repair", action="store_true", help="Perbaiki counter yang tidak konsisten")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(check_counters(args.db, args.repair, args.shards)))
+
+
+if __name__ == "__main__":
+    main()
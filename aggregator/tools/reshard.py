@@ -0,0 +1,216 @@
+"""
+Reshard database dedup ke jumlah shard lain.
+
+Menyalin seluruh processed_events dari database sumber (single file atau
+shard set lama) ke shard baru, me-route setiap key dengan route_key yang
+sama seperti ShardedDedupStore. processed_at dan payload disalin apa
+adanya; counter per topic dan tabel stats dihitung ulang di shard baru.
+Bloom filter shard baru dibangun ulang dari processed_events saat
+aggregator start. Payload terkompresi disalin sebagai JSON text.
+
+File sumber (beserta -wal/-shm/.bloom) di-rename dengan suffix
+.pre-reshard setelah copy berhasil, tidak dihapus.
+
+Usage (dari direktori aggregator/):
+    python -m tools.reshard --shards N [--db PATH] [--from-shards M]
+
+Jalankan saat aggregator tidak berjalan, lalu start aggregator dengan
+DB_SHARDS=N.
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+from typing import Dict, List
+
+from src.config import Config
+from src.dedup_store import DedupStore
+from src.payload_codec import PayloadCodec
+from src.routing import route_key
+from src.sharded_store import shard_paths
+
+COPY_CHUNK_SIZE = 10000
+BACKUP_SUFFIX = ".pre-reshard"
+
+
+def store_paths(db_path: str, num_shards: int) -> List[str]:
+    if num_shards <= 1:
+        return [db_path]
+    return shard_paths(db_path, num_shards)
+
+
+async def create_schema(paths: List[str]):
+    # Schema dibuat oleh DedupStore agar identik dengan yang dipakai aggregator
+    for path in paths:
+        store = DedupStore(path, cache_max_bytes=0, bloom_memory_bytes=0, read_pool_size=1)
+        await store.initialize()
+        await store.close()
+
+
+def uses_retention_buckets(path: str) -> bool:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'retention_buckets'"
+        ).fetchone() is not None
+    finally:
+        conn.close()
+
+
+def read_source_stats(sources: List[sqlite3.Connection]) -> Dict[str, int]:
+    totals = {'received': 0, 'duplicate_dropped': 0}
+    for conn in sources:
+        row = conn.execute(
+            "SELECT received, duplicate_dropped FROM stats WHERE id = 1"
+        ).fetchone()
+        if row:
+            totals['received'] += row[0]
+            totals['duplicate_dropped'] += row[1]
+    return totals
+
+
+def load_codec(conn: sqlite3.Connection) -> PayloadCodec:
+    # Dictionary kompresi hanya berlaku di file sumbernya, payload disalin
+    # sebagai JSON text (dikompresi ulang oleh migrasi di shard tujuan)
+    codec = PayloadCodec(enabled=False)
+    has_dicts = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'payload_dicts'"
+    ).fetchone()
+    if has_dicts:
+        codec.load(conn.execute("SELECT id, topic, dictionary FROM payload_dicts").fetchall())
+    return codec
+
+
+def copy_events(sources: List[sqlite3.Connection], targets: List[sqlite3.Connection]):
+    for target in targets:
+        target.execute("BEGIN IMMEDIATE")
+
+    for source in sources:
+        codec = load_codec(source)
+        cursor = source.execute("""
+            SELECT topic, event_id, timestamp, source, payload, processed_at
+            FROM processed_events
+            ORDER BY processed_at, id
+        """)
+        while True:
+            rows = cursor.fetchmany(COPY_CHUNK_SIZE)
+            if not rows:
+                break
+            rows = codec.decode_rows(rows, index=4)
+            per_target: List[List[tuple]] = [[] for _ in targets]
+            for row in rows:
+                per_target[route_key(row[0], row[1], len(targets))].append(row)
+            for index, target_rows in enumerate(per_target):
+                if target_rows:
+                    targets[index].executemany("""
+                        INSERT OR IGNORE INTO processed_events
+                        (topic, event_id, timestamp, source, payload, processed_at)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, target_rows)
+
+
+def finalize_targets(targets: List[sqlite3.Connection], source_stats: Dict[str, int]) -> List[int]:
+    counts = []
+    for index, target in enumerate(targets):
+        target.execute("""
+            INSERT INTO topics (topic, event_count)
+            SELECT topic, COUNT(*) FROM processed_events GROUP BY topic
+            ON CONFLICT(topic) DO UPDATE SET event_count = excluded.event_count
+        """)
+        unique_processed, last_event_id = target.execute(
+            "SELECT COUNT(*), COALESCE(MAX(id), 0) FROM processed_events"
+        ).fetchone()
+
+        # received dan duplicate_dropped global disimpan di shard 0
+        received = source_stats['received'] if index == 0 else 0
+        duplicate_dropped = source_stats['duplicate_dropped'] if index == 0 else 0
+        target.execute("""
+            UPDATE stats
+            SET received = ?, unique_processed = ?, duplicate_dropped = ?, last_event_id = ?
+            WHERE id = 1
+        """, (received, unique_processed, duplicate_dropped, last_event_id))
+        counts.append(unique_processed)
+
+    for target in targets:
+        target.execute("COMMIT")
+    return counts
+
+
+def remove_targets(paths: List[str]):
+    for path in paths:
+        for suffix in ("", "-wal", "-shm", ".bloom"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def backup_sources(paths: List[str]):
+    for path in paths:
+        for suffix in ("", "-wal", "-shm", ".bloom"):
+            if os.path.exists(path + suffix):
+                os.replace(path + suffix, path + suffix + BACKUP_SUFFIX)
+
+
+async def reshard(db_path: str, from_shards: int, to_shards: int) -> int:
+    source_paths = store_paths(db_path, from_shards)
+    target_paths = store_paths(db_path, to_shards)
+
+    if from_shards == to_shards:
+        print(f"Nothing to do: database already has {to_shards} shard(s)")
+        return 0
+
+    missing = [path for path in source_paths if not os.path.exists(path)]
+    if missing:
+        print(f"ERROR: source database not found: {', '.join(missing)}")
+        return 1
+
+    bucketed = [path for path in source_paths if uses_retention_buckets(path)]
+    if bucketed:
+        print(f"ERROR: reshard does not support retention buckets: {', '.join(bucketed)}")
+        return 1
+
+    existing = [path for path in target_paths if os.path.exists(path)]
+    if existing:
+        print(f"ERROR: target already exists: {', '.join(existing)}")
+        return 1
+
+    await create_schema(target_paths)
+
+    sources = [sqlite3.connect(path) for path in source_paths]
+    targets = [sqlite3.connect(path, isolation_level=None) for path in target_paths]
+    try:
+        source_stats = read_source_stats(sources)
+        copy_events(sources, targets)
+        counts = finalize_targets(targets, source_stats)
+    except Exception:
+        # Shard tujuan dihapus agar reshard bisa diulang
+        for conn in sources + targets:
+            conn.close()
+        remove_targets(target_paths)
+        raise
+
+    for conn in sources + targets:
+        conn.close()
+
+    backup_sources(source_paths)
+
+    for path, count in zip(target_paths, counts):
+        print(f"{path:<60} {count:>12} events")
+    print(f"OK: {sum(counts)} events resharded from {from_shards} to {to_shards} shard(s)")
+    print(f"Source files renamed with suffix {BACKUP_SUFFIX}; start aggregator with DB_SHARDS={to_shards}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reshard the dedup database")
+    parser.add_argument("--db", default=Config.DB_PATH, help="DB_PATH database")
+    parser.add_argument("--shards", type=int, required=True, help="Jumlah shard tujuan (1 = single file)")
+    parser.add_argument("--from-shards", type=int, default=1, help="Jumlah shard sumber (default: single file)")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(reshard(args.db, args.from_shards, args.shards)))
+
+
+if __name__ == "__main__":
+    main()
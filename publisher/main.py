@@ -5,24 +5,63 @@
 # - Send events ke aggregator via HTTP
 # - Support batch publishing
 # - Configurable throughput
+# - Satu client keep-alive (opsional HTTP/2) dengan MAX_IN_FLIGHT batch
+#   paralel; generate batch berjalan sambil batch lain dikirim
+# - MODE=open: open-loop pada TARGET_RATE events/sec dengan histogram
+#   latency ack dan end-to-end (dikoreksi coordinated omission)
+# - Workload deterministik per profile + seed (workload.py), bisa direkam
+#   ke NDJSON dan di-replay
 
 import asyncio
 import httpx
+import json
 import logging
-import random
-import uuid
-from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
 import os
 import time
 
+from workload import PROFILES, WorkloadGenerator, count_records, get_profile, replay, write_records
+
 # Configuration
 TARGET_URL = os.getenv("TARGET_URL", "http://aggregator:8080/publish")
 NUM_EVENTS = int(os.getenv("NUM_EVENTS", "20000"))
 DUPLICATE_RATE = float(os.getenv("DUPLICATE_RATE", "0.30"))  # 30% duplikasi
 BATCH_SIZE = int(os.getenv("BATCH_SIZE", "100"))
-DELAY_BETWEEN_BATCHES = float(os.getenv("DELAY_BETWEEN_BATCHES", "0.1"))
+# Jeda per sender setelah setiap batch (0 = kirim secepatnya)
+DELAY_BETWEEN_BATCHES = float(os.getenv("DELAY_BETWEEN_BATCHES", "0"))
+# Jumlah batch yang boleh menunggu response bersamaan (= koneksi di pool)
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", "4"))
+# HTTP/2 hanya ter-negosiasi lewat TLS (ALPN), mis. target https di belakang
+# reverse proxy; uvicorn sendiri melayani HTTP/1.1
+HTTP2 = os.getenv("HTTP2", "false").lower() == "true"
 TOPICS = os.getenv("TOPICS", "logs,metrics,events,alerts").split(",")
+MAX_RETRIES = int(os.getenv("MAX_RETRIES", "10"))  # retry batch yang ditolak 429
+
+# Workload (lihat workload.py)
+# WORKLOAD_PROFILE: bentuk traffic (uniform, production, bursty, large-payload);
+#   TOPICS dan DUPLICATE_RATE tetap berlaku untuk semua profile
+# WORKLOAD_SEED: seed generator; profile + seed sama = urutan event sama
+# RECORD_PATH: rekam event yang dikirim ke file NDJSON
+# REPLAY_PATH: kirim ulang file NDJSON (menggantikan generator dan NUM_EVENTS)
+WORKLOAD_PROFILE = os.getenv("WORKLOAD_PROFILE", "uniform")
+WORKLOAD_SEED = int(os.getenv("WORKLOAD_SEED", "42"))
+RECORD_PATH = os.getenv("RECORD_PATH", "")
+REPLAY_PATH = os.getenv("REPLAY_PATH", "")
+
+# Open-loop mode (MODE=open)
+# TARGET_RATE: events/sec yang dijadwalkan, tidak bergantung pada response
+# STATS_URL: endpoint /stats untuk mengukur end-to-end (default dari TARGET_URL)
+# E2E_POLL_INTERVAL: interval polling /stats (resolusi latency end-to-end)
+# E2E_TIMEOUT: batas menunggu event selesai diproses setelah pengiriman
+# REPORT_PATH: file report JSON ("" = tidak ditulis); di container
+#   default ke /app/data (satu-satunya direktori yang writable oleh appuser)
+MODE = os.getenv("MODE", "closed")
+TARGET_RATE = float(os.getenv("TARGET_RATE", "1000"))
+STATS_URL = os.getenv("STATS_URL") or urlunsplit(urlsplit(TARGET_URL)._replace(path="/stats"))
+E2E_POLL_INTERVAL = float(os.getenv("E2E_POLL_INTERVAL", "0.02"))
+E2E_TIMEOUT = float(os.getenv("E2E_TIMEOUT", "60"))
+REPORT_PATH = os.getenv("REPORT_PATH", "publisher-report.json")
 
 # Setup logging
 logging.basicConfig(
@@ -32,143 +71,393 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class LatencyHistogram:
+    """
+    Histogram latency gaya HdrHistogram (log-linear): nilai dalam
+    mikrodetik, setiap rentang pangkat dua dibagi 2^(SUB_BUCKET_BITS-1)
+    bucket linear, sehingga error relatif < 1% dari 1us sampai berjam-jam
+    dengan memori kecil (bucket sparse).
+    """
+    
+    SUB_BUCKET_BITS = 8
+    PERCENTILES = (50.0, 90.0, 99.0, 99.9, 99.99)
+    
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.sum_us = 0
+        self.min_us: Optional[int] = None
+        self.max_us = 0
+    
+    @classmethod
+    def _index(cls, value: int) -> int:
+        shift = value.bit_length() - cls.SUB_BUCKET_BITS
+        if shift <= 0:
+            return value
+        half = 1 << (cls.SUB_BUCKET_BITS - 1)
+        return (shift + 1) * half + (value >> shift) - half
+    
+    @classmethod
+    def _highest_equivalent(cls, index: int) -> int:
+        half = 1 << (cls.SUB_BUCKET_BITS - 1)
+        if index < 2 * half:
+            return index
+        shift = index // half - 1
+        mantissa = index % half + half
+        return ((mantissa + 1) << shift) - 1
+    
+    def record(self, seconds: float, count: int = 1):
+        value = max(0, int(seconds * 1_000_000))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total += count
+        self.sum_us += value * count
+        self.min_us = value if self.min_us is None else min(self.min_us, value)
+        self.max_us = max(self.max_us, value)
+    
+    def percentile(self, percent: float) -> float:
+        """Latency (ms) pada percentile, nilai tertinggi dari bucket-nya."""
+        if not self.total:
+            return 0.0
+        target = max(1, int(self.total * percent / 100 + 0.5))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max_us) / 1000
+        return self.max_us / 1000
+    
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'count': self.total,
+            'min_ms': (self.min_us or 0) / 1000,
+            'mean_ms': round(self.sum_us / self.total / 1000, 3) if self.total else 0.0,
+            'max_ms': self.max_us / 1000,
+            'percentiles_ms': {f"p{p:g}": self.percentile(p) for p in self.PERCENTILES}
+        }
+
+
 class EventPublisher:
     def __init__(self, target_url: str):
         self.target_url = target_url
-        self.event_cache: List[Dict[str, Any]] = []
+        if REPLAY_PATH:
+            self.workload = replay(REPLAY_PATH)
+        else:
+            profile = get_profile(
+                WORKLOAD_PROFILE, topics=tuple(TOPICS), duplicate_rate=DUPLICATE_RATE
+            )
+            self.workload = WorkloadGenerator(profile, WORKLOAD_SEED)
         self.stats = {
             'sent': 0,
             'duplicates': 0,
             'errors': 0,
-            'batches': 0
+            'batches': 0,
+            'throttled': 0
         }
     
-    def generate_event(self, force_duplicate: bool = False) -> Dict[str, Any]:
-        if force_duplicate and self.event_cache:
-            # Ambil random event dari cache untuk duplikasi
-            base_event = random.choice(self.event_cache)
-            logger.debug(f"Generating DUPLICATE event: {base_event['event_id']}")
-            return base_event.copy()
-        
-        # Generate new unique event
-        topic = random.choice(TOPICS)
-        event_id = str(uuid.uuid4())
-        
-        event = {
-            "topic": topic,
-            "event_id": event_id,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
-            "source": f"publisher-{os.getpid()}",
-            "payload": {
-                "message": f"Event from publisher at {datetime.utcnow().isoformat()}",
-                "level": random.choice(["INFO", "WARNING", "ERROR", "DEBUG"]),
-                "metadata": {
-                    "host": f"host-{random.randint(1, 10)}",
-                    "service": f"service-{random.randint(1, 5)}",
-                    "request_id": str(uuid.uuid4())
-                }
-            }
-        }
-        
-        # Add to cache untuk duplikasi nanti
-        self.event_cache.append(event)
-        
-        # Keep cache size reasonable
-        if len(self.event_cache) > 1000:
-            self.event_cache.pop(0)
-        
-        return event
-    
     def generate_batch(self, size: int) -> List[Dict[str, Any]]:
         events = []
         
-        for _ in range(size):
-            # Decide if this should be duplicate
-            is_duplicate = random.random() < DUPLICATE_RATE and len(self.event_cache) > 0
-            
-            event = self.generate_event(force_duplicate=is_duplicate)
+        for event, is_duplicate in self.workload:
             events.append(event)
-            
             if is_duplicate:
                 self.stats['duplicates'] += 1
+            if len(events) == size:
+                break
         
         return events
     
-    async def send_batch(self, events: List[Dict[str, Any]]) -> bool:
+    def create_client(self, open_loop: bool = False) -> httpx.AsyncClient:
+        # Satu pool koneksi keep-alive untuk semua batch
+        limits = httpx.Limits(
+            max_connections=MAX_IN_FLIGHT,
+            max_keepalive_connections=MAX_IN_FLIGHT
+        )
+        # Open loop: batch terjadwal boleh antre menunggu slot pool tanpa
+        # batas (antrean itu bagian dari latency yang diukur, bukan error)
+        timeout = httpx.Timeout(30.0, pool=None) if open_loop else httpx.Timeout(30.0)
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    self.target_url,
-                    json={"events": events}
+            return httpx.AsyncClient(http2=HTTP2, limits=limits, timeout=timeout)
+        except ImportError:
+            # Package h2 tidak terpasang (httpx[http2])
+            logger.warning("HTTP2=true but h2 is not installed, using HTTP/1.1")
+            return httpx.AsyncClient(limits=limits, timeout=timeout)
+    
+    async def send_batch(self, client: httpx.AsyncClient, events: List[Dict[str, Any]], body: bytes) -> bool:
+        headers = {"Content-Type": "application/json"}
+        try:
+            response = await client.post(self.target_url, content=body, headers=headers)
+            
+            # Aggregator overload: batch ditolak utuh, kirim ulang
+            # setelah Retry-After
+            retries = 0
+            while response.status_code == 429 and retries < MAX_RETRIES:
+                retries += 1
+                self.stats['throttled'] += 1
+                retry_after = float(response.headers.get("Retry-After", "1"))
+                logger.warning(f"Aggregator overloaded, retrying batch in {retry_after}s")
+                await asyncio.sleep(retry_after)
+                response = await client.post(self.target_url, content=body, headers=headers)
+            
+            if response.status_code == 200:
+                self.stats['sent'] += len(events)
+                self.stats['batches'] += 1
+                logger.debug(
+                    f"Batch sent successfully: {len(events)} events, "
+                    f"status={response.status_code}"
+                )
+                return True
+            else:
+                logger.error(
+                    f"Failed to send batch: status={response.status_code}, "
+                    f"response={response.text}"
                 )
+                self.stats['errors'] += len(events)
+                return False
                 
-                if response.status_code == 200:
-                    self.stats['sent'] += len(events)
-                    self.stats['batches'] += 1
-                    logger.info(
-                        f"Batch sent successfully: {len(events)} events, "
-                        f"status={response.status_code}"
-                    )
-                    return True
-                else:
-                    logger.error(
-                        f"Failed to send batch: status={response.status_code}, "
-                        f"response={response.text}"
-                    )
-                    self.stats['errors'] += len(events)
-                    return False
-                    
         except Exception as e:
             logger.error(f"Error sending batch: {e}", exc_info=True)
             self.stats['errors'] += len(events)
             return False
     
+    async def produce(self, queue: asyncio.Queue, total_events: int, batch_size: int):
+        # Generate + serialize batch berikutnya selama batch lain in-flight;
+        # queue terbatas sehingga generator tidak jauh mendahului sender
+        record_file = None
+        if RECORD_PATH:
+            try:
+                record_file = open(RECORD_PATH, "w", encoding="utf-8")
+            except OSError as e:
+                logger.error(f"Cannot record events to {RECORD_PATH}: {e}")
+        try:
+            num_batches = (total_events + batch_size - 1) // batch_size
+            for i in range(num_batches):
+                current_batch_size = min(batch_size, total_events - i * batch_size)
+                events = self.generate_batch(current_batch_size)
+                if not events:
+                    break
+                if record_file:
+                    write_records(record_file, events)
+                body = json.dumps({"events": events}).encode("utf-8")
+                await queue.put((events, body))
+        finally:
+            if record_file:
+                record_file.close()
+        for _ in range(MAX_IN_FLIGHT):
+            await queue.put(None)
+    
+    async def sender(self, client: httpx.AsyncClient, queue: asyncio.Queue, num_batches: int):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            events, body = item
+            await self.send_batch(client, events, body)
+            
+            if self.stats['batches'] % 10 == 0 and self.stats['batches']:
+                logger.info(
+                    f"Progress: {self.stats['batches']}/{num_batches} batches, "
+                    f"{self.stats['sent']} events sent, "
+                    f"{self.stats['duplicates']} duplicates generated"
+                )
+            
+            if DELAY_BETWEEN_BATCHES > 0:
+                await asyncio.sleep(DELAY_BETWEEN_BATCHES)
+    
     async def run(self, total_events: int, batch_size: int):
         logger.info(f"Starting publisher...")
         logger.info(f"Target URL: {self.target_url}")
         logger.info(f"Total events: {total_events}")
         logger.info(f"Batch size: {batch_size}")
-        logger.info(f"Duplicate rate: {DUPLICATE_RATE * 100}%")
-        logger.info(f"Topics: {TOPICS}")
-        
-        start_time = time.time()
+        logger.info(f"Max in-flight batches: {MAX_IN_FLIGHT} (HTTP/2: {HTTP2})")
+        self.log_workload()
         
         num_batches = (total_events + batch_size - 1) // batch_size
+        queue: asyncio.Queue = asyncio.Queue(maxsize=MAX_IN_FLIGHT * 2)
         
-        for i in range(num_batches):
-            # Calculate batch size for last batch
-            current_batch_size = min(batch_size, total_events - i * batch_size)
-            
-            # Generate and send batch
-            events = self.generate_batch(current_batch_size)
-            await self.send_batch(events)
-            
-            # Delay between batches untuk avoid overwhelming aggregator
-            if i < num_batches - 1:
-                await asyncio.sleep(DELAY_BETWEEN_BATCHES)
-            
-            # Log progress
-            if (i + 1) % 10 == 0:
-                logger.info(
-                    f"Progress: {i + 1}/{num_batches} batches, "
-                    f"{self.stats['sent']} events sent, "
-                    f"{self.stats['duplicates']} duplicates generated"
-                )
+        start_time = time.time()
         
-        elapsed = time.time() - start_time
+        async with self.create_client() as client:
+            await asyncio.gather(
+                self.produce(queue, total_events, batch_size),
+                *(self.sender(client, queue, num_batches) for _ in range(MAX_IN_FLIGHT))
+            )
         
+        elapsed = time.time() - start_time
+        self.log_stats(elapsed)
+    
+    def log_workload(self):
+        if REPLAY_PATH:
+            logger.info(f"Workload: replay {REPLAY_PATH}")
+        else:
+            logger.info(f"Workload: profile={WORKLOAD_PROFILE}, seed={WORKLOAD_SEED}")
+            logger.info(f"Duplicate rate: {DUPLICATE_RATE * 100}%")
+            logger.info(f"Topics: {TOPICS}")
+        if RECORD_PATH:
+            logger.info(f"Recording events to {RECORD_PATH}")
+    
+    def log_stats(self, elapsed: float):
         # Final stats
         logger.info("\n" + "="*60)
         logger.info("PUBLISHER STATISTICS")
         logger.info("="*60)
         logger.info(f"Total events sent: {self.stats['sent']}")
         logger.info(f"Duplicates generated: {self.stats['duplicates']}")
-        logger.info(f"Duplicate rate: {(self.stats['duplicates'] / self.stats['sent'] * 100):.2f}%")
+        logger.info(f"Duplicate rate: {(self.stats['duplicates'] / max(self.stats['sent'], 1) * 100):.2f}%")
         logger.info(f"Errors: {self.stats['errors']}")
         logger.info(f"Batches: {self.stats['batches']}")
+        logger.info(f"Throttled (429) retries: {self.stats['throttled']}")
         logger.info(f"Elapsed time: {elapsed:.2f}s")
         logger.info(f"Throughput: {self.stats['sent'] / elapsed:.2f} events/sec")
         logger.info("="*60 + "\n")
+    
+    async def processed_count(self, client: httpx.AsyncClient) -> int:
+        response = await client.get(STATS_URL)
+        response.raise_for_status()
+        stats = response.json()
+        return stats['unique_processed'] + stats['duplicate_dropped']
+    
+    async def run_open_loop(self, total_events: int, batch_size: int, rate: float):
+        """
+        Open loop: batch ke-k dijadwalkan pada start + k * batch_size / rate,
+        tanpa menunggu response batch sebelumnya. Latency diukur dari waktu
+        JADWAL (bukan waktu kirim aktual), sehingga antrean di publisher,
+        pool koneksi dan aggregator ikut terhitung (koreksi coordinated
+        omission).
+        
+        - ack: jadwal -> hasil akhir request (per request, termasuk retry
+          429). Request yang gagal (status error, timeout) tetap dicatat
+          dengan latency sampai gagal, dan juga di failed_latency, agar
+          tail tidak terlihat lebih baik dengan membuang request terlambat.
+        - end-to-end: jadwal -> event terlihat diproses di /stats
+          (unique_processed + duplicate_dropped), per event. Mengasumsikan
+          aggregator khusus untuk run ini dan memproses kira-kira FIFO;
+          resolusi sebesar E2E_POLL_INTERVAL.
+        """
+        # Log per request httpx (termasuk polling /stats) mengganggu jadwal kirim
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        logger.info(f"Starting open-loop publisher at {rate:.0f} events/sec...")
+        logger.info(f"Target URL: {self.target_url}")
+        logger.info(f"Stats URL: {STATS_URL}")
+        logger.info(f"Total events: {total_events}, batch size: {batch_size}")
+        self.log_workload()
+        
+        ack_histogram = LatencyHistogram()
+        failed_histogram = LatencyHistogram()
+        e2e_histogram = LatencyHistogram()
+        # (jumlah event ter-ack kumulatif, waktu jadwal batch, ukuran batch)
+        # dalam urutan ack; dicocokkan dengan counter processed di /stats
+        acked: List[Tuple[int, float, int]] = []
+        acked_events = 0
+        sending_done = asyncio.Event()
+        
+        queue: asyncio.Queue = asyncio.Queue(maxsize=MAX_IN_FLIGHT * 2)
+        loop = asyncio.get_running_loop()
+        interval = batch_size / rate
+        
+        # Polling /stats lewat client sendiri agar tidak antre di belakang
+        # batch yang menunggu slot pool MAX_IN_FLIGHT
+        async with self.create_client(open_loop=True) as client, httpx.AsyncClient(timeout=10.0) as stats_client:
+            baseline = await self.processed_count(stats_client)
+            
+            async def send(events: List[Dict[str, Any]], body: bytes, scheduled: float):
+                nonlocal acked_events
+                ok = await self.send_batch(client, events, body)
+                latency = loop.time() - scheduled
+                ack_histogram.record(latency)
+                if not ok:
+                    failed_histogram.record(latency)
+                    return
+                acked_events += len(events)
+                acked.append((acked_events, scheduled, len(events)))
+            
+            async def schedule():
+                tasks = []
+                start = loop.time()
+                k = 0
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    scheduled = start + k * interval
+                    delay = scheduled - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    tasks.append(asyncio.create_task(send(*item, scheduled)))
+                    k += 1
+                await asyncio.gather(*tasks)
+                sending_done.set()
+                return loop.time() - start
+            
+            async def track_processing():
+                matched = 0
+                deadline = None
+                while True:
+                    processed = await self.processed_count(stats_client) - baseline
+                    now = loop.time()
+                    while matched < len(acked) and acked[matched][0] <= processed:
+                        _, scheduled, count = acked[matched]
+                        e2e_histogram.record(now - scheduled, count)
+                        matched += 1
+                    if sending_done.is_set():
+                        if matched == len(acked):
+                            return
+                        deadline = deadline or now + E2E_TIMEOUT
+                        if now >= deadline:
+                            logger.warning(
+                                f"Timed out waiting for processing: "
+                                f"{acked_events - processed} events not yet processed"
+                            )
+                            return
+                    await asyncio.sleep(E2E_POLL_INTERVAL)
+            
+            sending_elapsed, _, _ = await asyncio.gather(
+                schedule(),
+                self.produce(queue, total_events, batch_size),
+                track_processing()
+            )
+        
+        self.log_stats(sending_elapsed)
+        
+        report = {
+            'mode': 'open',
+            'target_rate': rate,
+            'achieved_rate': round(self.stats['sent'] / sending_elapsed, 2),
+            'total_events': total_events,
+            'batch_size': batch_size,
+            'workload': (
+                {'replay': REPLAY_PATH} if REPLAY_PATH
+                else {'profile': WORKLOAD_PROFILE, 'seed': WORKLOAD_SEED}
+            ),
+            'max_in_flight_connections': MAX_IN_FLIGHT,
+            'duration_seconds': round(sending_elapsed, 3),
+            'stats': dict(self.stats),
+            'ack_latency': ack_histogram.summary(),
+            'failed_requests': failed_histogram.total,
+            'failed_latency': failed_histogram.summary(),
+            'end_to_end_latency': e2e_histogram.summary()
+        }
+        
+        for name, histogram in (("Ack", ack_histogram), ("End-to-end", e2e_histogram)):
+            percentiles = ", ".join(
+                f"p{p:g}={histogram.percentile(p):.2f}ms" for p in LatencyHistogram.PERCENTILES
+            )
+            logger.info(f"{name} latency ({histogram.total} samples): {percentiles}, max={histogram.max_us / 1000:.2f}ms")
+        if failed_histogram.total:
+            logger.warning(
+                f"Failed requests: {failed_histogram.total} "
+                f"(included in ack latency, p99={failed_histogram.percentile(99.0):.2f}ms)"
+            )
+        
+        if REPORT_PATH:
+            try:
+                with open(REPORT_PATH, "w") as f:
+                    json.dump(report, f, indent=2)
+                logger.info(f"Report written to {REPORT_PATH}")
+            except OSError as e:
+                logger.error(f"Failed to write report to {REPORT_PATH}: {e}")
+        
+        return report
 
 
 async def main():
@@ -179,8 +468,18 @@ async def main():
     logger.info("Waiting for aggregator to be ready...")
     await asyncio.sleep(5)
     
+    if not REPLAY_PATH and WORKLOAD_PROFILE not in PROFILES:
+        logger.error(f"Unknown WORKLOAD_PROFILE {WORKLOAD_PROFILE!r} (available: {', '.join(PROFILES)})")
+        return
+    
+    # Replay mengirim seluruh isi file
+    total_events = count_records(REPLAY_PATH) if REPLAY_PATH else NUM_EVENTS
+    
     publisher = EventPublisher(TARGET_URL)
-    await publisher.run(NUM_EVENTS, BATCH_SIZE)
+    if MODE == "open":
+        await publisher.run_open_loop(total_events, BATCH_SIZE, TARGET_RATE)
+    else:
+        await publisher.run(total_events, BATCH_SIZE)
     
     logger.info("Publisher finished")
 
@@ -0,0 +1,216 @@
+"""
+Workload generator publisher yang deterministik dan bisa di-replay.
+
+Satu profile + seed selalu menghasilkan urutan event yang sama persis
+(event_id, topic, payload, posisi duplikat), sehingga run benchmark bisa
+dibandingkan. Bentuk traffic mengikuti produksi:
+
+- topic Zipf-skewed: sedikit topic menerima sebagian besar event
+- duplikat Zipf-skewed terhadap umur: event terbaru paling sering
+  dikirim ulang (rank 0 = event unik terakhir)
+- burst retry: sebuah duplikat bisa diikuti beberapa kiriman ulang
+  berturut-turut (client timeout lalu retry)
+- ukuran payload fixed, uniform atau lognormal
+
+Workload bisa direkam ke file NDJSON (satu event per baris) lalu
+di-replay apa adanya, tanpa bergantung pada generator.
+"""
+
+import json
+import math
+import random
+import uuid
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, TextIO, Tuple
+
+# Timestamp event = START_TIME + index ms (deterministik, tidak ikut jam)
+START_TIME = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+_LEVELS = ("INFO", "WARNING", "ERROR", "DEBUG")
+_FILLER = "alpha bravo charlie delta echo foxtrot golf hotel "
+
+
+class WorkloadProfile(NamedTuple):
+    """
+    topic_skew / duplicate_skew: eksponen Zipf (0 = uniform).
+    duplicate_window: jumlah event unik terakhir yang bisa diduplikasi.
+    burst_probability: peluang sebuah duplikat menjadi burst retry dengan
+    1..burst_max kiriman ulang tambahan berturut-turut.
+    payload_distribution: "fixed" (payload_bytes), "uniform"
+    (payload_min..payload_max) atau "lognormal" (median payload_bytes,
+    sigma payload_sigma, dipotong ke payload_min..payload_max).
+    """
+    name: str
+    topics: Tuple[str, ...] = ("logs", "metrics", "events", "alerts")
+    duplicate_rate: float = 0.30
+    topic_skew: float = 0.0
+    duplicate_skew: float = 0.0
+    duplicate_window: int = 1000
+    burst_probability: float = 0.0
+    burst_max: int = 0
+    payload_distribution: str = "fixed"
+    payload_bytes: int = 300
+    payload_sigma: float = 1.0
+    payload_min: int = 128
+    payload_max: int = 65536
+
+
+PROFILES: Dict[str, WorkloadProfile] = {
+    # Perilaku lama: topic dan duplikat uniform, payload kecil tetap
+    'uniform': WorkloadProfile('uniform'),
+    # Bentuk traffic produksi
+    'production': WorkloadProfile(
+        'production', topic_skew=1.1, duplicate_skew=1.0,
+        burst_probability=0.3, burst_max=4,
+        payload_distribution="lognormal", payload_bytes=512, payload_sigma=1.0
+    ),
+    # Retry storm: hampir semua duplikat datang sebagai burst
+    'bursty': WorkloadProfile(
+        'bursty', topic_skew=1.1, duplicate_skew=1.5,
+        burst_probability=0.9, burst_max=8,
+        payload_distribution="lognormal", payload_bytes=512, payload_sigma=0.5
+    ),
+    # Payload besar dengan variasi lebar
+    'large-payload': WorkloadProfile(
+        'large-payload', topic_skew=1.1, duplicate_skew=1.0,
+        payload_distribution="uniform", payload_min=4096, payload_max=65536
+    ),
+}
+
+
+def get_profile(name: str, **overrides: Any) -> WorkloadProfile:
+    if name not in PROFILES:
+        raise ValueError(f"Unknown workload profile {name!r} (available: {', '.join(PROFILES)})")
+    return PROFILES[name]._replace(**overrides)
+
+
+def zipf_cumulative_weights(n: int, skew: float) -> List[float]:
+    """Cumulative weight rank 0..n-1 dengan bobot 1 / (rank + 1) ** skew."""
+    return list(accumulate(1.0 / (rank + 1) ** skew for rank in range(n)))
+
+
+class WorkloadGenerator:
+    """
+    Iterator tak hingga (event, is_duplicate). Semua keacakan berasal
+    dari random.Random(seed), sehingga urutan event deterministik.
+    """
+
+    def __init__(self, profile: WorkloadProfile, seed: int = 42):
+        if not 0.0 <= profile.duplicate_rate < 1.0:
+            raise ValueError("duplicate_rate must be in [0, 1)")
+        self.profile = profile
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.index = 0
+        self.source = f"publisher-{profile.name}-{seed}"
+
+        self._topic_weights = zipf_cumulative_weights(len(profile.topics), profile.topic_skew)
+        self._rank_weights = zipf_cumulative_weights(profile.duplicate_window, profile.duplicate_skew)
+        # Ring buffer event unik terakhir (menggantikan list.pop(0) yang O(n))
+        self._recent: List[Dict[str, Any]] = [{}] * profile.duplicate_window
+        self._recent_count = 0
+        self._burst: List[Dict[str, Any]] = []
+
+        # Burst retry menambah duplikat; peluang memilih duplikat per posisi
+        # dikoreksi agar total rasio duplikat tetap duplicate_rate
+        extra = profile.burst_probability * (profile.burst_max + 1) / 2 if profile.burst_max else 0.0
+        rate = profile.duplicate_rate
+        self._duplicate_probability = rate / (1 + extra * (1 - rate))
+
+    def __iter__(self) -> Iterator[Tuple[Dict[str, Any], bool]]:
+        return self
+
+    def __next__(self) -> Tuple[Dict[str, Any], bool]:
+        self.index += 1
+        if self._burst:
+            return self._burst.pop(), True
+        if self._recent_count and self.rng.random() < self._duplicate_probability:
+            event = self._pick_duplicate()
+            profile = self.profile
+            if profile.burst_max and self.rng.random() < profile.burst_probability:
+                self._burst = [event] * self.rng.randint(1, profile.burst_max)
+            return event, True
+        event = self._new_event()
+        self._recent[self._recent_count % len(self._recent)] = event
+        self._recent_count += 1
+        return event, False
+
+    def take(self, count: int) -> List[Tuple[Dict[str, Any], bool]]:
+        return [next(self) for _ in range(count)]
+
+    def _pick_duplicate(self) -> Dict[str, Any]:
+        available = min(self._recent_count, len(self._recent))
+        weights = self._rank_weights
+        rank = bisect_left(weights, self.rng.random() * weights[available - 1], 0, available - 1)
+        return self._recent[(self._recent_count - 1 - rank) % len(self._recent)]
+
+    def _payload_size(self) -> int:
+        profile = self.profile
+        if profile.payload_distribution == "fixed":
+            return profile.payload_bytes
+        if profile.payload_distribution == "uniform":
+            return self.rng.randint(profile.payload_min, profile.payload_max)
+        if profile.payload_distribution == "lognormal":
+            size = self.rng.lognormvariate(math.log(profile.payload_bytes), profile.payload_sigma)
+            return int(min(max(size, profile.payload_min), profile.payload_max))
+        raise ValueError(f"Unknown payload distribution {profile.payload_distribution!r}")
+
+    def _new_event(self) -> Dict[str, Any]:
+        rng = self.rng
+        topics = self.profile.topics
+        weights = self._topic_weights
+        topic = topics[bisect_left(weights, rng.random() * weights[-1], 0, len(topics) - 1)]
+        timestamp = START_TIME + timedelta(milliseconds=self.index)
+        return {
+            "topic": topic,
+            "event_id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "timestamp": timestamp.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+            "source": self.source,
+            "payload": make_payload(rng, self._payload_size())
+        }
+
+
+def make_payload(rng: random.Random, size: int) -> Dict[str, Any]:
+    """Payload log dengan ukuran JSON kira-kira size bytes."""
+    payload: Dict[str, Any] = {
+        "message": f"Event from publisher {rng.getrandbits(32):08x}",
+        "level": rng.choice(_LEVELS),
+        "metadata": {
+            "host": f"host-{rng.randint(1, 10)}",
+            "service": f"service-{rng.randint(1, 5)}"
+        }
+    }
+    # ', "detail": ""' menambah 14 byte di luar isi filler
+    filler = size - len(json.dumps(payload)) - 14
+    if filler > 0:
+        start = rng.randrange(len(_FILLER))
+        payload["detail"] = (_FILLER * (filler // len(_FILLER) + 2))[start:start + filler]
+    return payload
+
+
+def write_records(f: TextIO, events: Iterable[Dict[str, Any]]):
+    """Tulis event ke file terbuka sebagai NDJSON (satu event per baris, urutan kirim)."""
+    f.writelines(json.dumps(event, separators=(",", ":")) + "\n" for event in events)
+
+
+def replay(path: str) -> Iterator[Tuple[Dict[str, Any], bool]]:
+    """
+    Baca ulang file hasil write_records() sebagai (event, is_duplicate);
+    duplikat = (topic, event_id) yang sudah muncul sebelumnya di file.
+    """
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            key = (event["topic"], event["event_id"])
+            yield event, key in seen
+            seen.add(key)
+
+
+def count_records(path: str) -> int:
+    with open(path, encoding="utf-8") as f:
+        return sum(1 for line in f if line.strip())
@@ -20,14 +20,40 @@ import httpx
 from datetime import datetime
 import uuid
 import json
+import shutil
 
 # Import modules to test
 import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aggregator'))
 
-from src.models import Event, PublishRequest
-from src.dedup_store import DedupStore
+from src.models import Event, PublishRequest, EventsResponse
+from src.dedup_store import DedupStore, encode_cursor, decode_cursor
 from src.config import Config
+from src.worker_pool import WorkerPool, route_key
+from src.dedup_cache import RecentKeyCache
+from src.bloom import ScalableBloomFilter
+from src.ndjson import iter_ndjson_lines, LineTooLong
+from src.fast_decode import decode_publish_request, FastDecodeError
+from src.export import format_events_page, format_ndjson
+from src.sharded_store import ShardedDedupStore, create_store, shard_paths
+from src.multiprocess import OwnerClient, OwnerUnavailable, ProcessRegistry, PID_HEADER
+from src.ingest_log import IngestLog, encode_log_event, decode_log_event
+from src.worker_pool import replay_ingest_log
+from src.admission import AdmissionController, Overloaded, BatchTooLarge
+from src.retention_store import RetentionDedupStore
+from src import metrics
+from src.profiler import ProfilerBusy, SamplingProfiler
+from src.loop_monitor import LoopLagMonitor
+from tools.reshard import reshard
+from benchmarks.common import expected_counts, make_workload
+from benchmarks.suite import compare
+
+
+def remove_db_files(db_path):
+    """Hapus file database beserta file pendampingnya (WAL, snapshot)."""
+    for suffix in ("", "-wal", "-shm", ".bloom"):
+        if os.path.exists(db_path + suffix):
+            os.unlink(db_path + suffix)
 
 
 # TEST 1-4: Event Model Validation Tests
@@ -98,7 +124,7 @@ async def dedup_store():
     yield store
     
     await store.close()
-    os.unlink(db_path)
+    remove_db_files(db_path)
 
 
 @pytest.mark.asyncio
@@ -227,7 +253,7 @@ async def test_dedup_store_persistence():
         await store2.close()
         
     finally:
-        os.unlink(db_path)
+        remove_db_files(db_path)
 
 
 # TEST 11-14: API Integration Tests
@@ -450,5 +476,1788 @@ async def test_transaction_rollback_on_error(dedup_store):
     assert final_count == new_count
 
 
+# TEST 21-22: Group Commit Tests
+
+@pytest.mark.asyncio
+async def test_mark_processed_many(dedup_store):
+    """Test 21: Batch insert reports per-event inserted/duplicate results."""
+    existing_id = str(uuid.uuid4())
+    await dedup_store.mark_processed(
+        "test-topic", existing_id,
+        datetime.utcnow().isoformat(), "test-source", json.dumps({})
+    )
+    
+    new_id = str(uuid.uuid4())
+    rows = [
+        ("test-topic", new_id, datetime.utcnow().isoformat(), "test-source", json.dumps({"i": 1})),
+        ("test-topic", existing_id, datetime.utcnow().isoformat(), "test-source", json.dumps({})),
+        # Duplikat di dalam batch yang sama
+        ("test-topic", new_id, datetime.utcnow().isoformat(), "test-source", json.dumps({"i": 2})),
+        ("other-topic", new_id, datetime.utcnow().isoformat(), "test-source", json.dumps({})),
+    ]
+    
+    results = await dedup_store.mark_processed_many(rows)
+    assert results == [True, False, False, True]
+    
+    # Stats di-update dalam transaksi yang sama
+    stats = await dedup_store.get_stats()
+    assert stats['unique_processed'] == 2
+    assert stats['duplicate_dropped'] == 2
+    
+    assert await dedup_store.count_events() == 3
+
+
+@pytest.mark.asyncio
+async def test_mark_processed_many_concurrent(dedup_store):
+    """Test 22: Concurrent batches with overlapping keys stay exactly-once."""
+    event_ids = [str(uuid.uuid4()) for _ in range(50)]
+    
+    def make_rows():
+        return [
+            ("test-topic", event_id, datetime.utcnow().isoformat(), "test-source", json.dumps({}))
+            for event_id in event_ids
+        ]
+    
+    results = await asyncio.gather(*[
+        dedup_store.mark_processed_many(make_rows()) for _ in range(5)
+    ])
+    
+    inserted = sum(sum(r) for r in results)
+    assert inserted == len(event_ids)
+    
+    stats = await dedup_store.get_stats()
+    assert stats['unique_processed'] == len(event_ids)
+    assert stats['duplicate_dropped'] == len(event_ids) * 4
+
+
+# TEST 23-24: Worker Pool Tests
+
+def test_route_key_stable():
+    """Test 23: Routing by (topic, event_id) is deterministic and in range."""
+    for i in range(100):
+        worker = route_key("test-topic", f"event-{i}", 3)
+        assert 0 <= worker < 3
+        assert worker == route_key("test-topic", f"event-{i}", 3)
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_processing(dedup_store):
+    """Test 24: Worker pool processes events exactly once across workers."""
+    pool = WorkerPool(
+        dedup_store,
+        num_workers=3,
+        queue_max_size=1000,
+        batch_max_size=50,
+        batch_max_linger_ms=5
+    )
+    pool.start()
+    
+    try:
+        events = [
+            Event(
+                topic=f"topic-{i % 4}",
+                event_id=str(uuid.uuid4()),
+                timestamp=datetime.utcnow().isoformat() + "Z",
+                source="test-source",
+                payload={"index": i}
+            )
+            for i in range(200)
+        ]
+        # 50 duplikat
+        for event in events + events[:50]:
+            await pool.put(event)
+        
+        await pool.join()
+        
+        stats = await dedup_store.get_stats()
+        assert stats['unique_processed'] == 200
+        assert stats['duplicate_dropped'] == 50
+        
+        worker_stats = pool.get_stats()
+        assert len(worker_stats) == 3
+        assert sum(w['processed'] for w in worker_stats) == 250
+        assert all(w['queue_size'] == 0 for w in worker_stats)
+    finally:
+        await pool.stop()
+
+
+# TEST 25-26: Dedup Cache Tests
+
+def test_recent_key_cache_eviction():
+    """Test 25: LRU cache respects its memory budget."""
+    cache = RecentKeyCache(max_bytes=4096)
+    
+    for i in range(200):
+        cache.add(("test-topic", f"event-{i}"))
+    
+    stats = cache.get_stats()
+    assert stats['bytes'] <= 4096
+    assert stats['evictions'] > 0
+    
+    # Key terbaru masih ada, key terlama sudah di-evict
+    assert cache.contains(("test-topic", "event-199"))
+    assert not cache.contains(("test-topic", "event-0"))
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+@pytest.mark.asyncio
+async def test_dedup_cache_rejects_hot_duplicates(dedup_store):
+    """Test 26: Recently processed keys are rejected from the cache."""
+    event_id = str(uuid.uuid4())
+    row = ("test-topic", event_id, datetime.utcnow().isoformat(), "test-source", json.dumps({}))
+    
+    assert await dedup_store.mark_processed_many([row]) == [True]
+    assert await dedup_store.mark_processed_many([row]) == [False]
+    assert await dedup_store.is_duplicate("test-topic", event_id) == True
+    
+    cache_stats = dedup_store.get_cache_stats()
+    assert cache_stats['hits'] == 2
+    assert cache_stats['entries'] == 1
+    
+    # UNIQUE constraint tetap sumber kebenaran walau cache kosong
+    dedup_store.cache.clear()
+    assert await dedup_store.mark_processed_many([row]) == [False]
+    assert await dedup_store.count_events() == 1
+
+
+# TEST 27-28: Bloom Filter Tests
+
+def test_scalable_bloom_filter_growth():
+    """Test 27: Scalable bloom filter grows without false negatives."""
+    bloom = ScalableBloomFilter(fp_rate=0.01, initial_bytes=256)
+    keys = [("test-topic", str(uuid.uuid4())) for _ in range(2000)]
+    
+    for topic, event_id in keys:
+        bloom.add(topic, event_id)
+    
+    assert len(bloom.filters) > 1
+    assert all(bloom.might_contain(topic, event_id) for topic, event_id in keys)
+    
+    false_positives = sum(
+        bloom.might_contain("test-topic", str(uuid.uuid4())) for _ in range(2000)
+    )
+    assert false_positives < 100
+
+
+@pytest.mark.asyncio
+async def test_bloom_snapshot_catch_up():
+    """Test 28: Bloom snapshot is reloaded and caught up from processed_events."""
+    import sqlite3
+    
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as tmp:
+        db_path = tmp.name
+    
+    try:
+        store1 = DedupStore(db_path, cache_max_bytes=0, bloom_filter="on")
+        await store1.initialize()
+        first_ids = [str(uuid.uuid4()) for _ in range(10)]
+        await store1.mark_processed_many([
+            ("test-topic", event_id, datetime.utcnow().isoformat(), "test-source", json.dumps({}))
+            for event_id in first_ids
+        ])
+        await store1.close()
+        assert os.path.exists(db_path + ".bloom")
+        
+        # Rows yang ditulis setelah snapshot (mis. crash sebelum snapshot berikutnya)
+        later_ids = [str(uuid.uuid4()) for _ in range(5)]
+        conn = sqlite3.connect(db_path)
+        conn.executemany(
+            "INSERT INTO processed_events (topic, event_id, timestamp, source, payload, processed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [("test-topic", event_id, datetime.utcnow().isoformat(), "test-source", "{}",
+              datetime.utcnow().isoformat()) for event_id in later_ids]
+        )
+        conn.commit()
+        conn.close()
+        
+        store2 = DedupStore(db_path, cache_max_bytes=0, bloom_filter="on")
+        await store2.initialize()
+        
+        for event_id in first_ids + later_ids:
+            assert await store2.is_duplicate("test-topic", event_id) == True
+        
+        assert await store2.is_duplicate("test-topic", str(uuid.uuid4())) == False
+        bloom_stats = store2.get_bloom_stats()
+        assert bloom_stats['keys'] == 15
+        assert bloom_stats['selects_skipped'] >= 1
+        
+        await store2.close()
+    finally:
+        remove_db_files(db_path)
+
+
+# TEST 29-30: In-Memory Stats Tests
+
+@pytest.mark.asyncio
+async def test_stats_flush_on_close():
+    """Test 29: In-memory counters are flushed to the stats table on close."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as tmp:
+        db_path = tmp.name
+    
+    try:
+        store1 = DedupStore(db_path)
+        await store1.initialize()
+        await store1.increment_received(10)
+        await store1.mark_processed_many([
+            ("test-topic", str(uuid.uuid4()), datetime.utcnow().isoformat(), "test-source", json.dumps({}))
+            for _ in range(4)
+        ])
+        await store1.increment_duplicate_dropped()
+        await store1.close()
+        
+        store2 = DedupStore(db_path)
+        await store2.initialize()
+        stats = await store2.get_stats()
+        assert stats == {'received': 10, 'unique_processed': 4, 'duplicate_dropped': 1}
+        await store2.close()
+    finally:
+        remove_db_files(db_path)
+
+
+@pytest.mark.asyncio
+async def test_stats_reconciled_after_crash():
+    """Test 30: Counters are reconciled from processed_events after a crash."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as tmp:
+        db_path = tmp.name
+    
+    try:
+        store1 = DedupStore(db_path)
+        await store1.initialize()
+        await store1.mark_processed_many([
+            ("test-topic", str(uuid.uuid4()), datetime.utcnow().isoformat(), "test-source", json.dumps({}))
+            for _ in range(3)
+        ])
+        await store1.flush_stats()
+        await store1.mark_processed_many([
+            ("test-topic", str(uuid.uuid4()), datetime.utcnow().isoformat(), "test-source", json.dumps({}))
+            for _ in range(2)
+        ])
+        
+        # Simulasi crash: connection ditutup tanpa flush counter
+        store1._flush_task.cancel()
+        await store1.read_pool.close()
+        await store1.export_pool.close()
+        await store1.db.close()
+        
+        store2 = DedupStore(db_path)
+        await store2.initialize()
+        stats = await store2.get_stats()
+        assert stats['unique_processed'] == 5
+        assert stats['received'] >= stats['unique_processed'] + stats['duplicate_dropped']
+        await store2.close()
+    finally:
+        remove_db_files(db_path)
+
+
+# TEST 31-32: Keyset Pagination Tests
+
+@pytest.mark.asyncio
+async def test_keyset_pagination(dedup_store):
+    """Test 31: Cursor pagination walks all events without gaps or overlap."""
+    # Satu batch = satu processed_at, jadi urutan bergantung pada tie-breaker id
+    for batch in range(3):
+        await dedup_store.mark_processed_many([
+            (f"topic-{i % 2}", str(uuid.uuid4()), datetime.utcnow().isoformat(),
+             "test-source", json.dumps({"batch": batch, "index": i}))
+            for i in range(9)
+        ])
+    
+    seen = []
+    cursor = None
+    while True:
+        page = await dedup_store.get_events(limit=10, cursor=cursor)
+        seen.extend(page)
+        if len(page) < 10:
+            break
+        cursor = encode_cursor(page[-1]['processed_at'], page[-1]['id'])
+    
+    assert len(seen) == 27
+    assert len({e['id'] for e in seen}) == 27
+    keys = [(e['processed_at'], e['id']) for e in seen]
+    assert keys == sorted(keys, reverse=True)
+    
+    # Offset tetap konsisten dengan cursor
+    by_offset = await dedup_store.get_events(limit=10, offset=10)
+    assert [e['id'] for e in by_offset] == [e['id'] for e in seen[10:20]]
+    
+    # Cursor + topic filter
+    topic_page = await dedup_store.get_events(topic="topic-0", limit=100, cursor=encode_cursor(*keys[0]))
+    assert all(e['topic'] == "topic-0" for e in topic_page)
+    assert len(topic_page) == sum(1 for e in seen[1:] if e['topic'] == "topic-0")
+
+
+def test_decode_cursor_invalid():
+    """Test 32: Invalid cursor tokens are rejected."""
+    assert decode_cursor(encode_cursor("2025-01-01T00:00:00", 42)) == ("2025-01-01T00:00:00", 42)
+    
+    with pytest.raises(ValueError, match="cursor tidak valid"):
+        decode_cursor("not-a-cursor")
+
+
+# TEST 33: Topic Registry Tests
+
+@pytest.mark.asyncio
+async def test_topic_registry_backfill():
+    """Test 33: Topic registry is maintained on insert and backfilled for old databases."""
+    import sqlite3
+    
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as tmp:
+        db_path = tmp.name
+    
+    try:
+        store1 = DedupStore(db_path)
+        await store1.initialize()
+        for topic in ["topic-B", "topic-A", "topic-B"]:
+            await store1.mark_processed(
+                topic, str(uuid.uuid4()), datetime.utcnow().isoformat(), "test-source", json.dumps({})
+            )
+        assert await store1.get_topics() == ["topic-A", "topic-B"]
+        await store1.close()
+        
+        # Simulasi database lama tanpa tabel topics
+        conn = sqlite3.connect(db_path)
+        conn.execute("DROP TABLE topics")
+        conn.commit()
+        conn.close()
+        
+        store2 = DedupStore(db_path)
+        await store2.initialize()
+        assert await store2.get_topics() == ["topic-A", "topic-B"]
+        
+        await store2.mark_processed(
+            "topic-C", str(uuid.uuid4()), datetime.utcnow().isoformat(), "test-source", json.dumps({})
+        )
+        assert await store2.get_topics() == ["topic-A", "topic-B", "topic-C"]
+        await store2.close()
+    finally:
+        remove_db_files(db_path)
+
+
+# TEST 34: Per-Topic Counter Tests
+
+@pytest.mark.asyncio
+async def test_topic_counts_and_verify(dedup_store):
+    """Test 34: Per-topic counters serve count_events and can be verified/repaired."""
+    rows = [
+        (f"topic-{i % 3}", str(uuid.uuid4()), datetime.utcnow().isoformat(), "test-source", json.dumps({}))
+        for i in range(10)
+    ]
+    await dedup_store.mark_processed_many(rows + rows[:4])
+    
+    assert await dedup_store.get_topic_counts() == {"topic-0": 4, "topic-1": 3, "topic-2": 3}
+    assert await dedup_store.count_events() == 10
+    assert await dedup_store.count_events(topic="topic-0") == 4
+    assert await dedup_store.count_events(topic="missing") == 0
+    assert await dedup_store.verify_topic_counts() == {}
+    
+    # Rusak counter secara manual
+    await dedup_store.db.execute("UPDATE topics SET event_count = 99 WHERE topic = 'topic-1'")
+    await dedup_store.db.commit()
+    
+    assert await dedup_store.verify_topic_counts() == {"topic-1": (99, 3)}
+    assert await dedup_store.verify_topic_counts(repair=True) == {"topic-1": (99, 3)}
+    assert await dedup_store.verify_topic_counts() == {}
+    assert await dedup_store.count_events(topic="topic-1") == 3
+
+
+# TEST 35: Read Pool Tests
+
+@pytest.mark.asyncio
+async def test_read_pool_not_blocked_by_writer(dedup_store):
+    """Test 35: Reads use the read pool and are not blocked by an open write transaction."""
+    await dedup_store.mark_processed(
+        "test-topic", str(uuid.uuid4()), datetime.utcnow().isoformat(), "test-source", json.dumps({})
+    )
+    
+    # Writer membuka transaksi yang belum di-commit
+    await dedup_store.db.execute("BEGIN IMMEDIATE")
+    await dedup_store.db.execute(
+        "INSERT INTO processed_events (topic, event_id, timestamp, source, payload, processed_at) "
+        "VALUES ('test-topic', 'uncommitted', 'ts', 'test-source', '{}', 'now')"
+    )
+    
+    try:
+        events = await asyncio.wait_for(dedup_store.get_events(limit=10), timeout=5)
+        # Reader hanya melihat data yang sudah di-commit
+        assert len(events) == 1
+        assert await asyncio.wait_for(dedup_store.health_check(), timeout=5) == True
+    finally:
+        await dedup_store.db.rollback()
+    
+    pool_stats = dedup_store.get_read_pool_stats()
+    assert pool_stats['acquisitions'] >= 2
+    assert pool_stats['available'] == pool_stats['size']
+
+
+# TEST 36: NDJSON Streaming Tests
+
+@pytest.mark.asyncio
+async def test_iter_ndjson_lines():
+    """Test 36: NDJSON lines are split across chunk boundaries with a line size limit."""
+    body = b'{"a": 1}\n\n{"b": 2}\n' + b'x' * 50 + b'\n{"c": 3}'
+    
+    async def chunks(size):
+        for i in range(0, len(body), size):
+            yield body[i:i + size]
+    
+    for size in (1, 7, len(body)):
+        results = [item async for item in iter_ndjson_lines(chunks(size), max_line_bytes=20)]
+        
+        assert [(n, line) for n, line, err in results if err is None] == [
+            (1, b'{"a": 1}'), (3, b'{"b": 2}'), (5, b'{"c": 3}')
+        ]
+        too_long = [(n, err) for n, line, err in results if err is not None]
+        assert len(too_long) == 1
+        assert too_long[0][0] == 4
+        assert isinstance(too_long[0][1], LineTooLong)
+
+
+# TEST 37: Fast Decode Parity Tests
+
+def test_fast_decode_matches_event_model():
+    """Test 37: Fast-path decoding accepts and rejects exactly like PublishRequest."""
+    valid = {
+        "topic": " test-topic ",
+        "event_id": " test-id ",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "source": "test-source",
+        "payload": {"key": "value"},
+        "extra": "ignored"
+    }
+    cases = [
+        {"events": valid},
+        {"events": [valid, dict(valid, payload={})]},
+        {"events": [{k: v for k, v in valid.items() if k != "payload"}]},
+        {"events": [dict(valid, timestamp="2025-11-12T00:00:00+07:00")]},
+        {"events": [dict(valid, timestamp="2025-11-12")]},
+        # Invalid
+        {"events": []},
+        {"events": [dict(valid, event_id="")]},
+        {"events": [dict(valid, event_id="   ")]},
+        {"events": [dict(valid, topic="")]},
+        {"events": [dict(valid, source="")]},
+        {"events": [dict(valid, timestamp="invalid-timestamp")]},
+        {"events": [dict(valid, timestamp="2025-13-01T00:00:00Z")]},
+        {"events": [dict(valid, topic=123)]},
+        {"events": [dict(valid, payload=None)]},
+        {"events": [dict(valid, payload=[1, 2])]},
+        {"events": [{k: v for k, v in valid.items() if k != "source"}]},
+        {"events": [valid, "not-an-event"]},
+        {"events": "not-an-event"},
+        {"not_events": []},
+    ]
+    
+    for body in cases:
+        try:
+            request = PublishRequest.model_validate(body)
+            expected = request.events if isinstance(request.events, list) else [request.events]
+        except ValueError:
+            expected = None
+        
+        raw = json.dumps(body).encode()
+        if expected is None:
+            with pytest.raises(FastDecodeError):
+                decode_publish_request(raw)
+            continue
+        
+        records = decode_publish_request(raw)
+        assert [r._asdict() for r in records] == [e.model_dump() for e in expected], body
+
+
+# TEST 38: Export Tests
+
+@pytest.mark.asyncio
+async def test_export_events_ndjson(dedup_store):
+    """Test 38: Export streams chunks in (processed_at, id) order with raw payloads."""
+    for i in range(25):
+        await dedup_store.mark_processed(
+            f"topic-{i % 2}", f"event-{i}", datetime.utcnow().isoformat(),
+            "test-source", json.dumps({"index": i, "text": "héllo \"quoted\""})
+        )
+    
+    chunks = [rows async for rows in dedup_store.export_events(topic="topic-0", chunk_size=5)]
+    assert [len(rows) for rows in chunks] == [5, 5, 3]
+    
+    exported = [
+        json.loads(line)
+        for rows in chunks
+        for line in format_ndjson(rows).decode("utf-8").splitlines()
+    ]
+    expected = await dedup_store.get_events(topic="topic-0", limit=100)
+    assert exported == list(reversed(expected))
+    
+    # Time-range filter
+    middle = exported[5]['processed_at']
+    later = [rows async for rows in dedup_store.export_events(topic="topic-0", since=middle)]
+    assert sum(len(rows) for rows in later) == 8
+    
+    pool_stats = dedup_store.get_read_pool_stats()
+    assert pool_stats['available'] == pool_stats['size']
+
+
+# TEST 39-40: Sharded Store Tests
+
+@pytest.mark.asyncio
+async def test_sharded_store_merged_reads():
+    """Test 39: Sharded store dedups per shard and merges reads in global order."""
+    tmpdir = tempfile.mkdtemp()
+    store = ShardedDedupStore(os.path.join(tmpdir, "dedup.db"), num_shards=3)
+    await store.initialize()
+    
+    try:
+        rows = [
+            (f"topic-{i % 2}", f"event-{i}", datetime.utcnow().isoformat(), "test-source",
+             json.dumps({"index": i}))
+            for i in range(40)
+        ]
+        # Batch pertama + batch kedua berisi duplikat dari batch pertama
+        assert await store.mark_processed_many(rows[:25]) == [True] * 25
+        results = await store.mark_processed_many(rows[20:])
+        assert results == [False] * 5 + [True] * 15
+        
+        assert await store.is_duplicate("topic-0", "event-0") is True
+        assert await store.count_events() == 40
+        assert await store.count_events("topic-1") == 20
+        assert await store.get_topics() == ["topic-0", "topic-1"]
+        assert await store.get_topic_counts() == {"topic-0": 20, "topic-1": 20}
+        
+        stats = await store.get_stats()
+        assert stats['unique_processed'] == 40
+        assert stats['duplicate_dropped'] == 5
+        
+        # Semua shard terisi, ordering global (processed_at DESC, id DESC)
+        assert all([await shard.count_events() > 0 for shard in store.shards])
+        everything = await store.get_events(limit=100)
+        keys = [(e['processed_at'], e['id']) for e in everything]
+        assert keys == sorted(keys, reverse=True)
+        assert len(set(e['id'] for e in everything)) == 40
+        
+        # Keyset pagination lintas shard == urutan penuh
+        paged, cursor = [], None
+        while True:
+            page = await store.get_events(limit=7, cursor=cursor)
+            paged.extend(page)
+            if len(page) < 7:
+                break
+            cursor = encode_cursor(page[-1]['processed_at'], page[-1]['id'])
+        assert paged == everything
+        
+        assert await store.get_events(limit=5, offset=10) == everything[10:15]
+        
+        exported = [row async for rows in store.export_events(chunk_size=6) for row in rows]
+        assert [row[0] for row in exported] == [e['id'] for e in reversed(everything)]
+    finally:
+        await store.close()
+        shutil.rmtree(tmpdir)
+
+
+@pytest.mark.asyncio
+async def test_reshard_single_file():
+    """Test 40: Reshard single-file database keeps events, stats and dedup."""
+    tmpdir = tempfile.mkdtemp()
+    db_path = os.path.join(tmpdir, "dedup.db")
+    
+    try:
+        store = DedupStore(db_path)
+        await store.initialize()
+        rows = [
+            (f"topic-{i % 3}", f"event-{i}", datetime.utcnow().isoformat(), "test-source", "{}")
+            for i in range(30)
+        ]
+        await store.increment_received(35)
+        await store.mark_processed_many(rows + rows[:5])
+        await store.close()
+        
+        assert await reshard(db_path, 1, 3) == 0
+        assert not os.path.exists(db_path)
+        assert all(os.path.exists(path) for path in shard_paths(db_path, 3))
+        
+        # Jumlah shard yang berbeda dengan file yang ada ditolak
+        with pytest.raises(RuntimeError, match="reshard"):
+            await create_store(db_path, 4).initialize()
+        
+        sharded = create_store(db_path, 3)
+        await sharded.initialize()
+        try:
+            assert isinstance(sharded, ShardedDedupStore)
+            assert await sharded.count_events() == 30
+            assert await sharded.get_topic_counts() == {"topic-0": 10, "topic-1": 10, "topic-2": 10}
+            assert await sharded.verify_topic_counts() == {}
+            assert await sharded.get_stats() == {
+                'received': 35, 'unique_processed': 30, 'duplicate_dropped': 5
+            }
+            assert await sharded.mark_processed_many(rows[:3]) == [False] * 3
+        finally:
+            await sharded.close()
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+# TEST 41: Multi-Process Mode Tests
+
+@pytest.mark.asyncio
+async def test_owner_client_forward_roundtrip():
+    """Test 41: Events forwarded by an ingest process decode identically in the owner."""
+    from fastapi import FastAPI, Request
+    
+    owner = FastAPI()
+    registry = ProcessRegistry()
+    forwarded = []
+    
+    @owner.post("/internal/ingest")
+    async def ingest(request: Request, block: bool = False):
+        events = decode_publish_request(await request.body())
+        registry.record(int(request.headers[PID_HEADER]), len(events))
+        forwarded.append((events, block))
+        return {"status": "accepted", "received": len(events), "queued": len(events), "message": ""}
+    
+    events = [
+        Event(
+            topic="test-topic",
+            event_id=f"event-{i}",
+            timestamp="2025-01-01T00:00:00Z",
+            source="test-source",
+            payload={"index": i, "nested": {"text": "héllo"}}
+        )
+        for i in range(3)
+    ]
+    
+    client = OwnerClient("unused.sock", transport=httpx.ASGITransport(app=owner))
+    try:
+        response = await client.forward(events)
+        await client.forward(events[:1], block=True)
+    finally:
+        await client.close()
+    
+    assert response['queued'] == 3
+    assert [r._asdict() for r in forwarded[0][0]] == [e.model_dump() for e in events]
+    assert [block for _, block in forwarded] == [False, True]
+    
+    stats = registry.get_stats()
+    assert [(s['pid'], s['requests'], s['events']) for s in stats] == [(os.getpid(), 2, 4)]
+
+
+# TEST 42-43: Ingest Log Tests
+
+@pytest.mark.asyncio
+async def test_ingest_log_rotation_and_recovery():
+    """Test 42: Log rotates segments, truncates torn tail and deletes consumed segments."""
+    tmpdir = tempfile.mkdtemp()
+    
+    try:
+        log = IngestLog(tmpdir, segment_max_bytes=200, checkpoint_interval=0)
+        await log.open()
+        
+        # Append bersamaan di-group dalam fsync yang sama
+        payloads = [f"event-{i}".encode() * 5 for i in range(20)]
+        firsts = await asyncio.gather(*(log.append(payloads[i:i + 2]) for i in range(0, 20, 2)))
+        assert sorted(firsts) == list(range(0, 20, 2))
+        assert log.fsyncs < 10
+        
+        records = await log.read(0, 100)
+        assert [offset for offset, _ in records] == list(range(20))
+        assert sorted(payload for _, payload in records) == sorted(payloads)
+        
+        # Ack tidak urut: watermark hanya maju sampai offset berurutan
+        log.ack([0, 1, 2, 5])
+        assert log.acked_offset == 3
+        log.ack(range(3, 12))
+        log.checkpoint()
+        await log.close()
+        
+        # Segment yang seluruhnya < checkpoint sudah dihapus
+        bases = sorted(int(f[:-4]) for f in os.listdir(tmpdir) if f.endswith(".log"))
+        assert 0 < bases[0] <= 12
+        assert len(bases) == 1 or bases[1] > 12
+        
+        # Crash di tengah write: record terakhir tidak utuh
+        last_segment = sorted(f for f in os.listdir(tmpdir) if f.endswith(".log"))[-1]
+        with open(os.path.join(tmpdir, last_segment), "ab") as f:
+            f.write(b"\x00\x00\x01\x00partial")
+        
+        reopened = IngestLog(tmpdir, segment_max_bytes=200, checkpoint_interval=0)
+        await reopened.open()
+        assert reopened.checkpoint_offset == 12
+        assert reopened.end_offset == 20
+        assert [o for o, _ in reopened.read_available(12, 100)] == list(range(12, 20))
+        await reopened.close()
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+@pytest.mark.asyncio
+async def test_ingest_log_replay_after_crash(dedup_store):
+    """Test 43: Unprocessed logged events are replayed exactly once after restart."""
+    tmpdir = tempfile.mkdtemp()
+    
+    try:
+        events = [
+            Event(
+                topic="test-topic",
+                event_id=f"event-{i}",
+                timestamp=datetime.utcnow().isoformat() + "Z",
+                source="test-source",
+                payload={"index": i}
+            )
+            for i in range(10)
+        ]
+        
+        log = IngestLog(tmpdir, checkpoint_interval=0)
+        await log.open()
+        await log.append([encode_log_event(e) for e in events])
+        assert decode_log_event(encode_log_event(events[0]))._asdict() == events[0].model_dump()
+        
+        # 4 event pertama sudah ter-commit, crash sebelum checkpoint
+        worker_pool = WorkerPool(
+            dedup_store, num_workers=2, queue_max_size=100,
+            batch_max_size=4, batch_max_linger_ms=5
+        )
+        worker_pool.start()
+        for event in events[:4]:
+            await worker_pool.put(event)
+        await worker_pool.join()
+        await worker_pool.stop()
+        log._file.close()
+        
+        restarted = IngestLog(tmpdir, checkpoint_interval=0)
+        await restarted.open()
+        assert restarted.checkpoint_offset == 0
+        
+        assert await replay_ingest_log(restarted, dedup_store, batch_size=3) == (10, 6)
+        assert restarted.checkpoint_offset == 10
+        assert await dedup_store.count_events() == 10
+        
+        stats = await dedup_store.get_stats()
+        assert stats['unique_processed'] == 10
+        assert stats['duplicate_dropped'] == 0
+        
+        # Replay kedua tidak memproses apa-apa
+        assert await replay_ingest_log(restarted, dedup_store, batch_size=3) == (0, 0)
+        await restarted.close()
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+# TEST 44: Admission Control Tests
+
+@pytest.mark.asyncio
+async def test_admission_control_all_or_nothing():
+    """Test 44: Batches are admitted whole or rejected with Retry-After from drain rate."""
+    state = {'depth': 0, 'processed': 0}
+    admission = AdmissionController(
+        max_depth=100,
+        depth_fn=lambda: state['depth'],
+        processed_fn=lambda: state['processed'],
+        retry_after_min=1,
+        retry_after_max=30
+    )
+    
+    # Batch yang melebihi kapasitas total tidak akan pernah diterima
+    with pytest.raises(BatchTooLarge):
+        admission.admit(101)
+    
+    # Reservasi batch yang sedang di-enqueue ikut dihitung
+    admission.admit(60)
+    with pytest.raises(Overloaded) as exc_info:
+        admission.admit(50)
+    # Drain rate belum terukur: Retry-After maksimum
+    assert exc_info.value.retry_after == 30
+    admission.release(60)
+    state['depth'] = 60
+    
+    # Consumer memproses 20 event/detik, depth 90 + batch 20 = kelebihan 10
+    admission._last_sample_at -= 1.0
+    state['processed'] = 20
+    state['depth'] = 90
+    assert admission.try_admit(20) == 1
+    admission._last_sample_at -= 1.0
+    state['processed'] = 40
+    assert admission.try_admit(45) == 2
+    assert admission.try_admit(10) is None
+    admission.release(10)
+    
+    # admit_wait menunggu sampai depth turun
+    async def drain():
+        await asyncio.sleep(0.05)
+        state['depth'] = 0
+    
+    drainer = asyncio.create_task(drain())
+    await asyncio.wait_for(admission.admit_wait(50), timeout=1)
+    await drainer
+    admission.release(50)
+    
+    stats = admission.get_stats()
+    assert stats['reserved'] == 0
+    assert stats['admitted_requests'] == 3
+    assert stats['admitted_events'] == 120
+    assert stats['rejected_requests'] == 3
+    assert stats['rejected_events'] == 115
+    assert stats['waited_requests'] == 1
+    assert stats['drain_rate'] == pytest.approx(20.0, abs=0.5)
+
+
+# TEST 45-46: Retention Window Tests
+
+@pytest.mark.asyncio
+async def test_retention_buckets_dedup_and_expiry():
+    """Test 45: Dedup spans buckets inside the window; expired buckets are dropped whole."""
+    tmpdir = tempfile.mkdtemp()
+    db_path = os.path.join(tmpdir, "dedup.db")
+    clock = {'now': datetime(2025, 1, 1, 12, 0, 0)}
+    
+    def make_store():
+        store = RetentionDedupStore(
+            db_path, window_seconds=2 * 86400, bucket_seconds=86400, check_interval=0
+        )
+        store._utcnow = lambda: clock['now']
+        return store
+    
+    def row(topic, i):
+        return (topic, f"event-{i}", "2025-01-01T00:00:00Z", "test-source", "{}")
+    
+    try:
+        store = make_store()
+        await store.initialize()
+        
+        assert await store.mark_processed_many([row("a", i) for i in range(5)]) == [True] * 5
+        
+        # Hari berikutnya: bucket baru, duplikat di bucket lama tetap terdeteksi
+        clock['now'] = datetime(2025, 1, 2, 12, 0, 0)
+        results = await store.mark_processed_many([row("a", 3), row("b", 10), row("b", 10)])
+        assert results == [False, True, False]
+        assert await store.is_duplicate("a", "event-0")
+        assert len(store._buckets) == 2
+        
+        # Urutan global lintas bucket, cursor tetap berlaku
+        events = await store.get_events(limit=4)
+        assert [e['event_id'] for e in events[:2]] == ["event-10", "event-4"]
+        ids = [e['id'] for e in events]
+        assert ids == sorted(ids, reverse=True) and len(set(ids)) == 4
+        next_page = await store.get_events(limit=10, cursor=encode_cursor(
+            events[-1]['processed_at'], events[-1]['id']
+        ))
+        assert len(next_page) == 2
+        exported = [row for chunk in [c async for c in store.export_events(chunk_size=2)] for row in chunk]
+        assert [r[0] for r in exported] == sorted(ids + [e['id'] for e in next_page])
+        
+        # Bucket hari pertama keluar dari window: DROP TABLE, bukan DELETE
+        clock['now'] = datetime(2025, 1, 4, 0, 0, 1)
+        first_bucket = store._buckets[0]['name']
+        assert await store.expire_buckets() == 5
+        async with store.db.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = ?", (first_bucket,)
+        ) as cursor:
+            assert await cursor.fetchone() is None
+        assert await store.get_topic_counts() == {"b": 1}
+        assert not await store.is_duplicate("a", "event-0")
+        
+        stats = await store.get_retention_stats()
+        assert stats['buckets'] == 1
+        assert stats['retained_events'] == 1
+        assert stats['expired_buckets'] == 1 and stats['expired_events'] == 5
+        assert stats['free_bytes'] > 0
+        
+        # Setelah expire, key lama diterima lagi dengan id baru (tidak dipakai ulang)
+        assert await store.mark_processed_many([row("a", 0)]) == [True]
+        assert (await store.get_events(limit=1))[0]['id'] == 7
+        assert await store.verify_topic_counts() == {}
+        await store.close()
+        
+        # Restart: semua bucket expired, id tetap monoton
+        clock['now'] = datetime(2025, 1, 10, 0, 0, 0)
+        store = make_store()
+        await store.initialize()
+        assert await store.count_events() == 0
+        assert len(store._buckets) == 1
+        assert await store.mark_processed_many([row("c", 1)]) == [True]
+        assert (await store.get_events(limit=1))[0]['id'] == 8
+        assert (await store.get_stats())['unique_processed'] == 8
+        await store.close()
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+@pytest.mark.asyncio
+async def test_retention_adopts_existing_database():
+    """Test 46: Enabling retention registers processed_events as the first bucket."""
+    tmpdir = tempfile.mkdtemp()
+    db_path = os.path.join(tmpdir, "dedup.db")
+    
+    try:
+        store = DedupStore(db_path)
+        await store.initialize()
+        await store.mark_processed_many([
+            ("a", f"event-{i}", "2025-01-01T00:00:00Z", "test-source", "{}") for i in range(3)
+        ])
+        await store.close()
+        
+        # Tanpa bloom filter: lookup lintas bucket selalu lewat query join
+        retained = create_store(
+            db_path, num_shards=1, retention_seconds=86400, bucket_seconds=3600, bloom_memory_bytes=0
+        )
+        assert isinstance(retained, RetentionDedupStore)
+        await retained.initialize()
+        assert [b['name'] for b in retained._buckets] == ["processed_events"]
+        assert await retained.is_duplicate("a", "event-1")
+        assert await retained.mark_processed_many([
+            ("a", "event-2", "2025-01-01T00:00:00Z", "test-source", "{}"),
+            ("a", "event-9", "2025-01-01T00:00:00Z", "test-source", "{}")
+        ]) == [False, True]
+        assert len(retained._buckets) == 2
+        assert [e['id'] for e in await retained.get_events()] == [4, 3, 2, 1]
+        await retained.close()
+        
+        # Database dengan bucket tidak bisa dibuka tanpa retention
+        plain = DedupStore(db_path)
+        with pytest.raises(RuntimeError):
+            await plain.initialize()
+        await plain.db.close()
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+# TEST 47: Payload Compression Tests
+
+@pytest.mark.asyncio
+async def test_payload_compression_and_migration():
+    """Test 47: Payloads are compressed per topic dictionary, migrated and decoded on read."""
+    tmpdir = tempfile.mkdtemp()
+    db_path = os.path.join(tmpdir, "dedup.db")
+    
+    def payload(i):
+        return json.dumps({
+            "message": f"Event from publisher number {i}",
+            "level": ["INFO", "WARNING", "ERROR"][i % 3],
+            "metadata": {"host": f"host-{i % 4}", "service": f"service-{i % 2}"}
+        })
+    
+    def rows(start, end):
+        return [("logs", f"event-{i}", "2025-01-01T00:00:00Z", "test-source", payload(i)) for i in range(start, end)]
+    
+    async def stored_types(store):
+        async with store.db.execute(
+            "SELECT typeof(payload), COUNT(*) FROM processed_events GROUP BY 1"
+        ) as cursor:
+            return {row[0]: row[1] async for row in cursor}
+    
+    try:
+        # Database lama: payload plain TEXT
+        store = DedupStore(db_path, compress_payloads=False)
+        await store.initialize()
+        await store.mark_processed_many(rows(0, 30))
+        await store.close()
+        
+        store = DedupStore(db_path, compress_payloads=True)
+        store.codec.dict_samples = 20
+        await store.initialize()
+        await asyncio.wait_for(store._migration_task, timeout=5)
+        assert await stored_types(store) == {"blob": 30}
+        
+        await store.mark_processed_many(rows(30, 60))
+        assert await stored_types(store) == {"blob": 60}
+        stats = store.get_compression_stats()
+        assert stats['dictionaries'] == 1
+        assert stats['migrated_rows'] == 30
+        assert stats['ratio'] < 0.7
+        assert not stats['migration_pending']
+        
+        events = await store.get_events(limit=100)
+        assert {e['event_id']: e['payload'] for e in events} == {
+            f"event-{i}": json.loads(payload(i)) for i in range(60)
+        }
+        exported = [r for chunk in [c async for c in store.export_events()] for r in chunk]
+        assert [r[5] for r in exported] == [payload(i) for i in range(60)]
+        await store.close()
+        
+        # Kompresi dimatikan: row terkompresi tetap terbaca, migrasi tidak diulang
+        store = DedupStore(db_path, compress_payloads=False)
+        await store.initialize()
+        assert (await store.get_events(limit=1))[0]['payload'] == json.loads(payload(59))
+        async with store.db.execute("SELECT migrated_id FROM payload_migration") as cursor:
+            assert (await cursor.fetchone())[0] == 60
+        await store.close()
+        
+        # Reshard menyalin payload sebagai JSON text
+        assert await reshard(db_path, 1, 2) == 0
+        sharded = create_store(db_path, num_shards=2, compress_payloads=False)
+        await sharded.initialize()
+        assert sorted(e['payload']['message'] for e in await sharded.get_events(limit=100)) == sorted(
+            json.loads(payload(i))['message'] for i in range(60)
+        )
+        await sharded.close()
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+# TEST 48: Raw JSON /events Response Tests
+
+@pytest.mark.asyncio
+async def test_events_page_matches_response_model(dedup_store):
+    """Test 48: format_events_page produces the same document as EventsResponse."""
+    for i in range(12):
+        await dedup_store.mark_processed(
+            f"topic-{i % 2}", f"event-{i}", datetime.utcnow().isoformat(),
+            "src \"quoted\"", json.dumps({"index": i, "text": "héllo", "nested": {"list": [1, None]}})
+        )
+    
+    rows = await dedup_store.get_event_rows(limit=5, offset=2)
+    assert all(isinstance(row[5], str) for row in rows)
+    events = await dedup_store.get_events(limit=5, offset=2)
+    next_cursor = encode_cursor(rows[-1][6], rows[-1][0])
+    
+    body = format_events_page(rows, 12, 5, 2, next_cursor)
+    expected = EventsResponse(events=events, total=12, limit=5, offset=2, next_cursor=next_cursor)
+    assert json.loads(body) == json.loads(expected.model_dump_json())
+    
+    empty = format_events_page([], 0, 5, 0, None)
+    assert json.loads(empty) == EventsResponse(events=[], total=0, limit=5, offset=0).model_dump()
+
+
+# TEST 49-50: Prometheus Metrics Tests
+
+def test_metrics_histogram_and_exposition():
+    """Test 49: Histogram buckets are cumulative and labels are escaped."""
+    histogram = metrics.Histogram("test_seconds", "Test latency.", buckets=(0.01, 0.1), label="endpoint")
+    for value in (0.005, 0.01, 0.05, 2.0):
+        histogram.observe(value, "/publish")
+    assert histogram.snapshot("/publish")['buckets'] == [2, 1, 1]
+    
+    counter = metrics.Counter("test_total", "Test counter.", "topic")
+    counter.inc('a "b"\\', 3)
+    gauge = metrics.Gauge("test_depth", "Test gauge.", "worker")
+    gauge.set_function(lambda: {0: 4, 1: 0})
+    
+    text = metrics.render_metrics([histogram, counter, gauge]).decode("utf-8")
+    assert '# TYPE test_seconds histogram' in text
+    assert 'test_seconds_bucket{endpoint="/publish",le="0.01"} 2' in text
+    assert 'test_seconds_bucket{endpoint="/publish",le="0.1"} 3' in text
+    assert 'test_seconds_bucket{endpoint="/publish",le="+Inf"} 4' in text
+    assert 'test_seconds_count{endpoint="/publish"} 4' in text
+    assert 'test_total{topic="a \\"b\\"\\\\"} 3' in text
+    assert 'test_depth{worker="0"} 4' in text
+
+
+@pytest.mark.asyncio
+async def test_metrics_consumer_pipeline(dedup_store):
+    """Test 50: Worker pool records queue wait, transaction latency and per-topic counters."""
+    queue_waits = metrics.QUEUE_WAIT_SECONDS.snapshot()['count']
+    transactions = metrics.MARK_PROCESSED_SECONDS.snapshot()['count']
+    commits = metrics.COMMIT_SECONDS.snapshot()['count']
+    probes = metrics.DEDUP_PROBE_SECONDS.snapshot("cache")['count']
+    unique = metrics.UNIQUE_PROCESSED.value("metrics-topic")
+    duplicates = metrics.DUPLICATE_DROPPED.value("metrics-topic")
+    
+    pool = WorkerPool(
+        dedup_store, num_workers=2, queue_max_size=100,
+        batch_max_size=10, batch_max_linger_ms=5
+    )
+    pool.start()
+    try:
+        for i in [0, 1, 2, 0, 1]:
+            await pool.put(Event(
+                topic="metrics-topic", event_id=f"event-{i}",
+                timestamp="2025-01-01T00:00:00Z", source="test", payload={}
+            ))
+        await pool.join()
+    finally:
+        await pool.stop()
+    
+    assert metrics.QUEUE_WAIT_SECONDS.snapshot()['count'] == queue_waits + 5
+    assert metrics.MARK_PROCESSED_SECONDS.snapshot()['count'] > transactions
+    assert metrics.COMMIT_SECONDS.snapshot()['count'] > commits
+    assert metrics.UNIQUE_PROCESSED.value("metrics-topic") == unique + 3
+    assert metrics.DUPLICATE_DROPPED.value("metrics-topic") == duplicates + 2
+    
+    # Probe duplikat diukur per batch di jalur ingest, bukan di is_duplicate
+    assert metrics.DEDUP_PROBE_SECONDS.snapshot("cache")['count'] > probes
+    probes = metrics.DEDUP_PROBE_SECONDS.snapshot("cache")['count']
+    assert await dedup_store.is_duplicate("metrics-topic", "event-0")
+    assert metrics.DEDUP_PROBE_SECONDS.snapshot("cache")['count'] == probes
+
+
+# TEST 51-52: Profiler & Event Loop Lag Tests
+
+def test_sampling_profiler_collapsed_stacks():
+    """Test 51: Sampling profiler attributes samples to the busy thread's stack."""
+    import threading
+    import time
+    
+    stop = threading.Event()
+    
+    def busy_loop_for_profiler():
+        while not stop.is_set():
+            sum(range(1000))
+    
+    worker = threading.Thread(target=busy_loop_for_profiler, name="busy-thread")
+    worker.start()
+    try:
+        profiler = SamplingProfiler(interval=0.002)
+        holder = threading.Thread(target=profiler.run, args=(0.3,))
+        holder.start()
+        time.sleep(0.05)
+        # Hanya satu profiling per process
+        with pytest.raises(ProfilerBusy):
+            SamplingProfiler().run(0.01)
+        holder.join()
+    finally:
+        stop.set()
+        worker.join()
+    
+    lines = profiler.collapsed().splitlines()
+    assert profiler.samples > 10
+    busy = [line for line in lines if line.startswith("busy-thread;")]
+    assert busy and all("busy_loop_for_profiler (tests/test_aggregator.py:" in line for line in busy)
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in busy) > profiler.samples // 2
+
+
+@pytest.mark.asyncio
+async def test_loop_lag_monitor_detects_blocking():
+    """Test 52: Loop lag monitor reports time the event loop was blocked."""
+    import time
+    
+    lag_observations = metrics.EVENT_LOOP_LAG_SECONDS.snapshot()['count']
+    monitor = LoopLagMonitor(interval=0.01, warn_threshold=0.05)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        time.sleep(0.1)  # blok event loop
+        await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+    
+    stats = monitor.get_stats()
+    assert stats['blocked'] >= 1
+    assert stats['max_lag_ms'] >= 50
+    assert stats['samples'] >= 3
+    assert metrics.EVENT_LOOP_LAG_SECONDS.snapshot()['count'] == lag_observations + stats['samples']
+
+
+# TEST 53: Benchmark Suite Tests
+
+def test_benchmark_workload_and_regression_check():
+    """Test 53: Workload is deterministic and baseline comparison flags regressions."""
+    events = make_workload(1000, duplicate_rate=0.3, topics=5, payload_bytes=512)
+    assert events == make_workload(1000, duplicate_rate=0.3, topics=5, payload_bytes=512)
+    unique, duplicates = expected_counts(events)
+    assert unique + duplicates == 1000
+    assert 200 < duplicates < 400
+    assert all(abs(len(json.dumps(e['payload'])) - 512) <= 2 for e in events)
+    
+    baseline = {
+        'a': {'events_per_sec': 1000.0, 'p99_ms': 10.0},
+        'b': {'events_per_sec': 1000.0, 'p99_ms': 10.0},
+        'c': {'events_per_sec': 1000.0, 'p99_ms': 0.2}
+    }
+    results = {
+        'a': {'events_per_sec': 900.0, 'p99_ms': 11.0},
+        'b': {'events_per_sec': 700.0, 'p99_ms': 20.0},
+        'c': {'events_per_sec': 1000.0, 'p99_ms': 0.5},
+        'new': {'events_per_sec': 1.0, 'p99_ms': 100.0}
+    }
+    regressions = compare(results, baseline, tolerance=0.25)
+    assert [(r['scenario'], r['metric']) for r in regressions] == [
+        ('b', 'events_per_sec'), ('b', 'p99_ms')
+    ]
+
+
+
+# ============================================================
+# TEST 54: Publisher Latency Histogram Tests
+# ============================================================
+
+def load_publisher():
+    """publisher/main.py sebagai module terpisah (nama main bentrok dengan aggregator)."""
+    import importlib.util
+    publisher_dir = os.path.join(os.path.dirname(__file__), '..', 'publisher')
+    # Di belakang sys.path agar "import main" tetap main.py aggregator
+    if publisher_dir not in sys.path:
+        sys.path.append(publisher_dir)
+    spec = importlib.util.spec_from_file_location("publisher_main", os.path.join(publisher_dir, 'main.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_publisher_latency_histogram():
+    """Test 54: HDR-style histogram keeps percentiles within 1% relative error."""
+    LatencyHistogram = load_publisher().LatencyHistogram
+    histogram = LatencyHistogram()
+    samples = [i / 10000 for i in range(1, 10001)]  # 0.1ms .. 1s
+    for value in samples:
+        histogram.record(value)
+    histogram.record(5.0, count=10)  # 10 request tertahan 5 detik
+    
+    assert histogram.total == 10010
+    for percent in (50.0, 90.0, 99.0):
+        exact = samples[int(len(samples) * percent / 100) - 1] * 1000
+        assert abs(histogram.percentile(percent) - exact) <= exact * 0.01
+    assert histogram.percentile(99.99) == 5000.0
+    
+    summary = histogram.summary()
+    assert summary['count'] == 10010
+    assert summary['min_ms'] == 0.1
+    assert summary['max_ms'] == 5000.0
+    assert set(summary['percentiles_ms']) == {'p50', 'p90', 'p99', 'p99.9', 'p99.99'}
+    assert LatencyHistogram().percentile(99.0) == 0.0
+
+
+
+# ============================================================
+# TEST 55: Publisher Workload Profile Tests
+# ============================================================
+
+def test_publisher_workload_profiles(tmp_path):
+    """Test 55: Seeded workload is deterministic, skewed, bursty and replayable."""
+    load_publisher()
+    from workload import WorkloadGenerator, get_profile, replay, write_records
+    from collections import Counter
+    
+    profile = get_profile('production', duplicate_rate=0.3)
+    items = WorkloadGenerator(profile, seed=7).take(20000)
+    assert items == WorkloadGenerator(profile, seed=7).take(20000)
+    assert items != WorkloadGenerator(profile, seed=8).take(20000)
+    
+    # Rasio duplikat tetap mendekati duplicate_rate walau ada burst retry
+    duplicates = sum(is_duplicate for _, is_duplicate in items)
+    assert 0.27 < duplicates / len(items) < 0.33
+    unique_keys = {(e['topic'], e['event_id']) for e, is_duplicate in items if not is_duplicate}
+    assert len(unique_keys) == len(items) - duplicates
+    
+    # Zipf: topic pertama menerima event terbanyak
+    topics = Counter(e['topic'] for e, is_duplicate in items if not is_duplicate)
+    assert topics.most_common(1)[0][0] == profile.topics[0]
+    assert topics[profile.topics[0]] > 3 * topics[profile.topics[-1]]
+    
+    # Burst: duplikat yang langsung mengulang event sebelumnya
+    repeats = sum(1 for i in range(1, len(items)) if items[i][0] is items[i - 1][0])
+    assert repeats > duplicates * 0.3
+    
+    sizes = sorted(len(json.dumps(e['payload'])) for e, _ in items)
+    assert sizes[0] < 512 < sizes[-1]
+    
+    uniform = WorkloadGenerator(get_profile('uniform', duplicate_rate=0.0), seed=1).take(1000)
+    assert not any(is_duplicate for _, is_duplicate in uniform)
+    assert all(len(json.dumps(e['payload'])) == 300 for e, _ in uniform)
+    
+    path = str(tmp_path / "workload.ndjson")
+    with open(path, "w") as f:
+        write_records(f, [e for e, _ in items])
+    assert list(replay(path)) == items
+    
+    with pytest.raises(ValueError):
+        get_profile('unknown')
+
+
+
+# ============================================================
+# TEST 56: Worker Retry Tests
+# ============================================================
+
+@pytest.mark.asyncio
+async def test_worker_retries_failed_batch_and_acks_log(dedup_store, monkeypatch):
+    """Test 56: A failed write is retried, so the ingest log ack watermark keeps moving."""
+    import src.worker_pool as worker_pool_module
+    monkeypatch.setattr(worker_pool_module, "RETRY_BACKOFF_INITIAL", 0.01)
+    
+    tmpdir = tempfile.mkdtemp()
+    original = dedup_store.mark_processed_many
+    failures = {'left': 1}
+    
+    async def flaky_mark_processed_many(rows, *args, **kwargs):
+        if failures['left']:
+            failures['left'] -= 1
+            raise RuntimeError("database is locked")
+        return await original(rows, *args, **kwargs)
+    
+    monkeypatch.setattr(dedup_store, "mark_processed_many", flaky_mark_processed_many)
+    
+    try:
+        log = IngestLog(tmpdir, checkpoint_interval=0)
+        await log.open()
+        worker_pool = WorkerPool(
+            dedup_store, num_workers=2, queue_max_size=100,
+            batch_max_size=5, batch_max_linger_ms=5, ingest_log=log
+        )
+        worker_pool.start()
+        await log.append([
+            encode_log_event(Event(
+                topic="test-topic",
+                event_id=f"event-{i}",
+                timestamp="2025-01-01T00:00:00Z",
+                source="test-source",
+                payload={"index": i}
+            ))
+            for i in range(20)
+        ])
+        
+        for _ in range(200):
+            if log.acked_offset == 20:
+                break
+            await asyncio.sleep(0.01)
+        await worker_pool.stop()
+        
+        assert failures['left'] == 0
+        assert log.acked_offset == 20
+        log.checkpoint()
+        assert log.checkpoint_offset == 20
+        assert await dedup_store.count_events() == 20
+        # BatchWriter menggabungkan batch worker: satu transaksi gagal = >= 1 retry
+        assert sum(w['failed_attempts'] for w in worker_pool.get_stats()) >= 1
+        assert worker_pool.processed_total() == 20
+        await log.close()
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+
+# ============================================================
+# TEST 57: Export Connection Isolation Tests
+# ============================================================
+
+@pytest.mark.asyncio
+async def test_export_releases_connections_between_chunks(dedup_store):
+    """Test 57: A paused export holds no read or export connection (keyset per chunk)."""
+    await dedup_store.mark_processed_many([
+        ("topic-a", f"event-{i}", "2025-01-01T00:00:00Z", "test-source", json.dumps({"i": i}))
+        for i in range(20)
+    ])
+    
+    export = dedup_store.export_events(chunk_size=5)
+    first = await export.__anext__()
+    assert len(first) == 5
+    
+    # Client lambat: export berhenti di tengah, /health dan /events tetap jalan
+    for pool in (dedup_store.read_pool, dedup_store.export_pool):
+        assert pool.get_stats()['available'] == pool.size
+    assert await asyncio.wait_for(dedup_store.health_check(), timeout=1)
+    assert len(await dedup_store.get_event_rows(limit=100)) == 20
+    
+    rows = list(first)
+    async for chunk in export:
+        rows.extend(chunk)
+    ids = [row[0] for row in rows]
+    assert ids == sorted(ids) and len(set(ids)) == 20
+    assert [row[2] for row in rows] == [f"event-{i}" for i in range(20)]
+
+
+
+# ============================================================
+# TEST 58: Sharded Export Connection Tests
+# ============================================================
+
+@pytest.mark.asyncio
+async def test_sharded_export_does_not_starve_read_pools():
+    """Test 58: Shard read pools keep a usable floor and merged export holds no connection."""
+    tmpdir = tempfile.mkdtemp()
+    store = ShardedDedupStore(
+        os.path.join(tmpdir, "dedup.db"), num_shards=4, read_pool_size=4, export_pool_size=2
+    )
+    await store.initialize()
+    
+    try:
+        assert [shard.read_pool.size for shard in store.shards] == [2] * 4
+        assert [shard.export_pool.size for shard in store.shards] == [1] * 4
+        
+        await store.mark_processed_many([
+            (f"topic-{i % 2}", f"event-{i}", datetime.utcnow().isoformat(), "test-source",
+             json.dumps({"index": i}))
+            for i in range(40)
+        ])
+        
+        export = store.export_events(chunk_size=5)
+        rows = list(await export.__anext__())
+        for shard in store.shards:
+            for pool in (shard.read_pool, shard.export_pool):
+                assert pool.get_stats()['available'] == pool.size
+        assert await asyncio.wait_for(store.health_check(), timeout=1)
+        assert len(await store.get_event_rows(limit=100)) == 40
+        
+        async for chunk in export:
+            rows.extend(chunk)
+        assert len({row[0] for row in rows}) == 40
+        assert [(row[6], row[0]) for row in rows] == sorted((row[6], row[0]) for row in rows)
+    finally:
+        await store.close()
+        shutil.rmtree(tmpdir)
+
+
+
+# ============================================================
+# TEST 59: Worker Queue Bound Tests
+# ============================================================
+
+@pytest.mark.asyncio
+async def test_worker_queues_unbounded_without_ingest_log(dedup_store):
+    """Test 59: A hot key never blocks enqueue; only log-fed queues are bounded."""
+    worker_pool = WorkerPool(
+        dedup_store, num_workers=4, queue_max_size=8,
+        batch_max_size=5, batch_max_linger_ms=5
+    )
+    assert all(queue.maxsize == 0 for queue in worker_pool.queues)
+    
+    # Semua event ke worker yang sama, melebihi ceil(8 / 4) per worker
+    event = Event(
+        topic="hot-topic", event_id="hot-key",
+        timestamp="2025-01-01T00:00:00Z", source="test-source", payload={}
+    )
+    for _ in range(20):
+        worker_pool.put_nowait(event)
+    assert sorted(worker_pool.queue_depths().values()) == [0, 0, 0, 20]
+    
+    worker_pool.start()
+    await asyncio.wait_for(worker_pool.join(), timeout=5)
+    await worker_pool.stop()
+    assert worker_pool.processed_total() == 20
+    assert sum(w['unique_processed'] for w in worker_pool.get_stats()) == 1
+    
+    tmpdir = tempfile.mkdtemp()
+    try:
+        log = IngestLog(tmpdir, checkpoint_interval=0)
+        await log.open()
+        log_pool = WorkerPool(
+            dedup_store, num_workers=4, queue_max_size=8,
+            batch_max_size=5, batch_max_linger_ms=5, ingest_log=log
+        )
+        assert all(queue.maxsize == 2 for queue in log_pool.queues)
+        await log.close()
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+
+# ============================================================
+# TEST 60: Multi-Process Metrics Tests
+# ============================================================
+
+@pytest.mark.asyncio
+async def test_ingest_process_metrics_reach_owner():
+    """Test 60: Ingest-process publish latency and admission decisions appear in /metrics."""
+    from fastapi import FastAPI, Request
+    
+    owner = FastAPI()
+    
+    @owner.post("/internal/metrics")
+    async def receive(request: Request):
+        metrics.import_process_metrics(request.headers[PID_HEADER], await request.json())
+        return {"status": "ok"}
+    
+    histogram = metrics.PUBLISH_SECONDS
+    local = histogram.export_series()
+    before = histogram.snapshot("/publish")['count']
+    
+    # Snapshot ingest process (pid lain) dijumlahkan ke series lokal saat render
+    remote = metrics.Histogram(histogram.name, histogram.documentation, label=histogram.label)
+    remote.observe(0.002, "/publish")
+    remote.observe(0.004, "/publish")
+    client = OwnerClient("unused.sock", transport=httpx.ASGITransport(app=owner))
+    try:
+        await client.push_metrics({histogram.name: remote.export_series()})
+        # Kiriman berikutnya dari pid yang sama menggantikan, bukan menambah
+        await client.push_metrics({histogram.name: remote.export_series()})
+    finally:
+        await client.close()
+    
+    try:
+        assert histogram.snapshot("/publish")['count'] == before + 2
+        assert histogram.export_series() == local
+        rendered = metrics.render_metrics().decode()
+        assert f'{histogram.name}_count{{endpoint="/publish"}} {before + 2}' in rendered
+    finally:
+        histogram.set_remote(str(os.getpid()), {})
+    
+    admitted = metrics.ADMISSION_REQUESTS.value("admitted")
+    rejected_events = metrics.ADMISSION_EVENTS.value("rejected")
+    admission = AdmissionController(max_depth=10, depth_fn=lambda: 0, processed_fn=lambda: 0)
+    assert admission.try_admit(6) is None
+    assert admission.try_admit(6) is not None
+    assert metrics.ADMISSION_REQUESTS.value("admitted") == admitted + 1
+    assert metrics.ADMISSION_EVENTS.value("rejected") == rejected_events + 6
+    assert b'aggregator_admission_requests_total{result="rejected"}' in metrics.render_metrics()
+
+
+
+# ============================================================
+# TEST 61: Bloom Filter Mode & Snapshot Identity Tests
+# ============================================================
+
+@pytest.mark.asyncio
+async def test_bloom_filter_auto_mode_and_snapshot_identity(tmp_path):
+    """Test 61: auto builds the filter only where ingest reads it; snapshots are bound to their DB."""
+    row = lambda event_id: ("test-topic", event_id, "2025-01-01T00:00:00Z", "test-source", "{}")
+    
+    # Default store: ingest tidak membaca bloom, filter tidak dibangun
+    plain_path = str(tmp_path / "plain.db")
+    plain = DedupStore(plain_path, bloom_filter="auto")
+    await plain.initialize()
+    await plain.mark_processed_many([row("event-0")])
+    assert plain.bloom is None and plain.get_bloom_stats() is None
+    await plain.close()
+    assert not os.path.exists(plain_path + ".bloom")
+    
+    retention = create_store(
+        str(tmp_path / "retention.db"), num_shards=1,
+        retention_seconds=86400, bucket_seconds=3600, bloom_filter="auto"
+    )
+    await retention.initialize()
+    assert retention.bloom is not None
+    await retention.close()
+    
+    # Snapshot berisi id 1..3 dari DB lama; DB baru di path yang sama
+    # (id berulang) tidak boleh memakai snapshot itu
+    db_path = str(tmp_path / "events.db")
+    old = DedupStore(db_path, cache_max_bytes=0, bloom_filter="on")
+    await old.initialize()
+    await old.mark_processed_many([row(f"old-{i}") for i in range(3)])
+    await old.close()
+    snapshot = (tmp_path / "events.db.bloom").read_bytes()
+    
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.unlink(db_path + suffix)
+    new = DedupStore(db_path, cache_max_bytes=0, bloom_filter="on")
+    await new.initialize()
+    await new.mark_processed_many([row(f"new-{i}") for i in range(5)])
+    await new.close()
+    (tmp_path / "events.db.bloom").write_bytes(snapshot)
+    
+    reopened = DedupStore(db_path, cache_max_bytes=0, bloom_filter="on")
+    await reopened.initialize()
+    try:
+        # Snapshot lama + catch-up id 4..5 juga 5 key, tapi tanpa new-0..2
+        assert reopened.get_bloom_stats()['keys'] == 5
+        assert all(reopened.bloom.might_contain("test-topic", f"new-{i}") for i in range(5))
+    finally:
+        await reopened.close()
+
+
+
+# ============================================================
+# TEST 62: Streaming Publish Endpoint Tests
+# ============================================================
+
+@pytest.mark.asyncio
+async def test_publish_stream_endpoint(tmp_path, monkeypatch):
+    """Test 62: /publish/stream rejects bad lines, caps reported errors and waits for capacity."""
+    import contextlib
+    import main
+    
+    monkeypatch.setattr(Config, "DB_PATH", str(tmp_path / "stream.db"))
+    monkeypatch.setattr(Config, "DB_SHARDS", 1)
+    monkeypatch.setattr(Config, "RETENTION_WINDOW_SECONDS", 0)
+    monkeypatch.setattr(Config, "INGEST_LOG_DIR", "")
+    monkeypatch.setattr(Config, "AGGREGATOR_ROLE", "standalone")
+    monkeypatch.setattr(Config, "NUM_WORKERS", 1)
+    monkeypatch.setattr(Config, "STREAM_MAX_LINE_BYTES", 1024)
+    # Depth 1: setiap event menunggu sampai event sebelumnya diambil worker
+    monkeypatch.setattr(Config, "ADMISSION_MAX_DEPTH", 1)
+    monkeypatch.setattr(main, "STREAM_MAX_REPORTED_ERRORS", 3)
+    
+    def event_line(i):
+        return json.dumps({
+            "topic": "stream-topic", "event_id": f"event-{i % 15}",
+            "timestamp": "2025-01-01T00:00:00Z", "source": "test-source", "payload": {"i": i}
+        })
+    
+    lines = [event_line(i) for i in range(20)]
+    # Baris rusak di posisi (1-based) 3, 6, 9, 12, 15
+    bad_lines = [
+        "{not json",
+        json.dumps({"topic": "stream-topic", "source": "test-source"}),
+        json.dumps({"topic": "", "event_id": "x", "timestamp": "2025-01-01T00:00:00Z", "source": "s"}),
+        "x" * 2048,
+        "[]"
+    ]
+    for offset, bad in enumerate(bad_lines):
+        lines.insert(offset * 3 + 2, bad)
+    body = ("\n".join(lines) + "\n").encode("utf-8")
+    
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        lifespan = main.app.router.lifespan_context(main.app)
+        await lifespan.__aenter__()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(
+                "/publish/stream", content=body, headers={'Content-Type': 'application/x-ndjson'}
+            )
+            assert response.status_code == 200
+            result = response.json()
+            assert result['accepted'] == 20
+            assert result['rejected'] == 5
+            # Detail dibatasi STREAM_MAX_REPORTED_ERRORS, hitungan tetap lengkap
+            assert [error['line'] for error in result['errors']] == [3, 6, 9]
+            assert all(error['error'] for error in result['errors'])
+            
+            await asyncio.wait_for(main.worker_pool.join(), timeout=5)
+            assert main.admission.get_stats()['waited_requests'] >= 1
+            assert main.admission.get_stats()['rejected_requests'] == 0
+            
+            stats = (await client.get("/stats")).json()
+            assert stats['received'] == 20
+            assert stats['unique_processed'] == 15
+            assert stats['duplicate_dropped'] == 5
+    finally:
+        await lifespan.__aexit__(None, None, None)
+
+
+
+# ============================================================
+# TEST 63: Publisher Open-Loop Failure Accounting Tests
+# ============================================================
+
+@pytest.mark.asyncio
+async def test_publisher_open_loop_records_failed_requests():
+    """Test 63: Failed open-loop requests keep their latency and never wait on a pool timeout."""
+    publisher_main = load_publisher()
+    publisher_main.REPORT_PATH = ""
+    publisher = publisher_main.EventPublisher("http://unused/publish")
+    
+    sends = 0
+    
+    async def send_batch(client, events, body):
+        nonlocal sends
+        sends += 1
+        ok = sends % 2 == 0
+        await asyncio.sleep(0.01)
+        return ok
+    
+    polls = 0
+    
+    async def processed_count(client):
+        # Baseline 0, setelah itu semua event yang ter-ack sudah diproses
+        nonlocal polls
+        polls += 1
+        return 0 if polls == 1 else 10 ** 9
+    
+    publisher.send_batch = send_batch
+    publisher.processed_count = processed_count
+    report = await publisher.run_open_loop(40, 10, rate=4000)
+    
+    assert report['ack_latency']['count'] == 4
+    assert report['failed_requests'] == 2
+    assert report['failed_latency']['min_ms'] >= 10
+    assert report['end_to_end_latency']['count'] == 20
+    
+    async with publisher.create_client(open_loop=True) as client:
+        assert client.timeout.pool is None
+    async with publisher.create_client() as client:
+        assert client.timeout.pool == 30.0
+
+
+
+# ============================================================
+# TEST 64: Sharded Partial Commit Retry Tests
+# ============================================================
+
+@pytest.mark.asyncio
+async def test_sharded_partial_commit_retry_keeps_stats(monkeypatch):
+    """Test 64: A retry after one shard fails resubmits only that shard's events."""
+    import src.worker_pool as worker_pool_module
+    monkeypatch.setattr(worker_pool_module, "RETRY_BACKOFF_INITIAL", 0.01)
+    
+    tmpdir = tempfile.mkdtemp()
+    store = ShardedDedupStore(os.path.join(tmpdir, "dedup.db"), num_shards=2)
+    await store.initialize()
+    
+    failing = store.shards[1]
+    original = failing._insert_rows
+    failures = {'left': 1}
+    
+    async def flaky_insert_rows(*args, **kwargs):
+        if failures['left']:
+            failures['left'] -= 1
+            raise RuntimeError("database is locked")
+        return await original(*args, **kwargs)
+    
+    monkeypatch.setattr(failing, "_insert_rows", flaky_insert_rows)
+    
+    try:
+        worker_pool = WorkerPool(
+            store, num_workers=1, queue_max_size=100,
+            batch_max_size=20, batch_max_linger_ms=20
+        )
+        duplicates = metrics.DUPLICATE_DROPPED.value("partial-topic")
+        for i in range(20):
+            worker_pool.put_nowait(Event(
+                topic="partial-topic", event_id=f"event-{i}",
+                timestamp="2025-01-01T00:00:00Z", source="test-source", payload={}
+            ))
+        await store.increment_received(20)
+        worker_pool.start()
+        await asyncio.wait_for(worker_pool.join(), timeout=5)
+        await worker_pool.stop()
+        
+        assert failures['left'] == 0
+        assert worker_pool.get_stats()[0]['failed_attempts'] == 1
+        assert worker_pool.get_stats()[0]['unique_processed'] == 20
+        assert worker_pool.get_stats()[0]['duplicate_dropped'] == 0
+        assert metrics.DUPLICATE_DROPPED.value("partial-topic") == duplicates
+        
+        stats = await store.get_stats()
+        assert (stats['received'], stats['unique_processed'], stats['duplicate_dropped']) == (20, 20, 0)
+        assert await store.count_events() == 20
+    finally:
+        await store.close()
+        shutil.rmtree(tmpdir)
+
+
+
+# ============================================================
+# TEST 65: Blocking Forward Timeout Tests
+# ============================================================
+
+@pytest.mark.asyncio
+async def test_blocking_forward_outlives_client_timeout(tmp_path, monkeypatch):
+    """Test 65: A stream forward waiting on owner admission is not cut off by the client timeout."""
+    import uvicorn
+    from fastapi import FastAPI, Request
+    
+    # Owner dengan queue penuh: admit_wait menunggu sampai depth turun
+    depth = {'value': 1}
+    admission = AdmissionController(
+        max_depth=1, depth_fn=lambda: depth['value'], processed_fn=lambda: 0
+    )
+    owner = FastAPI()
+    
+    @owner.post("/internal/ingest")
+    async def ingest(request: Request, block: bool = False):
+        events = decode_publish_request(await request.body())
+        await admission.admit_wait(len(events))
+        admission.release(len(events))
+        return {"status": "accepted", "received": len(events), "queued": len(events), "message": ""}
+    
+    @owner.get("/slow")
+    async def slow():
+        await asyncio.sleep(0.5)
+        return {}
+    
+    socket_path = str(tmp_path / "owner.sock")
+    server = uvicorn.Server(uvicorn.Config(owner, uds=socket_path, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    
+    monkeypatch.setattr(OwnerClient, "REQUEST_TIMEOUT", httpx.Timeout(0.1, connect=5.0))
+    client = OwnerClient(socket_path)
+    try:
+        # Request biasa tetap dibatasi timeout client
+        with pytest.raises(OwnerUnavailable):
+            await client.get("/slow")
+        
+        event = Event(
+            topic="test-topic", event_id="event-0",
+            timestamp="2025-01-01T00:00:00Z", source="test-source", payload={}
+        )
+        asyncio.get_running_loop().call_later(0.5, depth.__setitem__, "value", 0)
+        response = await client.forward([event], block=True)
+        assert response['queued'] == 1
+        assert admission.get_stats()['waited_requests'] == 1
+    finally:
+        await client.close()
+        server.should_exit = True
+        await server_task
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])